@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos motores de consulta (SQLite x DuckDB sobre a cópia Parquet)
+
+Gera dados sintéticos, cria o banco unificado (com a cópia Parquet) e executa
+nos dois motores a carga típica de perguntas agregadas do agente: faturamento
+por UF, ranking de produtos, distintos por estado, tendência mensal e
+consultas sobre a visão notas_fiscais. Para cada consulta informa a mediana
+do tempo em cada motor, o ganho do DuckDB, o motor que o modo automático
+escolheria e se os dois resultados coincidem.
+
+Uso:
+    python benchmark_engines.py --rows 1000000 --repeat 5 --output engines.json
+"""
+
+import os
+import json
+import shutil
+import argparse
+import platform
+import statistics
+from datetime import datetime
+
+import pandas as pd
+
+from tools.database_tools import HEADER_TABLE, ITEMS_TABLE
+from tools.engine_tools import (
+    choose_engine,
+    get_engine,
+    available_engines,
+    ENGINE_SQLITE,
+    ENGINE_DUCKDB,
+    ENGINE_AUTO,
+)
+from tools.ingest_tools import ingest_csv_files_parallel
+from tools.synthetic_data_tools import generate_nfe_csvs
+
+# Carga típica: perguntas agregadas feitas ao agente
+WORKLOAD = [
+    (
+        "faturamento por UF",
+        (
+            "SELECT uf_emitente, SUM(valor_total) AS total FROM itens GROUP BY"
+            " uf_emitente ORDER BY total DESC"
+        ),
+    ),
+    (
+        "top 10 produtos",
+        (
+            "SELECT descricao_do_produto_servico, SUM(valor_total) AS total,"
+            " SUM(quantidade) AS qtd FROM itens GROUP BY descricao_do_produto_servico"
+            " ORDER BY total DESC LIMIT 10"
+        ),
+    ),
+    (
+        "emitentes por UF",
+        (
+            "SELECT uf_emitente, COUNT(DISTINCT cpf_cnpj_emitente) AS emitentes FROM"
+            " cabecalho GROUP BY uf_emitente ORDER BY emitentes DESC"
+        ),
+    ),
+    (
+        "ticket médio por destino",
+        (
+            'SELECT "uf_destinatário", AVG(valor_nota_fiscal) AS ticket, COUNT(*) AS'
+            ' notas FROM cabecalho GROUP BY "uf_destinatário" ORDER BY ticket DESC'
+        ),
+    ),
+    (
+        "tendência mensal",
+        (
+            "SELECT ano, mes, SUM(valor_total) AS total, COUNT(DISTINCT"
+            " chave_de_acesso) AS notas FROM itens GROUP BY ano, mes ORDER BY ano, mes"
+        ),
+    ),
+    (
+        "preço por CFOP",
+        (
+            'SELECT cfop, MAX("valor_unitário") AS maior, AVG(quantidade) AS media_qtd'
+            " FROM itens GROUP BY cfop ORDER BY maior DESC LIMIT 10"
+        ),
+    ),
+    (
+        "naturezas em SP (visão)",
+        (
+            "SELECT natureza_da_operacao, SUM(valor_total) AS total,"
+            " AVG(valor_nota_fiscal) AS media_nota FROM notas_fiscais WHERE uf_emitente"
+            " = 'SP' GROUP BY natureza_da_operacao ORDER BY total DESC LIMIT 10"
+        ),
+    ),
+]
+
+# Linhas lidas de cada resultado (acima do teto do
+# agente, para comparar os resultados inteiros)
+MAX_ROWS = 1000
+
+
+def same_result(left: pd.DataFrame, right: pd.DataFrame) -> bool:
+    """
+    Compara os resultados dos dois motores (números com tolerância relativa).
+
+    As linhas são comparadas em ordem de valores: empates no ORDER BY podem
+    vir em ordens diferentes em cada motor.
+    """
+    if left.shape != right.shape:
+        return False
+    left = left.sort_values(list(left.columns), ignore_index=True)
+    right = right.sort_values(list(right.columns), ignore_index=True)
+    for left_column, right_column in zip(left.columns, right.columns):
+        left_values, right_values = left[left_column], right[right_column]
+        if pd.api.types.is_numeric_dtype(left_values) and pd.api.types.is_numeric_dtype(
+            right_values
+        ):
+            if not all(
+                abs(a - b) <= 1e-6 * max(abs(a), abs(b), 1)
+                for a, b in zip(left_values, right_values)
+            ):
+                return False
+        elif left_values.astype(str).tolist() != right_values.astype(str).tolist():
+            return False
+    return True
+
+
+def time_query(engine_name: str, db_path: str, query: str, repeat: int) -> dict:
+    """Mediana do tempo de execução (a primeira execução aquece caches e conexões)."""
+    engine = get_engine(engine_name)
+    result = engine.run(db_path, query, max_rows=MAX_ROWS)
+    timings = [
+        engine.run(db_path, query, max_rows=MAX_ROWS)["elapsed_seconds"]
+        for _ in range(repeat)
+    ]
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "dataframe": result["dataframe"],
+    }
+
+
+def run_benchmark(rows: int, folder: str, repeat: int, seed: int) -> dict:
+    """Gera os dados, cria o banco unificado e mede a carga nos dois motores."""
+    print(f"\n🔧 Gerando ~{rows:,} itens em {folder}...")
+    data = generate_nfe_csvs(rows, folder, seed=seed)
+    db_path = os.path.join(folder, "unificado.db")
+    unified_source = {
+        HEADER_TABLE: data["header_path"],
+        ITEMS_TABLE: data["items_path"],
+    }
+    result = ingest_csv_files_parallel([(unified_source, db_path)], max_workers=1)[0]
+    if not result["success"]:
+        raise RuntimeError(f"Falha na ingestão: {result['error']}")
+    if ENGINE_DUCKDB not in available_engines(db_path):
+        raise RuntimeError(
+            "DuckDB indisponível: instale o pacote duckdb (pip install duckdb)"
+        )
+    print(
+        f"✅ {data['header_rows']:,} notas e {data['item_rows']:,} itens "
+        f"(cópia Parquet em {result['columnar_seconds']:.1f}s)"
+    )
+
+    queries = []
+    for name, query in WORKLOAD:
+        sqlite_run = time_query(ENGINE_SQLITE, db_path, query, repeat)
+        duckdb_run = time_query(ENGINE_DUCKDB, db_path, query, repeat)
+        queries.append(
+            {
+                "name": name,
+                "query": query,
+                "sqlite_ms": sqlite_run["median_ms"],
+                "duckdb_ms": duckdb_run["median_ms"],
+                "auto_engine": choose_engine(db_path, query, ENGINE_AUTO),
+                "same_result": same_result(
+                    sqlite_run["dataframe"], duckdb_run["dataframe"]
+                ),
+            }
+        )
+
+    return {
+        "rows": rows,
+        "header_rows": data["header_rows"],
+        "item_rows": data["item_rows"],
+        "columnar_seconds": result["columnar_seconds"],
+        "queries": queries,
+    }
+
+
+def print_report(scale: dict):
+    """Imprime o tempo de cada consulta nos dois motores e o total da carga."""
+    print(f"\n📊 {scale['item_rows']:,} itens ({scale['header_rows']:,} notas)")
+    print(
+        f"{'consulta':<26} {'SQLite (ms)':>12} {'DuckDB (ms)':>12} {'ganho':>8}"
+        f" {'automático':>11} {'resultado':>10}"
+    )
+    for query in scale["queries"]:
+        speedup = query["sqlite_ms"] / query["duckdb_ms"] if query["duckdb_ms"] else 0.0
+        print(
+            f"{query['name']:<26} {query['sqlite_ms']:>12.1f}"
+            f" {query['duckdb_ms']:>12.1f} {speedup:>7.1f}x {query['auto_engine']:>11}"
+            f" {'igual' if query['same_result'] else '⚠️ difere':>10}"
+        )
+
+    sqlite_total = sum(query["sqlite_ms"] for query in scale["queries"])
+    duckdb_total = sum(query["duckdb_ms"] for query in scale["queries"])
+    auto_total = sum(query[f"{query['auto_engine']}_ms"] for query in scale["queries"])
+    print(
+        f"{'total':<26} {sqlite_total:>12.1f} {duckdb_total:>12.1f}"
+        f" {sqlite_total / duckdb_total:>7.1f}x {auto_total:>8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos motores de consulta")
+    parser.add_argument(
+        "--rows", type=int, default=1000000, help="Quantidade aproximada de itens"
+    )
+    parser.add_argument(
+        "--folder", default="benchmark_engines", help="Pasta de trabalho"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Execuções medidas por consulta e motor"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador")
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    parser.add_argument(
+        "--keep", action="store_true", help="Mantém CSVs, banco e cópia Parquet gerados"
+    )
+    args = parser.parse_args()
+
+    try:
+        scale = run_benchmark(args.rows, args.folder, args.repeat, args.seed)
+    finally:
+        if not args.keep:
+            shutil.rmtree(args.folder, ignore_errors=True)
+
+    print_report(scale)
+
+    if args.output:
+        report = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "scale": scale,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
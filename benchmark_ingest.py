@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Benchmark da ingestão de CSVs de notas fiscais em SQLite
+
+Gera dados sintéticos em várias escalas e mede, para cada etapa (cabeçalhos,
+itens e banco unificado): velocidade de carga, tempo de limpeza, pico de
+memória acima do início de cada etapa, tempo de criação dos índices, das
+tabelas pré-agregadas, do ANALYZE e do catálogo e tamanho final do banco.
+
+Uso:
+    python benchmark_ingest.py --rows 10000 100000 1000000 --output bench.json
+    python benchmark_ingest.py --rows 100000 --baseline bench.json
+"""
+
+import os
+import json
+import shutil
+import argparse
+import platform
+from datetime import datetime
+
+from tools.database_tools import HEADER_TABLE, ITEMS_TABLE
+from tools.ingest_tools import ingest_csv_files_parallel, DEFAULT_CHUNK_SIZE
+from tools.synthetic_data_tools import generate_nfe_csvs
+
+# Variação (em %) a partir da qual uma etapa é sinalizada como regressão
+REGRESSION_THRESHOLD = 10.0
+
+
+def run_stage(name: str, csv_source, db_path: str, chunk_size: int) -> dict:
+    """
+    Executa uma etapa em um processo novo, para que o pico de memória seja só dela.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    result = ingest_csv_files_parallel(
+        [(csv_source, db_path)], chunk_size=chunk_size, max_workers=1
+    )[0]
+    if not result["success"]:
+        raise RuntimeError(f"Falha na etapa {name}: {result['error']}")
+
+    return {
+        "stage": name,
+        "rows": result["rows"],
+        "load_seconds": result["elapsed_seconds"],
+        "clean_seconds": result["clean_seconds"],
+        "rows_per_second": result["rows_per_second"],
+        "peak_memory_mb": result["peak_memory_mb"],
+        "index_seconds": result["index_seconds"],
+        "rollup_seconds": result["rollup_seconds"],
+        "fulltext_seconds": result["fulltext_seconds"],
+        "analyze_seconds": result["analyze_seconds"],
+        "catalog_seconds": result["catalog_seconds"],
+        "sketch_seconds": result["sketch_seconds"],
+        "db_size_mb": os.path.getsize(db_path) / (1024 * 1024),
+    }
+
+
+def run_benchmark(
+    rows: int, folder: str, chunk_size: int, seed: int, unified: bool
+) -> dict:
+    """Gera os CSVs de uma escala e mede todas as etapas de ingestão."""
+    scale_folder = os.path.join(folder, f"rows_{rows}")
+    print(f"\n🔧 Gerando ~{rows:,} itens em {scale_folder}...")
+    data = generate_nfe_csvs(rows, scale_folder, seed=seed)
+    print(
+        f"✅ {data['header_rows']:,} notas e {data['item_rows']:,} itens em"
+        f" {data['elapsed_seconds']:.1f}s"
+    )
+
+    stages = [
+        run_stage(
+            "cabecalho",
+            data["header_path"],
+            os.path.join(scale_folder, "cabecalho.db"),
+            chunk_size,
+        ),
+        run_stage(
+            "itens",
+            data["items_path"],
+            os.path.join(scale_folder, "itens.db"),
+            chunk_size,
+        ),
+    ]
+    if unified:
+        unified_source = {
+            HEADER_TABLE: data["header_path"],
+            ITEMS_TABLE: data["items_path"],
+        }
+        stages.append(
+            run_stage(
+                "unificado",
+                unified_source,
+                os.path.join(scale_folder, "unificado.db"),
+                chunk_size,
+            )
+        )
+
+    return {
+        "rows": rows,
+        "header_rows": data["header_rows"],
+        "item_rows": data["item_rows"],
+        "csv_size_mb": (data["header_bytes"] + data["items_bytes"]) / (1024 * 1024),
+        "generation_seconds": data["elapsed_seconds"],
+        "stages": stages,
+    }
+
+
+def print_report(scales: list, baseline: dict = None):
+    """
+    Imprime uma tabela por escala, com a variação
+    em relação ao baseline quando informado.
+    """
+    baseline_stages = {}
+    for scale in (baseline or {}).get("scales", []):
+        for stage in scale["stages"]:
+            baseline_stages[(scale["rows"], stage["stage"])] = stage
+
+    for scale in scales:
+        print(
+            f"\n📊 Escala: {scale['rows']:,} itens ({scale['header_rows']:,} notas,"
+            f" CSVs com {scale['csv_size_mb']:,.1f} MB)"
+        )
+        print(
+            f"{'etapa':<10} {'linhas':>12} {'carga (s)':>10} {'limpeza (s)':>12}"
+            f" {'linhas/s':>12} {'+mem (MB)':>10} {'índices (s)':>12}"
+            f" {'rollups (s)':>12} {'FTS (s)':>8} {'analyze (s)':>12}"
+            f" {'catálogo (s)':>13} {'esboços (s)':>12} {'banco (MB)':>11}"
+        )
+
+        for stage in scale["stages"]:
+            peak = (
+                f"{stage['peak_memory_mb']:,.1f}"
+                if stage["peak_memory_mb"] is not None
+                else "n/d"
+            )
+            line = (
+                f"{stage['stage']:<10} {stage['rows']:>12,}"
+                f" {stage['load_seconds']:>10.2f} {stage['clean_seconds']:>12.2f}"
+                f" {stage['rows_per_second']:>12,.0f} {peak:>10}"
+                f" {stage['index_seconds']:>12.2f} {stage['rollup_seconds']:>12.2f}"
+                f" {stage.get('fulltext_seconds', 0.0):>8.2f}"
+                f" {stage['analyze_seconds']:>12.2f} {stage['catalog_seconds']:>13.2f}"
+                f" {stage.get('sketch_seconds', 0.0):>12.2f}"
+                f" {stage['db_size_mb']:>11.1f}"
+            )
+
+            previous = baseline_stages.get((scale["rows"], stage["stage"]))
+            if previous and previous["rows_per_second"]:
+                change = (
+                    stage["rows_per_second"] / previous["rows_per_second"] - 1
+                ) * 100
+                flag = "⚠️ regressão" if change < -REGRESSION_THRESHOLD else ""
+                line += f"  {change:+.1f}% {flag}"
+
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark da ingestão de notas fiscais"
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[10000, 100000],
+        help="Escalas (quantidade aproximada de itens)",
+    )
+    parser.add_argument("--folder", default="benchmark", help="Pasta de trabalho")
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Linhas por bloco"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador")
+    parser.add_argument(
+        "--no-unified", action="store_true", help="Não mede o banco unificado"
+    )
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados")
+    parser.add_argument(
+        "--baseline", help="Arquivo JSON de uma execução anterior para comparação"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Mantém CSVs e bancos gerados"
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    scales = []
+    try:
+        for rows in args.rows:
+            scales.append(
+                run_benchmark(
+                    rows, args.folder, args.chunk_size, args.seed, not args.no_unified
+                )
+            )
+    finally:
+        if not args.keep:
+            shutil.rmtree(args.folder, ignore_errors=True)
+
+    print_report(scales, baseline)
+
+    if args.output:
+        report = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "chunk_size": args.chunk_size,
+            "seed": args.seed,
+            "scales": scales,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
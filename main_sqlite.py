@@ -1,16 +1,88 @@
 import os
 import time
+import threading
 import streamlit as st
 from pathlib import Path
 from dotenv import load_dotenv
 from crewai import Agent, Task, Crew, Process, LLM
 from crewai.tools import tool
-import sqlite3
 import pandas as pd
 from datetime import datetime
 
 # Importa a ferramenta RAR do arquivo separado
-from tools.rar_tools import RarExtractorTool, create_rar_extractor_tool, check_extraction_tools
+from tools.rar_tools import (
+    RarExtractorTool,
+    create_rar_extractor_tool,
+    check_extraction_tools,
+)
+from tools.ingest_tools import (
+    ingest_csv_files_parallel,
+    plan_archive_jobs,
+    plan_unified_jobs,
+    get_source_name,
+)
+from tools.manifest_tools import plan_incremental_ingest, record_ingest_results
+from tools.database_tools import (
+    get_available_columns,
+    get_database_statistics,
+    get_database_schema,
+    execute_sql_query,
+)
+from tools.connection_tools import invalidate_pool, get_pool_metrics
+from tools.query_cache_tools import invalidate_query_cache, get_query_cache_stats
+from tools.analysis_jobs_tools import (
+    get_job_manager,
+    AnalysisCancelledError,
+    FINISHED_STATUSES,
+    JOB_DONE,
+    JOB_PENDING,
+    JOB_CANCELLED,
+)
+from tools.index_advisor_tools import (
+    record_query,
+    suggest_indexes,
+    create_suggested_indexes,
+    INDEX_ADVISOR_AUTO_CREATE,
+)
+from tools.sketch_tools import APPROX_MODE
+from tools.fulltext_tools import load_fulltext_indexes, describe_fulltext_indexes
+from tools.query_plan_tools import review_query_plan, load_plan_log, ISSUE_LABELS
+from tools.engine_tools import (
+    available_engines,
+    ENGINE_AUTO,
+    ENGINE_SQLITE,
+    ENGINE_DUCKDB,
+    QUERY_ENGINE,
+)
+from tools.intent_router_tools import answer_with_intent, get_intent_router_stats
+from tools.answer_cache_tools import (
+    get_cached_answer,
+    store_answer,
+    invalidate_answer_cache,
+    get_answer_cache_stats,
+)
+from tools.analysis_metrics_tools import (
+    record_analysis_run,
+    load_analysis_runs,
+    summarize_analysis_runs,
+    extract_token_usage,
+    MODE_DUAL,
+    MODE_SINGLE,
+    MODE_ROUTER,
+    MODE_CACHE,
+    MODE_LABELS,
+    NO_LLM_USAGE,
+)
+from tools.crew_cache_tools import (
+    get_crew_cache,
+    analysis_context,
+    get_analysis_context,
+)
+from tools.prompt_tools import (
+    build_query_tool_description,
+    estimate_tokens,
+    PROMPT_VERSION,
+)
 
 # Carrega as variáveis de ambiente
 load_dotenv()
@@ -18,6 +90,7 @@ load_dotenv()
 teste = 2
 
 import warnings
+
 warnings.filterwarnings("ignore", category=SyntaxWarning)
 warnings.filterwarnings("ignore", module="pydantic")
 
@@ -26,9 +99,10 @@ st.set_page_config(
     page_title="I2A2 - Análise Inteligente de Notas Fiscais",
     page_icon="🗂️",
     layout="wide",
-    initial_sidebar_state="expanded"
+    initial_sidebar_state="expanded",
 )
 
+
 # Configuração do LLM
 @st.cache_resource
 def get_llm():
@@ -37,313 +111,185 @@ def get_llm():
         temperature=0.1,
         max_tokens=500,
         top_p=0.9,
-        api_key=os.getenv("OPENAI_API_KEY")
+        api_key=os.getenv("OPENAI_API_KEY"),
     )
 
+
 LLm = get_llm()
 
+# Modos de processamento do arquivo RAR enviado
+INGEST_MODE_EXTRACT = "📦 Extrair CSVs para a pasta dados"
+INGEST_MODE_STREAM = "⚡ Direto do RAR para o SQLite (sem CSV intermediário)"
+
+# Rótulos dos motores de consulta
+ENGINE_LABELS = {
+    ENGINE_AUTO: "Automático (pelo formato da consulta)",
+    ENGINE_SQLITE: "SQLite (por linhas)",
+    ENGINE_DUCKDB: "DuckDB (colunar, cópia Parquet)",
+}
+
+# Pipeline padrão das análises: "dual" (agente SQL + agente redator) ou
+# "single" (só o agente SQL, com o resultado já formatado em Python)
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", MODE_DUAL)
+
+# Intervalo de atualização da página enquanto houver análises em andamento (segundos)
+ANALYSIS_POLL_SECONDS = float(os.getenv("ANALYSIS_POLL_SECONDS", "1.5"))
+
+
 def get_raw_result(result):
     """Extrai o conteúdo raw do resultado do CrewAI."""
-    if hasattr(result, 'raw'):
+    if hasattr(result, "raw"):
         return result.raw
-    elif hasattr(result, 'result'):
+    elif hasattr(result, "result"):
         return result.result
     else:
         return str(result)
 
-def get_available_columns(db_path: str) -> dict:
-    """Retorna as colunas disponíveis no banco de dados e identifica o tipo"""
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(notas_fiscais)")
-        columns = cursor.fetchall()
-        conn.close()
-        
-        available_columns = [col[1].lower() for col in columns]
-        
-        # Detecta se é arquivo de cabeçalhos ou itens
-        is_header_file = 'valor_nota_fiscal' in available_columns
-        is_items_file = 'valor_total' in available_columns and 'descricao_do_produto_servico' in available_columns
-        
-        return {
-            'type': 'header' if is_header_file else 'items' if is_items_file else 'unknown',
-            'valor_column': 'valor_nota_fiscal' if is_header_file else 'valor_total' if is_items_file else None,
-            'has_products': 'descricao_do_produto_servico' in available_columns,
-            'has_quantity': 'quantidade' in available_columns,
-            'uf_emitente': 'uf_emitente' in available_columns,
-            'razao_social_emitente': 'razao_social_emitente' in available_columns,
-            'all_columns': available_columns
-        }
-        
-    except Exception as e:
-        return {'type': 'error', 'error': str(e)}
 
-def get_database_statistics(db_path: str) -> dict:
-    """Obtém estatísticas básicas do arquivo"""
-    try:
-        conn = sqlite3.connect(db_path)
-        
-        # Apenas o total de registros
-        total_registros = pd.read_sql_query("SELECT COUNT(*) as total FROM notas_fiscais", conn).iloc[0]['total']
-        
-        conn.close()
-        
-        return {
-            'total_registros': total_registros
-        }
-        
-    except Exception as e:
-        return {'error': str(e)}
+def show_ingest_report(result: dict):
+    """Exibe as estatísticas de um banco criado por ingest_csv_file"""
+    peak_memory = result["peak_memory_mb"]
+    peak_memory_text = (
+        f"{peak_memory:,.1f} MB" if peak_memory is not None else "indisponível"
+    )
 
-def get_database_schema(db_path: str, info_type: str = "schema") -> str:
-    """Função auxiliar para obter informações do esquema"""
-    try:
-        conn = sqlite3.connect(db_path)
-        
-        if info_type.lower() == "schema":
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(notas_fiscais)")
-            columns = cursor.fetchall()
-            
-            result = "ESQUEMA DA TABELA 'notas_fiscais':\n\n"
-            for col in columns:
-                result += f"- {col[1]} ({col[2]})\n"
-            
-            # Lista também o total de registros
-            cursor.execute("SELECT COUNT(*) FROM notas_fiscais")
-            total = cursor.fetchone()[0]
-            result += f"\nTotal de registros: {total}"
-            
-            conn.close()
-            return result
-            
-        elif info_type.lower() == "sample":
-            df = pd.read_sql_query("SELECT * FROM notas_fiscais LIMIT 3", conn)
-            conn.close()
-            return f"AMOSTRA DOS DADOS:\n\n{df.to_string(index=False)}"
-            
-    except Exception as e:
-        return f"Erro ao obter informações: {str(e)}"
+    st.info(f"""
+    📊 **Processamento concluído:**
+    - Registros processados: {result['final_count']:,}
+    - Estados únicos: {result['estados_count']}
+    - Valor total: R$ {result['total_value']:,.2f}
+    - Índices criados: {result['indexes_created']}/{result['indexes_total']}
+    - Tabelas pré-agregadas: {result['rollups_created']}
+    - Índices de busca textual: {len(result['fulltext_indexes'])}
+    - Cópia colunar (Parquet): {len(result['columnar_tables'])} tabela(s)
+    - Colunas processadas: {len(result['columns'])}
+    - Blocos lidos: {result['chunks']} (até {result['chunk_size']:,} linhas cada)
+    - Velocidade: {result['rows_per_second']:,.0f} registros/s
+    - Pico de memória (acima do início da ingestão): {peak_memory_text}
+    """)
 
-# Funções SQLite
-def execute_sql_query(db_path: str, query: str) -> str:
-    """Executa consulta SQL e retorna resultado formatado"""
-    try:
-        conn = sqlite3.connect(db_path)
-        
-        if query.strip().upper().startswith('SELECT'):
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-            
-            if df.empty:
-                return "Nenhum resultado encontrado."
-            
-            result = f"Encontrados {len(df)} registros:\n\n"
-            result += df.to_string(index=False, max_rows=20)
-            
-            if len(df) > 20:
-                result += f"\n\n... e mais {len(df) - 20} registros."
-            
-            return result
-        else:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            conn.commit()
-            rows_affected = cursor.rowcount
-            conn.close()
-            return f"Consulta executada. {rows_affected} linhas afetadas."
-            
-    except Exception as e:
-        return f"Erro na consulta: {str(e)}"
+    if result["index_errors"]:
+        st.warning(
+            "⚠️ Índices não criados:\n"
+            + "\n".join(f"- {error}" for error in result["index_errors"])
+        )
 
-def create_database_from_csv(csv_path: str, db_path: str) -> bool:
-    """Converte CSV para SQLite com feedback detalhado"""
-    try:
-        # Carrega CSV
-        df = pd.read_csv(csv_path, encoding='utf-8')
-        original_rows = len(df)
-        
-        # Limpa nomes das colunas
-        original_columns = df.columns.tolist()
-        df.columns = [clean_column_name(col) for col in df.columns]
-        cleaned_columns = df.columns.tolist()
-        
-        # Processa dados
-        df = clean_data(df)
-        processed_rows = len(df)
-        
-        # Salva no SQLite
-        conn = sqlite3.connect(db_path)
-        df.to_sql('notas_fiscais', conn, if_exists='replace', index=False)
-        
-        # Cria índices básicos
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_data_emissao ON notas_fiscais(data_emissao);",
-            "CREATE INDEX IF NOT EXISTS idx_uf_emitente ON notas_fiscais(uf_emitente);",
-            "CREATE INDEX IF NOT EXISTS idx_valor_total ON notas_fiscais(valor_total);",
-            "CREATE INDEX IF NOT EXISTS idx_produto ON notas_fiscais(descricao_do_produto_servico);"
-        ]
-        
-        indexes_created = 0
-        for index in indexes:
-            try:
-                conn.execute(index)
-                indexes_created += 1
-            except:
-                pass
-        
-        # Verifica estatísticas finais
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM notas_fiscais")
-        final_count = cursor.fetchone()[0]
-        
-        # Verifica colunas específicas antes de consultar
-        available_cols = get_available_columns(db_path)
-        
-        estados_count = 0
-        if available_cols['uf_emitente']:
-            cursor.execute("SELECT COUNT(DISTINCT uf_emitente) FROM notas_fiscais WHERE uf_emitente IS NOT NULL")
-            estados_count = cursor.fetchone()[0]
-        
-        total_value = 0
-        if available_cols['valor_column']:
-            cursor.execute(f"SELECT SUM({available_cols['valor_column']}) FROM notas_fiscais WHERE {available_cols['valor_column']} IS NOT NULL")
-            total_value = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
-        # Log de sucesso com estatísticas
-        st.info(f"""
-        📊 **Processamento concluído:**
-        - Registros processados: {final_count:,}
-        - Estados únicos: {estados_count}
-        - Valor total: R$ {total_value:,.2f}
-        - Índices criados: {indexes_created}/4
-        - Colunas processadas: {len(cleaned_columns)}
-        """)
-        
-        return True
-        
-    except Exception as e:
-        st.error(f"Erro ao criar banco: {str(e)}")
-        return False
-
-def clean_column_name(col_name: str) -> str:
-    """Limpa nome da coluna para uso no SQL"""
-    return (col_name.lower()
-            .replace(' ', '_')
-            .replace('/', '_')
-            .replace('-', '_')
-            .replace('(', '')
-            .replace(')', '')
-            .replace('ç', 'c')
-            .replace('ã', 'a')
-            .replace('õ', 'o'))
-
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Prepara os dados"""
-    
-    # Converte data
-    if 'data_emissao' in df.columns:
-        df['data_emissao'] = pd.to_datetime(df['data_emissao'], errors='coerce')
-        df['ano'] = df['data_emissao'].dt.year
-        df['mes'] = df['data_emissao'].dt.month
-        df['dia_semana'] = df['data_emissao'].dt.day_name()
-    
-    # Valores numéricos - verifica se as colunas existem antes
-    numeric_columns = ['quantidade', 'valor_unitario', 'valor_total', 'valor_nota_fiscal']
-    for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    return df
 
 # Tools para Crewai
 def create_database_tools(db_path: str):
-    """Cria as tools para acesso ao banco de dados"""
-    
-    @tool("nf_database_tool")
+    """
+    Cria as tools para acesso ao banco de dados (montadas uma vez por banco).
+
+    A descrição da ferramenta SQL traz o esquema compacto gerado do catálogo.
+    A pergunta, o evento de cancelamento, o modo aproximado, o motor e a
+    formatação vêm do contexto da análise em andamento (analysis_context):
+    as consultas são interrompidas se a análise for cancelada, o plano de
+    cada consulta é registrado com a pergunta que a originou e, com
+    formatted, o resultado já vem no formato da resposta final (agente único).
+    """
+
     def query_database(query: str) -> str:
-        """
-        Ferramenta para consultas SQL no banco de dados de notas fiscais.
-        
-        ESQUEMA DINÂMICO DO BANCO:
-        
-        ARQUIVO DE CABEÇALHOS (se aplicável):
-        - chave_de_acesso, modelo, serie, numero
-        - natureza_da_operacao, data_emissao 
-        - razao_social_emitente, uf_emitente, municipio_emitente
-        - nome_destinatario, uf_destinatario
-        - valor_nota_fiscal (em vez de valor_total)
-        - consumidor_final, presenca_do_comprador
-        
-        ARQUIVO DE ITENS (se aplicável):
-        - chave_de_acesso, data_emissao, ano, mes, dia_semana
-        - razao_social_emitente, uf_emitente, municipio_emitente  
-        - nome_destinatario, uf_destinatario
-        - descricao_do_produto_servico, ncm_sh_tipo_de_produto
-        - quantidade, valor_unitario, valor_total
-        - cfop, natureza_da_operacao
-        
-        IMPORTANTE: 
-        - Use valor_nota_fiscal para arquivos de cabeçalho
-        - Use valor_total para arquivos de itens
-        - Nem todos os arquivos têm todas as colunas
-        
-        Args:
-            query: Consulta SQL para executar
-            
-        Returns:
-            Resultado da consulta formatado
-        """
-        return execute_sql_query(db_path, query)
+        context = get_analysis_context()
+        cancel_event = context.get("cancel_event")
+        if cancel_event is not None and cancel_event.is_set():
+            return "⏹️ Análise cancelada pelo usuário. Não execute novas consultas."
+
+        # Registra as colunas usadas para o recomendador de índices
+        record_query(db_path, query)
+        if INDEX_ADVISOR_AUTO_CREATE:
+            create_suggested_indexes(db_path, suggest_indexes(db_path))
+
+        # Inspeciona o plano só das consultas que vão ao SQLite
+        # (pode criar o índice que falta, conforme QUERY_PLAN_MODE);
+        # cache, esboços e DuckDB não passam pela revisão
+        def review_plan():
+            plan_review = review_query_plan(db_path, query, context.get("pergunta"))
+            return plan_review["warning"] if plan_review else None
 
-    @tool("nf_schema_info_tool") 
+        result = execute_sql_query(
+            db_path,
+            query,
+            cancel_event=cancel_event,
+            approximate=context.get("approximate", APPROX_MODE),
+            engine=context.get("engine", QUERY_ENGINE),
+            formatted=context.get("formatted", False),
+            plan_review=review_plan,
+        )
+        return result
+
+    # Esquema, busca textual e regras gerados a partir do catálogo do banco
+    query_database.__doc__ = build_query_tool_description(db_path)
+    query_database = tool("nf_database_tool")(query_database)
+
+    @tool("nf_schema_info_tool")
     def get_schema_info(info_type: str = "schema") -> str:
         """
-        Obtém informações sobre o esquema do banco de dados.
-        
+        Detalhes do banco além do esquema da nf_database_tool: 'sample' (3 linhas de
+        exemplo), 'schema' (colunas com tipos) ou 'columns' (colunas por tabela).
+
         Args:
-            info_type: Tipo de informação ('schema', 'sample', ou 'columns')
-            
-        Returns:
-            Informações sobre o esquema, dados de exemplo ou detalhes das colunas
+            info_type: 'sample', 'schema' ou 'columns'
         """
         if info_type == "columns":
             col_info = get_available_columns(db_path)
-            if col_info['type'] == 'error':
+            if col_info["type"] == "error":
                 return f"Erro ao obter colunas: {col_info['error']}"
-            
+
             result = f"TIPO DE ARQUIVO: {col_info['type'].upper()}\n\n"
-            result += "COLUNAS DISPONÍVEIS:\n"
-            for col in col_info['all_columns']:
-                result += f"- {col}\n"
-            
-            if col_info['type'] == 'header':
-                result += "\nNOTA: Este é um arquivo de CABEÇALHOS - use 'valor_nota_fiscal' para valores monetários"
-            elif col_info['type'] == 'items':
-                result += "\nNOTA: Este é um arquivo de ITENS - use 'valor_total' para valores monetários"
-            
+            if col_info["type"] == "unified":
+                for table_name, table_columns in col_info["tables"].items():
+                    result += f"COLUNAS DE '{table_name}':\n"
+                    for col in table_columns:
+                        result += f"- {col}\n"
+                    result += "\n"
+            else:
+                result += "COLUNAS DISPONÍVEIS:\n"
+                for col in col_info["all_columns"]:
+                    result += f"- {col}\n"
+
+            if col_info["type"] == "unified":
+                result += (
+                    "\nNOTA: Banco UNIFICADO - use 'cabecalho' (valor_nota_fiscal) para"
+                    " análises por nota, 'itens' (valor_total) para produtos, e a visão"
+                    " 'notas_fiscais' ou JOIN por chave_de_acesso para cruzar os dois"
+                )
+            elif col_info["type"] == "header":
+                result += (
+                    "\nNOTA: Este é um arquivo de CABEÇALHOS - use 'valor_nota_fiscal'"
+                    " para valores monetários"
+                )
+            elif col_info["type"] == "items":
+                result += (
+                    "\nNOTA: Este é um arquivo de ITENS - use 'valor_total' para"
+                    " valores monetários"
+                )
+
+            fulltext_info = describe_fulltext_indexes(load_fulltext_indexes(db_path))
+            if fulltext_info:
+                result += f"\n\n{fulltext_info}"
+
             return result
         else:
             return get_database_schema(db_path, info_type)
-    
+
     return query_database, get_schema_info
 
+
 @st.cache_resource
 def create_rar_extractor_agent():
     """Cria o agente de extração RAR com a ferramenta personalizada."""
     rar_tool = create_rar_extractor_tool()
-    
+
     return Agent(
-        role='Especialista em Descompactação RAR',
-        goal='Descompactar arquivos RAR na pasta dados usando ferramentas especializadas',
+        role="Especialista em Descompactação RAR",
+        goal=(
+            "Descompactar arquivos RAR na pasta dados usando ferramentas especializadas"
+        ),
         backstory="""
-        Você é um especialista em descompactação de arquivos RAR equipado com ferramentas 
-        especializadas. Sua função é usar a ferramenta 'rar_extractor' para extrair 
-        arquivos RAR na pasta 'dados', sempre verificando se o arquivo existe e 
-        fornecendo feedback detalhado sobre o processo.
+        Você é um especialista em descompactação de arquivos RAR equipado com
+        ferramentas especializadas. Sua função é usar a ferramenta 'rar_extractor'
+        para extrair arquivos RAR na pasta 'dados', sempre verificando se o arquivo
+        existe e fornecendo feedback detalhado sobre o processo.
         
         Quando receber uma tarefa para extrair um arquivo RAR, você deve:
         1. Usar a ferramenta rar_extractor com o caminho do arquivo especificado
@@ -352,92 +298,49 @@ def create_rar_extractor_agent():
         
         IMPORTANTE: Sempre use a ferramenta rar_extractor para realizar a extração!
         """,
-        verbose=False,  
+        verbose=False,
         allow_delegation=False,
         tools=[rar_tool],
-        llm=LLm
+        llm=LLm,
     )
 
+
 def create_csv_analyzer_agent(db_path: str):
+    """
+    Cria o agente de análise usando SQLite.
 
-    """Cria o agente de análise usando SQLite."""
+    O esquema do banco vai só na descrição da ferramenta SQL (gerada do
+    catálogo); o backstory é fixo e curto.
+    """
     query_tool, schema_tool = create_database_tools(db_path)
-    
-    # Detecta o tipo de arquivo para ajustar o backstory
-    col_info = get_available_columns(db_path)
-
-    file_type_info = ""
-    
-    if col_info['type'] == 'header':
-        file_type_info = """
-        IMPORTANTE: Você está analisando um arquivo de CABEÇALHOS de notas fiscais.
-        - Use 'valor_nota_fiscal' para valores monetários (não 'valor_total')
-        - Cada registro representa uma NOTA FISCAL completa
-        - NÃO há informações de produtos individuais
-        - Foque em análises de notas fiscais, empresas, fluxo entre emitente e destinatário
-        """
-    elif col_info['type'] == 'items':
-        file_type_info = """
-        IMPORTANTE: Você está analisando um arquivo de ITENS de notas fiscais.
-        - Use 'valor_total' e 'valor_unitario' para valores monetários
-        - Cada registro representa um ITEM/PRODUTO de uma nota fiscal
-        - HÁ informações detalhadas de produtos (descrição, NCM, quantidade)
-        - Pode fazer análises de produtos, ranking de vendas por item
-        """
-    
+
     return Agent(
-        role='Especialista SQL em Dados Fiscais',
-        goal='Converter perguntas em consultas SQL precisas no banco de notas fiscais',
-        backstory=f"""Você é um especialista em análise de dados fiscais e SQL com profundo 
-        conhecimento sobre notas fiscais eletrônicas. Você entende perfeitamente o esquema 
-        do banco de dados de notas fiscais e consegue traduzir qualquer pergunta de negócio 
-        em consultas SQL otimizadas.
-        
-        {file_type_info}
-        
-        Suas especialidades incluem:
-        - Consultas de agregação (SUM, COUNT, AVG, GROUP BY)
-        - Análises temporais (por data, mês, ano, dia da semana)
-        - Análises geográficas (por UF, município)
-        - Análises de produtos (quando disponível)
-        - Análises de operações (CFOP, natureza da operação)
-        - Identificação de principais emitentes e destinatários por valor total
-        
-        SEMPRE use get_schema_info com parâmetro 'columns' PRIMEIRO para entender 
-        exatamente quais colunas estão disponíveis antes de gerar consultas SQL.""",
+        role="Especialista SQL em Dados Fiscais",
+        goal="Converter perguntas em consultas SQL precisas no banco de notas fiscais",
+        backstory="""Especialista em SQL e notas fiscais eletrônicas. O esquema
+        completo do banco está na descrição da nf_database_tool: consulte direto, sem
+        pedir o esquema antes. Use get_schema_info apenas para ver exemplos de valores
+        ('sample').""",
         tools=[query_tool, schema_tool],
         verbose=False,
         allow_delegation=False,
-        llm=LLm
+        llm=LLm,
     )
 
+
 def create_business_analyst_agent():
     """Cria o agente analista de negócios."""
     return Agent(
-        role='Formatador de Respostas Diretas',
-        goal='Apresentar apenas os dados solicitados de forma concisa e objetiva',
-        backstory="""Você é especializado em fornecer respostas diretas e concisas.
-        
-        REGRAS IMPORTANTES:
-        - Forneça APENAS os dados solicitados
-        - NÃO adicione análises, insights ou recomendações
-        - NÃO faça interpretações ou contextualizações
-        - Use formato simples e direto
-        - Para rankings: liste apenas nome e valor
-        - Para totais: informe apenas o valor
-        - Para contagens: informe apenas o número
-        
-        Exemplos de respostas corretas:
-        - "Produto mais caro: NOTEBOOK DELL - R$ 3.500,00"
-        - "Principal emitente: EMPRESA ABC LTDA - R$ 1.250.000,00"
-        - "Total de registros: 1.524"
-        
-        NUNCA adicione frases como "Este resultado mostra...", "Podemos observar...", 
-        "Recomenda-se..." ou qualquer texto explicativo.""",
+        role="Formatador de Respostas Diretas",
+        goal="Apresentar apenas os dados solicitados de forma concisa e objetiva",
+        backstory="""Você fornece respostas diretas: só os dados pedidos, sem análises,
+        interpretações, recomendações ou frases como "Este resultado mostra..." ou
+        "Podemos observar...".""",
         verbose=False,
-        llm=LLm
+        llm=LLm,
     )
 
+
 def create_extraction_task(rar_filename: str, agent: Agent) -> Task:
     """Cria uma task para extração de RAR."""
     return Task(
@@ -469,92 +372,129 @@ def create_extraction_task(rar_filename: str, agent: Agent) -> Task:
         - Detalhes de qualquer erro encontrado
         - Confirmação de que a pasta 'dados' foi criada/utilizada
         """,
-        agent=agent
+        agent=agent,
     )
 
-def create_analysis_task(pergunta: str, sql_agent: Agent, business_agent: Agent) -> tuple:
-    """Cria tasks para análise SQL e de negócios."""
-    
+
+def create_analysis_task(sql_agent: Agent, business_agent: Agent) -> tuple:
+    """
+    Cria tasks para análise SQL e de negócios.
+
+    As instruções fixas vêm antes da pergunta, para que o início do prompt
+    se repita entre perguntas (cache de prompt do provedor); {pergunta} é
+    preenchida pela crew a cada execução (kickoff com inputs).
+    """
+
     sql_task = Task(
-        description=f"""
-        Pergunta do usuário: "{pergunta}"
+        description="""
+        Gere e execute com a nf_database_tool a consulta SQL que responde a pergunta
+        abaixo e organize os resultados. Para buscar produtos ou empresas por palavras
+        inteiras ou começos de palavra, use MATCH no índice de busca textual em vez de
+        LIKE '%...%'; trechos do meio de uma palavra só são encontrados com LIKE.
         
-        Você deve:
-        1. Se necessário, use get_schema_info para ver o esquema
-        2. Analise a pergunta e identifique dados necessários
-        3. Gere consulta SQL apropriada usando query_database
-        4. Execute a consulta e organize os resultados
-        
-        REGRAS:
-        - Use nomes corretos das colunas
-        - Para análises temporais: ano, mes, dia_semana
-        - Para valores monetários: valor_total
-        - Para geografia: uf_emitente, uf_destinatario  
-        - Para produtos: descricao_do_produto_servico
-        - Use LIMIT quando apropriado
-        - Use ORDER BY para organizar resultados
+        Pergunta do usuário: "{pergunta}"
         """,
         agent=sql_agent,
-        expected_output="Consulta SQL executada com dados organizados"
+        expected_output="Consulta SQL executada com dados organizados",
     )
-    
+
     business_task = Task(
-        description=f"""
-        Com base nos dados SQL para "{pergunta}", forneça uma resposta DIRETA e CONCISA.
+        description="""
+        Responda de forma DIRETA e CONCISA com os dados SQL da tarefa anterior.
         
-        REGRAS OBRIGATÓRIAS:
-        - Apresente APENAS os dados solicitados
-        - NÃO adicione análises, insights ou interpretações
-        - NÃO faça recomendações ou contextualizações
-        - Use formato simples: "Nome/Item - Valor" ou apenas o número/valor solicitado
-        - Para listas: máximo 10 itens
-        - Para valores monetários: use formato "R$ X,XX"
+        REGRAS:
+        - Apenas os dados solicitados: "Nome/Item - Valor" ou só o número/valor
+        - Listas: no máximo 10 itens
+        - Valores monetários: "R$ 1.234,56"; contagens: "1.234"
+        - Exemplos: "PRODUTO XYZ - R$ 1.500,00", "1.234 registros", "SP: R$ 500.000,00"
         
-        Exemplos do formato esperado:
-        - "PRODUTO XYZ - R$ 1.500,00"
-        - "EMPRESA ABC LTDA - R$ 2.300.000,00" 
-        - "1.234 registros"
-        - "SP: R$ 500.000,00"
+        Pergunta do usuário: "{pergunta}"
         """,
         agent=business_agent,
-        expected_output="Resposta direta com apenas os dados solicitados, sem análises adicionais",
-        context=[sql_task]
+        expected_output=(
+            "Resposta direta com apenas os dados solicitados, sem análises adicionais"
+        ),
+        context=[sql_task],
     )
-    
+
     return sql_task, business_task
 
+
+def create_single_analysis_task(sql_agent: Agent) -> Task:
+    """
+    Cria a task única do modo agente único: o resultado da ferramenta já vem formatado.
+    """
+    return Task(
+        description="""
+        Gere e execute com a nf_database_tool a consulta SQL que responde a pergunta
+        abaixo.
+        
+        REGRAS:
+        - Rankings: ORDER BY e LIMIT 10
+        - Aliases descritivos (ex.: AS valor_total, AS quantidade_notas): o nome da
+          coluna define o formato
+        - Busca de produtos ou empresas por palavra inteira ou começo de palavra: MATCH
+          no índice de busca textual, não LIKE '%...%'; trechos do meio de uma
+          palavra: LIKE
+        
+        RESPOSTA:
+        - O resultado da ferramenta já vem formatado (R$ 1.234,56, listas
+          "1. Nome - Valor"): copie os dados sem alterar valores e sem a linha
+          "Encontrados N registros"
+        - Valor único: só o rótulo curto e o valor (ex.: "Total de registros: 1.234")
+        - Sem análises, recomendações ou texto explicativo; mantenha o aviso
+          "≈ RESULTADO APROXIMADO"
+        
+        Pergunta do usuário: "{pergunta}"
+        """,
+        agent=sql_agent,
+        expected_output=(
+            "Resposta direta com os dados formatados pela ferramenta, sem análises"
+            " adicionais"
+        ),
+    )
+
+
 def find_csv_files():
     """Encontra todos os arquivos CSV na pasta dados."""
     dados_path = Path("dados")
     if not dados_path.exists():
         return []
-    
+
     csv_files = list(dados_path.glob("*.csv"))
     return [f.name for f in csv_files]
 
+
 def find_db_files():
     """Encontra todos os arquivos SQLite na pasta dados."""
     dados_path = Path("dados")
     if not dados_path.exists():
         return []
-    
+
     db_files = list(dados_path.glob("*.db"))
     return [f.name for f in db_files]
 
+
 def save_uploaded_file(uploaded_file, destination_folder="dados"):
     """Salva o arquivo enviado na pasta especificada."""
     destination_path = Path(destination_folder)
     destination_path.mkdir(parents=True, exist_ok=True)
-    
+
     file_path = destination_path / uploaded_file.name
-    
+
     with open(file_path, "wb") as f:
         f.write(uploaded_file.getbuffer())
-    
+
     return str(file_path)
 
-def execute_with_retry(crew, inputs=None):
-    """Executa a crew com retry em caso de rate limit."""
+
+def execute_with_retry(crew, inputs=None, on_rate_limit=None, cancel_event=None):
+    """
+    Executa a crew com retry em caso de rate limit.
+
+    Em threads de fundo, on_rate_limit substitui o aviso do Streamlit e a
+    espera é interrompida se cancel_event for sinalizado.
+    """
     try:
         if inputs:
             return crew.kickoff(inputs=inputs)
@@ -562,8 +502,19 @@ def execute_with_retry(crew, inputs=None):
             return crew.kickoff()
     except Exception as e:
         if "rate_limit_exceeded" in str(e):
-            st.warning("⏳ Rate limit excedido. Aguardando 60 segundos...")
-            time.sleep(60)
+            message = "⏳ Rate limit excedido. Aguardando 60 segundos..."
+            if on_rate_limit:
+                on_rate_limit(message)
+            else:
+                st.warning(message)
+
+            if cancel_event is not None:
+                if cancel_event.wait(60):
+                    raise AnalysisCancelledError(
+                        "Análise cancelada durante a espera do rate limit"
+                    )
+            else:
+                time.sleep(60)
             if inputs:
                 return crew.kickoff(inputs=inputs)
             else:
@@ -571,14 +522,402 @@ def execute_with_retry(crew, inputs=None):
         else:
             raise e
 
+
+def check_analysis_cancelled(_step):
+    """
+    Callback de cada passo dos agentes: interrompe
+    a crew se a análise em andamento foi cancelada.
+    """
+    cancel_event = get_analysis_context().get("cancel_event")
+    if cancel_event is not None and cancel_event.is_set():
+        raise AnalysisCancelledError("Análise cancelada pelo usuário")
+
+
+def estimate_static_prompt_tokens(crew: Crew) -> int:
+    """
+    Tokens estimados da parte fixa do prompt da crew:
+    agentes, ferramentas e tasks (sem a pergunta).
+    """
+    texts = {}
+    for agent in crew.agents:
+        texts[f"agent:{agent.role}"] = f"{agent.role}\n{agent.goal}\n{agent.backstory}"
+        for agent_tool in agent.tools or []:
+            texts[f"tool:{agent_tool.name}"] = (
+                f"{agent_tool.name}\n{agent_tool.description}"
+            )
+    for index, task in enumerate(crew.tasks):
+        texts[f"task:{index}"] = f"{task.description}\n{task.expected_output}"
+    return sum(estimate_tokens(text) for text in texts.values())
+
+
+def build_analysis_crews(db_path: str) -> dict:
+    """
+    Monta as tools, os agentes e as crews de análise de um banco.
+
+    As crews são modelos: cada pergunta executa uma cópia (crew.copy()), com
+    a pergunta preenchida no kickoff e o restante lido do contexto da análise.
+    """
+    sql_agent = create_csv_analyzer_agent(db_path)
+    business_agent = create_business_analyst_agent()
+    sql_task, business_task = create_analysis_task(sql_agent, business_agent)
+
+    crews = {
+        MODE_DUAL: Crew(
+            name="Tripulação de Análise Inteligente",
+            agents=[sql_agent, business_agent],
+            tasks=[sql_task, business_task],
+            process=Process.sequential,
+            step_callback=check_analysis_cancelled,
+            verbose=False,
+        ),
+        MODE_SINGLE: Crew(
+            name="Tripulação de Análise Inteligente (agente único)",
+            agents=[sql_agent],
+            tasks=[create_single_analysis_task(sql_agent)],
+            process=Process.sequential,
+            step_callback=check_analysis_cancelled,
+            verbose=False,
+        ),
+    }
+    return {
+        "crews": crews,
+        "static_prompt_tokens": {
+            mode: estimate_static_prompt_tokens(crew) for mode, crew in crews.items()
+        },
+    }
+
+
+def create_analysis_job(
+    db_path: str,
+    pergunta: str,
+    approximate: bool = APPROX_MODE,
+    engine: str = QUERY_ENGINE,
+    mode: str = ANALYSIS_MODE,
+):
+    """
+    Monta a função executada em segundo plano para responder a pergunta.
+
+    A latência e os tokens de cada análise são registrados com o pipeline
+    que a respondeu (cache, roteador, agente único ou dois agentes).
+    """
+
+    def run_analysis(cancel_event: threading.Event, report) -> str:
+        started = time.perf_counter()
+
+        # Pergunta igual ou parecida já respondida para esta versão do banco
+        cached = get_cached_answer(db_path, pergunta, approximate)
+        if cached is not None:
+            record_analysis_run(
+                db_path,
+                MODE_CACHE,
+                pergunta,
+                time.perf_counter() - started,
+                NO_LLM_USAGE,
+            )
+            if cached["exact"]:
+                return cached["answer"]
+            return (
+                f"{cached['answer']}\n\n♻️ Resposta reaproveitada da pergunta"
+                f" semelhante: \"{cached['pergunta']}\""
+            )
+
+        # Perguntas frequentes (totais, rankings, valor por
+        # UF/mês) são respondidas direto no banco, sem LLM
+        routed = answer_with_intent(db_path, pergunta, cancel_event, engine)
+        if routed is not None:
+            record_analysis_run(
+                db_path,
+                MODE_ROUTER,
+                pergunta,
+                time.perf_counter() - started,
+                NO_LLM_USAGE,
+            )
+            return routed["answer"]
+
+        # Agentes e crews montados uma vez por banco
+        # (normalmente já aquecidos ao selecionar o banco)
+        crew_cache = get_crew_cache()
+        if not crew_cache.is_ready(db_path):
+            report("🤖 Criando agentes...")
+        prebuilt = crew_cache.get(db_path, build_analysis_crews)
+        analysis_crew = prebuilt["crews"][mode].copy()
+
+        report("🤖 Processando...")
+        try:
+            with analysis_context(
+                pergunta=pergunta,
+                cancel_event=cancel_event,
+                approximate=approximate,
+                engine=engine,
+                formatted=mode == MODE_SINGLE,
+            ):
+                analysis_result = execute_with_retry(
+                    analysis_crew,
+                    {"pergunta": pergunta},
+                    on_rate_limit=report,
+                    cancel_event=cancel_event,
+                )
+        except Exception:
+            status = "cancelled" if cancel_event.is_set() else "failed"
+            record_analysis_run(
+                db_path,
+                mode,
+                pergunta,
+                time.perf_counter() - started,
+                status=status,
+                prompt_version=PROMPT_VERSION,
+                static_prompt_tokens=prebuilt["static_prompt_tokens"][mode],
+            )
+            raise
+
+        # Extrai apenas o conteúdo raw
+        result = get_raw_result(analysis_result)
+        if cancel_event.is_set():
+            record_analysis_run(
+                db_path,
+                mode,
+                pergunta,
+                time.perf_counter() - started,
+                status="cancelled",
+                prompt_version=PROMPT_VERSION,
+                static_prompt_tokens=prebuilt["static_prompt_tokens"][mode],
+            )
+        else:
+            record_analysis_run(
+                db_path,
+                mode,
+                pergunta,
+                time.perf_counter() - started,
+                extract_token_usage(analysis_result),
+                prompt_version=PROMPT_VERSION,
+                static_prompt_tokens=prebuilt["static_prompt_tokens"][mode],
+            )
+            store_answer(db_path, pergunta, result, approximate)
+        return result
+
+    return run_analysis
+
+
+def show_analysis_comparison(db_path: str):
+    """
+    Mostra lado a lado a latência e os tokens de cada pipeline de análise no banco.
+    """
+    summary = summarize_analysis_runs(load_analysis_runs(db_path))
+    if not summary:
+        return
+
+    def tokens(value):
+        return "-" if value is None else f"{value:,.0f}".replace(",", ".")
+
+    with st.expander("⏱️ Comparação dos pipelines de análise"):
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Pipeline": row["label"],
+                        "Prompts": (
+                            f"v{row['prompt_version']}"
+                            if row["prompt_version"]
+                            else "-"
+                        ),
+                        "Análises": row["runs"],
+                        "Latência mediana (s)": round(row["median_seconds"], 2),
+                        "Latência p90 (s)": round(row["p90_seconds"], 2),
+                        "Tokens prompt (média)": tokens(row["prompt_tokens"]),
+                        "Tokens resposta (média)": tokens(row["completion_tokens"]),
+                        "Tokens total (média)": tokens(row["total_tokens"]),
+                        "Chamadas ao LLM (média)": tokens(row["successful_requests"]),
+                        "Prompt fixo (tokens estimados)": tokens(
+                            row["static_prompt_tokens"]
+                        ),
+                    }
+                    for row in summary
+                ]
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption(
+            "Só análises concluídas; cache e roteador respondem sem LLM. Prompts v1:"
+            " listas de colunas escritas à mão; v2: esquema compacto gerado do"
+            " catálogo."
+        )
+
+
+def show_analysis_jobs():
+    """
+    Mostra as análises da sessão: em andamento (com cancelamento) e recém-concluídas.
+    """
+    manager = get_job_manager()
+    active_jobs = []
+
+    for job_id in list(st.session_state.get("analysis_jobs", [])):
+        job = manager.get_job(job_id)
+        if job is None:
+            st.session_state["analysis_jobs"].remove(job_id)
+            continue
+
+        if job["status"] in FINISHED_STATUSES:
+            # Job finalizado: vai para o histórico e sai da lista de acompanhamento
+            st.session_state["analysis_jobs"].remove(job_id)
+            st.session_state["last_analysis_job"] = job
+            if job["status"] == JOB_DONE:
+                st.session_state.setdefault("analysis_history", []).append(
+                    {
+                        "pergunta": job["pergunta"],
+                        "banco": job["banco"],
+                        "resultado": job["result"],
+                        "timestamp": time.strftime(
+                            "%Y-%m-%d %H:%M:%S", time.localtime(job["finished_at"])
+                        ),
+                    }
+                )
+        else:
+            active_jobs.append(job)
+
+    for job in active_jobs:
+        col_status, col_cancel = st.columns([5, 1])
+        with col_status:
+            status_text = (
+                "⏳ Na fila"
+                if job["status"] == JOB_PENDING
+                else (job["message"] or "🤖 Processando...")
+            )
+            st.info(
+                f"{status_text} - **{job['pergunta']}** ({job['elapsed_seconds']:.0f}s)"
+            )
+        with col_cancel:
+            if st.button("⏹️ Cancelar", key=f"cancel_job_{job['id']}"):
+                manager.cancel(job["id"])
+                st.rerun()
+
+    last_job = st.session_state.get("last_analysis_job")
+    if last_job:
+        if last_job["status"] == JOB_DONE:
+            st.success(f"✅ Análise concluída em {last_job['elapsed_seconds']:.1f}s!")
+            st.markdown("### 📋 Resultado da Análise:")
+            st.write(f"**Pergunta:** {last_job['pergunta']}")
+            st.write(last_job["result"])
+        elif last_job["status"] == JOB_CANCELLED:
+            st.warning(f"⏹️ Análise cancelada: {last_job['pergunta']}")
+        else:
+            st.error(f"❌ Erro durante a análise: {last_job['error']}")
+
+
+def process_ingest_jobs(jobs: list, archive_members: list = None) -> int:
+    """
+    Converte os CSVs em bancos SQLite (incremental e em paralelo) exibindo o progresso.
+    """
+
+    # Reaproveita os bancos cujo CSV não mudou desde a última ingestão
+    with st.spinner("Verificando arquivos já processados..."):
+        pending_jobs, reused_entries, csv_infos = plan_incremental_ingest(
+            jobs, archive_members=archive_members
+        )
+
+    for entry in reused_entries:
+        st.success(
+            "♻️ Banco reutilizado (CSV sem alterações):"
+            f" {os.path.basename(entry['db_path'])} - {entry['final_count']:,}"
+            " registros"
+        )
+
+    # Uma linha de progresso por arquivo, atualizada pelos processos do pool
+    progress_slots = {}
+    for csv_source, db_path in pending_jobs:
+        progress_slots[db_path] = st.empty()
+        progress_slots[db_path].caption(
+            f"⏳ {get_source_name(csv_source)}: aguardando..."
+        )
+
+    def report_progress(db_path: str, rows: int, chunks: int):
+        progress_slots[db_path].caption(
+            f"⏳ {os.path.basename(db_path)}: {rows:,} registros carregados ({chunks}"
+            " bloco(s))"
+        )
+
+    def report_result(result: dict):
+        if result["success"]:
+            progress_slots[result["db_path"]].caption(
+                f"✅ {result['source_name']}: {result['final_count']:,} registros"
+            )
+        else:
+            progress_slots[result["db_path"]].caption(
+                f"❌ {result['source_name']}: falhou"
+            )
+
+    with st.spinner(f"Processando {len(pending_jobs)} arquivo(s) em paralelo..."):
+        results = ingest_csv_files_parallel(
+            pending_jobs,
+            progress_callback=report_progress,
+            result_callback=report_result,
+        )
+
+    record_ingest_results(results, csv_infos)
+
+    # Bancos reconstruídos: conexões abertas para a versão anterior são descartadas
+    for result in results:
+        invalidate_pool(result["db_path"])
+        invalidate_query_cache(result["db_path"])
+        invalidate_answer_cache(result["db_path"])
+        get_crew_cache().invalidate(result["db_path"])
+
+    processed_count = len(reused_entries)
+    failed_count = 0
+
+    for result in results:
+        db_name = os.path.basename(result["db_path"])
+
+        if result["success"]:
+            st.success(f"✅ Banco criado: {db_name}")
+            show_ingest_report(result)
+            processed_count += 1
+
+            # Mostra informações do banco
+            schema_info = get_database_schema(result["db_path"], "schema")
+            with st.expander(f"📋 Informações do banco {db_name}"):
+                st.code(schema_info, language="text")
+        else:
+            st.error(
+                f"❌ Falha ao processar: {result['source_name']} ({result['error']})"
+            )
+            failed_count += 1
+
+    # Resumo do processamento
+    st.markdown("---")
+    if processed_count > 0:
+        st.success(f"🎉 **Processamento concluído!**")
+        st.success(f"✅ {processed_count} banco(s) SQLite pronto(s) com sucesso!")
+        if reused_entries:
+            st.info(
+                f"♻️ {len(reused_entries)} banco(s) reaproveitado(s) sem"
+                " reprocessamento"
+            )
+        if failed_count > 0:
+            st.warning(f"⚠️ {failed_count} arquivo(s) falharam no processamento")
+
+        st.markdown("---")
+        st.success(
+            "✅ **Sistema pronto!** Vá para a aba 'Análise' para fazer perguntas sobre"
+            " os dados!"
+        )
+    else:
+        st.error("❌ Nenhum arquivo pôde ser processado")
+
+    return processed_count
+
+
 def main():
     # Header
     st.title("🗂️ I2A2 - Análise Inteligente de Notas Fiscais")
-    st.markdown("### Sistema com SQLite para extração de arquivos RAR e análise de dados de notas fiscais")
-    
+    st.markdown(
+        "### Sistema com SQLite para extração de arquivos RAR e análise de dados de"
+        " notas fiscais"
+    )
+
     # Sidebar
     st.sidebar.title("⚙️ Configurações")
-    
+
     # Verificação da API Key
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -587,14 +926,14 @@ def main():
         return
     else:
         st.sidebar.success("✅ API Key configurada")
-    
+
     # Status da pasta dados
     dados_path = Path("dados")
     if dados_path.exists():
         csv_files = find_csv_files()
         db_files = find_db_files()
         st.sidebar.info(f"📁 Pasta dados: {len(csv_files)} CSV, {len(db_files)} DB")
-        
+
         # Mostra bancos disponíveis para análise
         if db_files:
             st.sidebar.success("🗄️ **Bancos prontos para análise:**")
@@ -604,251 +943,442 @@ def main():
             st.sidebar.warning("⏳ Nenhum banco pronto ainda")
     else:
         st.sidebar.warning("📁 Pasta dados não existe")
-    
+
     # Verifica ferramentas de extração RAR
     rar_status = check_extraction_tools()
     if rar_status["available"]:
-        st.sidebar.success(f"🔧 Ferramenta RAR: {os.path.basename(rar_status['command'])}")
+        st.sidebar.success(
+            f"🔧 Ferramenta RAR: {os.path.basename(rar_status['command'])}"
+        )
     else:
         st.sidebar.error("🔧 Nenhuma ferramenta RAR encontrada")
         st.sidebar.warning("Instale WinRAR ou 7-Zip")
-    
+
     # Tabs
     tab1, tab2, tab3 = st.tabs(["📤 Upload & Extração", "📊 Análise", "📋 Histórico"])
-    
+
     with tab1:
         st.header("📤 Upload e Extração de Arquivo RAR")
-        
+
         # Upload do arquivo RAR
         uploaded_rar = st.file_uploader(
-            "Selecione um arquivo RAR", 
-            type=['rar'],
-            help="Selecione o arquivo RAR que contém os dados para análise"
+            "Selecione um arquivo RAR",
+            type=["rar"],
+            help="Selecione o arquivo RAR que contém os dados para análise",
         )
-        
+
+        ingest_mode = st.radio(
+            "Modo de processamento:",
+            [INGEST_MODE_EXTRACT, INGEST_MODE_STREAM],
+            help=(
+                "O modo direto lê cada CSV de dentro do RAR e grava no SQLite sem criar"
+                " arquivos CSV em disco"
+            ),
+        )
+
+        unify_databases = st.checkbox(
+            "🔗 Unificar cabeçalhos e itens em um único banco",
+            value=False,
+            help=(
+                "Carrega os arquivos Cabecalho e Itens do mesmo período nas tabelas"
+                " 'cabecalho' e 'itens' de um único banco, ligadas por chave_de_acesso"
+            ),
+        )
+
         if uploaded_rar is not None:
             st.success(f"✅ Arquivo selecionado: {uploaded_rar.name}")
-            
-            if st.button("🚀 Descompactar o arquivo", type="primary", key="process_rar_button"):
-                
+
+            if st.button(
+                "🚀 Descompactar o arquivo", type="primary", key="process_rar_button"
+            ):
+
                 with st.spinner("Salvando arquivo..."):
                     # Salva o arquivo na pasta dados
                     rar_path = save_uploaded_file(uploaded_rar, "dados")
                     st.success(f"✅ Arquivo salvo em: {rar_path}")
-                
-                with st.spinner("Extraindo arquivo RAR..."):
+
+                if ingest_mode == INGEST_MODE_STREAM:
                     try:
-                        # Cria o agente extrator
-                        rar_agent = create_rar_extractor_agent()
-                        extraction_task = create_extraction_task(rar_path, rar_agent)
-                        
-                        extraction_crew = Crew(
-                            agents=[rar_agent],
-                            tasks=[extraction_task],
-                            verbose=False
+                        with st.spinner("Lendo conteúdo do arquivo RAR..."):
+                            archive_members = create_rar_extractor_tool().list_members(
+                                rar_path
+                            )
+                            jobs = plan_archive_jobs(rar_path, archive_members)
+                            if unify_databases:
+                                jobs = plan_unified_jobs(jobs)
+
+                        if not jobs:
+                            st.error("❌ Nenhum arquivo CSV encontrado no RAR")
+                        else:
+                            st.info(
+                                f"📊 {len(jobs)} arquivo(s) CSV no RAR, gravando direto"
+                                " no SQLite:"
+                            )
+                            for csv_source, _ in jobs:
+                                st.write(f"   📄 {get_source_name(csv_source)}")
+
+                            st.markdown("---")
+                            if process_ingest_jobs(jobs, archive_members) > 0:
+                                st.session_state["extraction_success"] = True
+                                st.rerun()
+
+                    except Exception as e:
+                        st.error(
+                            f"❌ Erro durante o processamento direto do RAR: {str(e)}"
                         )
-                        
-                        # Executa a extração
-                        extraction_result = extraction_crew.kickoff()
-                        
-                        # Extrai apenas o conteúdo raw
-                        extraction_raw = get_raw_result(extraction_result)
-                        
-                        # Verifica se a extração foi bem-sucedida
-                        success_indicators = [
-                            "✅" in extraction_raw,
-                            "Sucesso" in extraction_raw,
-                            "sucesso" in extraction_raw,
-                            "extraídos" in extraction_raw,
-                            "Arquivos extraídos" in extraction_raw
-                        ]
-                        
-                        error_indicators = [
-                            "❌" in extraction_raw,
-                            "Erro" in extraction_raw,
-                            "erro" in extraction_raw,
-                            "falha" in extraction_raw,
-                            "Falha" in extraction_raw
-                        ]
-                        
-                        # Verifica se há arquivos CSV na pasta dados após extração
-                        csv_files_after = find_csv_files()
-                        extraction_created_files = len(csv_files_after) > 0
-                        
-                        if any(success_indicators) and not any(error_indicators) or extraction_created_files:
-                            st.success("🎉 Extração concluída com sucesso!")
-                            
-                            if extraction_created_files:
-                                st.balloons()
-                                st.success(f"📦 Arquivo RAR descompactado com sucesso!")
-                                st.info(f"📊 {len(csv_files_after)} arquivo(s) CSV encontrado(s):")
-                                
-                                for csv_file in csv_files_after:
-                                    st.write(f"   📄 {csv_file}")
-                                
-                                # PROCESSAMENTO AUTOMÁTICO DOS CSVs
-                                st.markdown("---")
-                                st.info("🔄 **Processando arquivos CSV automaticamente...**")
-                                
-                                processed_count = 0
-                                failed_count = 0
-                                
-                                for csv_file in csv_files_after:
-                                    with st.spinner(f"Processando {csv_file}..."):
-                                        csv_path = f"dados/{csv_file}"
-                                        db_name = csv_file.replace('.csv', '.db')
-                                        db_path = f"dados/{db_name}"
-                                        
-                                        if create_database_from_csv(csv_path, db_path):
-                                            st.success(f"✅ Banco criado: {db_name}")
-                                            processed_count += 1
-                                            
-                                            # Mostra informações do banco
-                                            schema_info = get_database_schema(db_path, "schema")
-                                            with st.expander(f"📋 Informações do banco {db_name}"):
-                                                st.code(schema_info, language="text")
-                                        else:
-                                            st.error(f"❌ Falha ao processar: {csv_file}")
-                                            failed_count += 1
-                                
-                                # Resumo do processamento
-                                st.markdown("---")
-                                if processed_count > 0:
-                                    st.success(f"🎉 **Processamento concluído!**")
-                                    st.success(f"✅ {processed_count} banco(s) SQLite criado(s) com sucesso!")
-                                    if failed_count > 0:
-                                        st.warning(f"⚠️ {failed_count} arquivo(s) falharam no processamento")
-                                    
+
+                else:
+                    with st.spinner("Extraindo arquivo RAR..."):
+                        try:
+                            # Cria o agente extrator
+                            rar_agent = create_rar_extractor_agent()
+                            extraction_task = create_extraction_task(
+                                rar_path, rar_agent
+                            )
+
+                            extraction_crew = Crew(
+                                agents=[rar_agent],
+                                tasks=[extraction_task],
+                                verbose=False,
+                            )
+
+                            # Executa a extração
+                            extraction_result = extraction_crew.kickoff()
+
+                            # Extrai apenas o conteúdo raw
+                            extraction_raw = get_raw_result(extraction_result)
+
+                            # Verifica se a extração foi bem-sucedida
+                            success_indicators = [
+                                "✅" in extraction_raw,
+                                "Sucesso" in extraction_raw,
+                                "sucesso" in extraction_raw,
+                                "extraídos" in extraction_raw,
+                                "Arquivos extraídos" in extraction_raw,
+                            ]
+
+                            error_indicators = [
+                                "❌" in extraction_raw,
+                                "Erro" in extraction_raw,
+                                "erro" in extraction_raw,
+                                "falha" in extraction_raw,
+                                "Falha" in extraction_raw,
+                            ]
+
+                            # Verifica se há arquivos CSV na pasta dados após extração
+                            csv_files_after = find_csv_files()
+                            extraction_created_files = len(csv_files_after) > 0
+
+                            if (
+                                any(success_indicators)
+                                and not any(error_indicators)
+                                or extraction_created_files
+                            ):
+                                st.success("🎉 Extração concluída com sucesso!")
+
+                                if extraction_created_files:
+                                    st.balloons()
+                                    st.success(
+                                        f"📦 Arquivo RAR descompactado com sucesso!"
+                                    )
+                                    st.info(
+                                        f"📊 {len(csv_files_after)} arquivo(s) CSV"
+                                        " encontrado(s):"
+                                    )
+
+                                    for csv_file in csv_files_after:
+                                        st.write(f"   📄 {csv_file}")
+
+                                    # PROCESSAMENTO AUTOMÁTICO DOS CSVs
                                     st.markdown("---")
-                                    st.success("✅ **Sistema pronto!** Vá para a aba 'Análise' para fazer perguntas sobre os dados!")
-                                else:
-                                    st.error("❌ Nenhum arquivo pôde ser processado")
-                            
-                            with st.expander("📋 Ver detalhes da extração"):
+                                    st.info(
+                                        "🔄 **Processando arquivos CSV"
+                                        " automaticamente...**"
+                                    )
+
+                                    jobs = [
+                                        (
+                                            f"dados/{csv_file}",
+                                            f"dados/{csv_file.replace('.csv', '.db')}",
+                                        )
+                                        for csv_file in csv_files_after
+                                    ]
+                                    if unify_databases:
+                                        jobs = plan_unified_jobs(jobs)
+                                    process_ingest_jobs(jobs)
+
+                                with st.expander("📋 Ver detalhes da extração"):
+                                    st.code(extraction_raw, language="text")
+
+                                st.session_state["extraction_success"] = True
+                                st.rerun()
+
+                            else:
+                                st.error("❌ Falha na extração")
                                 st.code(extraction_raw, language="text")
-                            
-                            st.session_state['extraction_success'] = True
-                            st.rerun()
-                            
-                        else:
-                            st.error("❌ Falha na extração")
-                            st.code(extraction_raw, language="text")
-                            
-                    except Exception as e:
-                        st.error(f"❌ Erro durante a extração: {str(e)}")
-    
+
+                        except Exception as e:
+                            st.error(f"❌ Erro durante a extração: {str(e)}")
+
     with tab2:
         st.header("📊 Análise dos Dados")
-        
+
         # Lista os bancos SQLite disponíveis
         db_files = find_db_files()
-        
+
         if not db_files:
             st.warning("🗄️ Nenhum banco de dados encontrado na pasta dados.")
             st.info("Faça o upload e extração de um arquivo RAR primeiro.")
         else:
             # Seleção do banco de dados
             selected_db = st.selectbox(
-                "🗄️ Selecione o banco de dados para análise:",
-                db_files,
-                index=0
+                "🗄️ Selecione o banco de dados para análise:", db_files, index=0
             )
-            
+
             db_path = f"dados/{selected_db}"
-            
+
+            # Monta agentes e crews do banco em segundo
+            # plano enquanto o usuário escreve a pergunta
+            get_crew_cache().warm(db_path, build_analysis_crews)
+
             # Estatísticas rápidas do banco selecionado
             st.markdown("### 📈 Estatísticas Rápidas")
-            
+
             stats = get_database_statistics(db_path)
-            
-            if 'error' in stats:
+
+            if "error" in stats:
                 st.warning(f"Não foi possível carregar estatísticas: {stats['error']}")
             else:
                 # Exibe apenas o total de registros
                 st.metric("📊 Total de Registros", f"{stats['total_registros']:,}")
-            
+
             st.markdown("---")
-            
+
             # Mostra informações do banco selecionado
             with st.expander("📋 Informações do Banco de Dados"):
                 schema_info = get_database_schema(db_path, "schema")
                 st.code(schema_info, language="text")
-                
+
                 sample_info = get_database_schema(db_path, "sample")
                 st.code(sample_info, language="text")
-            
+
+                pool_metrics = get_pool_metrics(db_path)
+                if pool_metrics:
+                    st.caption(
+                        f"🔌 Conexões: {pool_metrics['open_connections']} aberta(s) de"
+                        f" {pool_metrics['max_size']} | {pool_metrics['checkouts']:,}"
+                        f" empréstimo(s), {pool_metrics['waits']} com espera | espera"
+                        f" média {pool_metrics['wait_seconds_avg'] * 1000:.2f} ms (máx."
+                        f" {pool_metrics['wait_seconds_max'] * 1000:.2f} ms)"
+                    )
+
+                cache_stats = get_query_cache_stats()
+                st.caption(
+                    f"🗃️ Cache de consultas: {cache_stats['hits']:,} acerto(s),"
+                    f" {cache_stats['misses']:,} falha(s)"
+                    f" ({cache_stats['hit_rate']:.0%}) | {cache_stats['entries']}"
+                    f" resultado(s), {cache_stats['bytes'] / 1024:,.1f} KB"
+                )
+
+                router_stats = get_intent_router_stats()
+                st.caption(
+                    f"🧭 Respostas sem LLM: {router_stats['hits']:,} de"
+                    f" {router_stats['hits'] + router_stats['misses']:,} pergunta(s)"
+                    f" ({router_stats['hit_rate']:.0%})"
+                )
+
+                answer_stats = get_answer_cache_stats()
+                st.caption(
+                    f"♻️ Respostas reaproveitadas: {answer_stats['hits']:,} iguais e"
+                    f" {answer_stats['similar_hits']:,} semelhantes,"
+                    f" {answer_stats['misses']:,} nova(s)"
+                    f" ({answer_stats['hit_rate']:.0%})"
+                )
+
+                crew_stats = get_crew_cache().get_stats()
+                crew_ready = get_crew_cache().is_ready(db_path)
+                st.caption(
+                    "🤖 Agentes pré-montados:"
+                    f" {'prontos' if crew_ready else 'montando'}"
+                    f" | {crew_stats['entries']} banco(s), {crew_stats['hits']:,}"
+                    f" reaproveitamento(s), {crew_stats['builds']} montagem(ns) de"
+                    f" {crew_stats['build_seconds_avg']:.2f}s em média"
+                )
+                if get_crew_cache().is_ready(db_path):
+                    prompt_tokens = get_crew_cache().get(db_path, build_analysis_crews)[
+                        "static_prompt_tokens"
+                    ]
+                    st.caption(
+                        f"📝 Prompt fixo (v{PROMPT_VERSION}, estimado):"
+                        f" ~{prompt_tokens[MODE_DUAL]:,} tokens com dois agentes,"
+                        f" ~{prompt_tokens[MODE_SINGLE]:,} com agente único"
+                    )
+
+            # Índices recomendados a partir das consultas mais frequentes
+            index_suggestions = suggest_indexes(db_path)
+            if index_suggestions:
+                with st.expander(f"🧭 Índices sugeridos ({len(index_suggestions)})"):
+                    for suggestion in index_suggestions:
+                        st.write(
+                            f"**{suggestion['table']}**"
+                            f" ({', '.join(suggestion['columns'])}) -"
+                            f" {suggestion['count']} consultas"
+                        )
+                        st.code(suggestion["statement"], language="sql")
+
+                    if st.button(
+                        "⚡ Criar índices sugeridos", key="create_indexes_button"
+                    ):
+                        with st.spinner("Criando índices..."):
+                            advisor_result = create_suggested_indexes(
+                                db_path, index_suggestions
+                            )
+                        if advisor_result["created"]:
+                            st.success(
+                                f"✅ {len(advisor_result['created'])} índice(s)"
+                                " criado(s)"
+                            )
+                        for error in advisor_result["errors"]:
+                            st.error(f"❌ {error}")
+
+            # Consultas do agente com planos custosos (varreduras, ordenações
+            # temporárias, índices ausentes)
+            plan_log = load_plan_log(db_path, limit=20)
+            if plan_log:
+                with st.expander(
+                    f"🩺 Planos de consulta sinalizados ({len(plan_log)})"
+                ):
+                    for entry in plan_log:
+                        st.write(
+                            f"**{entry['timestamp']}** -"
+                            f" {entry['pergunta'] or 'sem pergunta'}"
+                        )
+                        st.code(entry["query"], language="sql")
+                        for issue in entry["issues"]:
+                            st.caption(
+                                f"{ISSUE_LABELS[issue['kind']]}: {issue['detail']}"
+                            )
+                        if entry["indexes_created"]:
+                            st.caption(
+                                "⚡ Índice(s) criado(s):"
+                                f" {', '.join(entry['indexes_created'])}"
+                            )
+
             # Campo para a pergunta
             pergunta = st.text_input(
                 "❓ Digite sua pergunta sobre os dados:",
-                placeholder="Ex: Qual o produto com maior valor unitário ? Qual o principal emitente de notas fiscais ?",
+                placeholder=(
+                    "Ex: Qual o produto com maior valor unitário ? Qual o principal"
+                    " emitente de notas fiscais ?"
+                ),
             )
-            
-            # Botão para iniciar a análise
+
+            approximate = st.checkbox(
+                "⚡ Modo aproximado",
+                value=APPROX_MODE,
+                help=(
+                    "Distintos, medianas/percentis e rankings são respondidos pelos"
+                    " esboços gravados na ingestão, em milissegundos e com pequena"
+                    " margem de erro"
+                ),
+            )
+
+            # Motor de consulta escolhido por banco
+            # (a chave guarda a escolha de cada um)
+            engine_options = [ENGINE_AUTO] + available_engines(db_path)
+            engine = st.selectbox(
+                "🧮 Motor de consulta",
+                engine_options,
+                index=(
+                    engine_options.index(QUERY_ENGINE)
+                    if QUERY_ENGINE in engine_options
+                    else 0
+                ),
+                format_func=lambda name: ENGINE_LABELS[name],
+                key=f"query_engine_{selected_db}",
+                help=(
+                    "Automático: agregações sobre tabelas grandes vão para o DuckDB"
+                    " (colunar, sobre a cópia Parquet); buscas pontuais, listagens e"
+                    " busca textual ficam no SQLite"
+                ),
+            )
+
+            # Pipeline da análise: dois agentes (SQL + redator)
+            # ou só o agente SQL com formatação em Python
+            pipeline_options = [MODE_DUAL, MODE_SINGLE]
+            analysis_mode = st.radio(
+                "🤖 Pipeline de análise",
+                pipeline_options,
+                index=(
+                    pipeline_options.index(ANALYSIS_MODE)
+                    if ANALYSIS_MODE in pipeline_options
+                    else 0
+                ),
+                format_func=lambda name: MODE_LABELS[name],
+                horizontal=True,
+                key="analysis_mode",
+                help=(
+                    "Agente único: o resultado da consulta é formatado em Python (R$"
+                    " 1.234,56, top 10) e o agente redator não é executado,"
+                    " economizando uma chamada ao LLM"
+                ),
+            )
+
+            # Botão para iniciar a análise (executada em segundo plano)
             if st.button("🔍 Analisar Dados", type="primary", key="analyze_button"):
                 if not pergunta:
                     st.warning("⚠️ Por favor, digite uma pergunta antes de analisar.")
                 else:
-                    with st.spinner("🤖 Processando..."):
-                        try:
-                            # Cria os agentes
-                            sql_agent = create_csv_analyzer_agent(db_path)
-                            business_agent = create_business_analyst_agent()
-                            
-                            # Cria as tasks
-                            sql_task, business_task = create_analysis_task(pergunta, sql_agent, business_agent)
-                            
-                            analysis_crew = Crew(
-                                name="Tripulação de Análise Inteligente",
-                                agents=[sql_agent, business_agent],
-                                tasks=[sql_task, business_task],
-                                process=Process.sequential,
-                                verbose=False
-                            )
-                            
-                            # Executa a análise
-                            analysis_result = execute_with_retry(analysis_crew, {"pergunta": pergunta})
-                            
-                            # Extrai apenas o conteúdo raw
-                            analysis_raw = get_raw_result(analysis_result)
-                            
-                            # Exibe o resultado
-                            st.success("✅ Análise concluída!")
-                            st.markdown("### 📋 Resultado da Análise:")
-                            st.write(analysis_raw)
-                            
-                            # Salva no histórico
-                            if 'analysis_history' not in st.session_state:
-                                st.session_state['analysis_history'] = []
-                            
-                            st.session_state['analysis_history'].append({
-                                'pergunta': pergunta,
-                                'banco': selected_db,
-                                'resultado': analysis_raw,
-                                'timestamp': time.strftime("%Y-%m-%d %H:%M:%S")
-                            })
-                            
-                        except Exception as e:
-                            st.error(f"❌ Erro durante a análise: {str(e)}")
-                            st.exception(e)
-    
+                    job_id = get_job_manager().submit(
+                        create_analysis_job(
+                            db_path, pergunta, approximate, engine, analysis_mode
+                        ),
+                        pergunta,
+                        selected_db,
+                    )
+                    st.session_state.setdefault("analysis_jobs", []).append(job_id)
+
+            show_analysis_jobs()
+            show_analysis_comparison(db_path)
+
     with tab3:
         st.header("📋 Histórico de Análises")
-        
-        if 'analysis_history' in st.session_state and st.session_state['analysis_history']:
-            for i, analysis in enumerate(reversed(st.session_state['analysis_history'])):
-                with st.expander(f"📊 Análise {len(st.session_state['analysis_history']) - i} - {analysis['timestamp']}"):
+
+        if (
+            "analysis_history" in st.session_state
+            and st.session_state["analysis_history"]
+        ):
+            for i, analysis in enumerate(
+                reversed(st.session_state["analysis_history"])
+            ):
+                with st.expander(
+                    f"📊 Análise {len(st.session_state['analysis_history']) - i} -"
+                    f" {analysis['timestamp']}"
+                ):
                     st.write(f"**Banco:** {analysis['banco']}")
                     st.write(f"**Pergunta:** {analysis['pergunta']}")
                     st.write(f"**Resultado:**")
-                    st.write(analysis['resultado'])
-            
+                    st.write(analysis["resultado"])
+
             if st.button("🗑️ Limpar Histórico", key="clear_history_button"):
-                st.session_state['analysis_history'] = []
+                st.session_state["analysis_history"] = []
                 st.success("✅ Histórico limpo!")
                 st.rerun()
         else:
             st.info("📝 Nenhuma análise realizada ainda.")
-            st.write("As análises aparecerão aqui conforme você for utilizando o sistema.")
+            st.write(
+                "As análises aparecerão aqui conforme você for utilizando o sistema."
+            )
+
+    # Atualiza a página enquanto houver análises em andamento
+    manager = get_job_manager()
+    if any(
+        job is not None and job["status"] not in FINISHED_STATUSES
+        for job in map(manager.get_job, st.session_state.get("analysis_jobs", []))
+    ):
+        time.sleep(ANALYSIS_POLL_SECONDS)
+        st.rerun()
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
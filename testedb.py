@@ -17,6 +17,8 @@ from crewai import Agent, Task, Crew, Process, LLM
 
 from crewai.tools import tool
 
+from tools.ingest_tools import stream_csv_to_sqlite
+
 # Variável global para o caminho do banco
 DB_PATH = "notas_fiscais.db"
 
@@ -135,21 +137,21 @@ class SimpleNFAnalyzer:
     def setup_database(self) -> bool:
         """Converte CSV para SQLite"""
         try:
-            print("📊 Carregando CSV...")
-            
-            # Carrega CSV
-            df = pd.read_csv(self.csv_path, encoding='utf-8')
-            print(f"✅ CSV carregado: {len(df)} registros")
-            
-            # Limpa nomes das colunas
-            df.columns = [self._clean_column_name(col) for col in df.columns]
+            print("📊 Carregando CSV em blocos...")
             
-            # Processa dados
-            df = self._clean_data(df)
+            # Carrega, limpa e salva o CSV no SQLite bloco a bloco
+            report = stream_csv_to_sqlite(
+                self.csv_path,
+                self.db_path,
+                column_cleaner=self._clean_column_name,
+                data_cleaner=self._clean_data
+            )
+            print(f"✅ CSV carregado: {report['rows']} registros "
+                  f"({report['rows_per_second']:,.0f} registros/s)")
+            if report['peak_memory_mb'] is not None:
+                print(f"📈 Pico de memória (acima do início): {report['peak_memory_mb']:,.1f} MB")
             
-            # Salva no SQLite
             conn = sqlite3.connect(self.db_path)
-            df.to_sql('notas_fiscais', conn, if_exists='replace', index=False)
             
             # Cria índices básicos
             indexes = [
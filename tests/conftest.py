@@ -0,0 +1,25 @@
+"""
+Bancos sintéticos compartilhados pelos testes
+Arquivo: conftest.py
+"""
+
+import pytest
+
+from tools.database_tools import HEADER_TABLE, ITEMS_TABLE
+from tools.ingest_tools import ingest_csv_files_parallel
+from tools.synthetic_data_tools import generate_nfe_csvs
+
+
+@pytest.fixture(scope="session")
+def unified_db(tmp_path_factory):
+    """
+    Banco unificado (cabeçalhos + itens) criado
+    pela ingestão a partir de CSVs sintéticos.
+    """
+    folder = tmp_path_factory.mktemp("unificado")
+    data = generate_nfe_csvs(5000, str(folder), seed=7)
+    db_path = str(folder / "unificado.db")
+    source = {HEADER_TABLE: data["header_path"], ITEMS_TABLE: data["items_path"]}
+    result = ingest_csv_files_parallel([(source, db_path)], max_workers=1)[0]
+    assert result["success"], result["error"]
+    return db_path
@@ -0,0 +1,75 @@
+"""
+Testes do cache de respostas (perguntas iguais e parecidas)
+Arquivo: test_answer_cache_tools.py
+"""
+
+import sqlite3
+
+import pytest
+
+from tools.answer_cache_tools import (
+    question_terms,
+    question_similarity,
+    get_cached_answer,
+    store_answer,
+    invalidate_answer_cache,
+)
+
+
+def test_terms_ignore_order_accents_punctuation_and_stop_words():
+    assert question_terms("Qual é o Faturamento por MÊS?") == ["faturamento", "mes"]
+    assert question_terms("mês faturamento") == question_terms(
+        "Qual o faturamento por mês?"
+    )
+
+
+@pytest.mark.parametrize(
+    "pergunta, outra",
+    [
+        ("principal emitente", "principais emitentes"),
+        ("faturamento mensal", "faturamneto mensal"),
+        ("notas emitidas por estado", "nota emitida por estado"),
+    ],
+)
+def test_reworded_questions_are_similar(pergunta, outra):
+    assert question_similarity(question_terms(pergunta), question_terms(outra)) >= 0.8
+
+
+@pytest.mark.parametrize(
+    "pergunta, outra",
+    [
+        ("principal emitente em SP", "principal emitente em RJ"),
+        ("top 5 produtos", "top 10 produtos"),
+        ("produtos em ordem crescente", "produtos em ordem decrescente"),
+        ("valor total", "valor total em SP"),
+        ("faturamento mensal", ""),
+    ],
+)
+def test_different_questions_are_not_similar(pergunta, outra):
+    assert question_similarity(question_terms(pergunta), question_terms(outra)) == 0.0
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "respostas.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE itens (valor_total REAL)")
+    conn.close()
+    return path
+
+
+def test_cached_answer_is_reused_for_reworded_question(db_path):
+    store_answer(db_path, "Qual o principal emitente?", "EMPRESA X - R$ 10,00")
+
+    exact = get_cached_answer(db_path, "principal emitente")
+    similar = get_cached_answer(db_path, "Quais os principais emitentes?")
+    assert exact["exact"] and exact["answer"] == "EMPRESA X - R$ 10,00"
+    assert not similar["exact"] and similar["answer"] == "EMPRESA X - R$ 10,00"
+    assert get_cached_answer(db_path, "principal emitente em SP") is None
+    assert get_cached_answer(db_path, "principal emitente", approximate=True) is None
+
+
+def test_invalidated_answers_are_not_reused(db_path):
+    store_answer(db_path, "valor total", "R$ 1,00")
+    invalidate_answer_cache(db_path)
+    assert get_cached_answer(db_path, "valor total") is None
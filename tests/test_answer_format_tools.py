@@ -0,0 +1,36 @@
+"""
+Testes da formatação dos resultados na resposta final
+Arquivo: test_answer_format_tools.py
+"""
+
+import pandas as pd
+import pytest
+
+from tools.answer_format_tools import format_result_table
+
+
+@pytest.mark.parametrize(
+    "column", ["valor_total_notas", "total_valor_itens", "preco_medio", "valor_total"]
+)
+def test_money_columns_are_currency(column):
+    assert format_result_table(pd.DataFrame({column: [1234.5]})) == "R$ 1.234,50"
+
+
+@pytest.mark.parametrize("column", ["quantidade_notas", "total_de_itens", "qtd"])
+def test_count_columns_are_numbers(column):
+    assert format_result_table(pd.DataFrame({column: [1234]})) == "1.234"
+
+
+def test_ranking_formats_each_value_column():
+    df = pd.DataFrame(
+        {
+            "uf_emitente": ["SP", "RJ"],
+            "quantidade_notas": [10, 5],
+            "valor_total_notas": [1500.0, 700.25],
+        }
+    )
+    assert (
+        format_result_table(df)
+        == "1. SP - quantidade_notas: 10, valor_total_notas: R$ 1.500,00\n"
+        "2. RJ - quantidade_notas: 5, valor_total_notas: R$ 700,25"
+    )
@@ -0,0 +1,76 @@
+"""
+Testes da execução das consultas do agente (cache de resultados por motor)
+Arquivo: test_database_tools.py
+"""
+
+import sqlite3
+
+import pandas as pd
+
+from tools import query_cache_tools
+from tools.database_tools import execute_sql_query
+from tools.engine_tools import ENGINE_SQLITE, ENGINE_DUCKDB
+
+
+def test_cached_result_is_not_shared_between_engines(unified_db, monkeypatch):
+    query = "SELECT COUNT(*) AS itens FROM itens"
+    stored = []
+    original_store = query_cache_tools.store_result
+
+    def spy(db_path, sql, result, variant=""):
+        stored.append(variant)
+        original_store(db_path, sql, result, variant)
+
+    monkeypatch.setattr("tools.database_tools.store_result", spy)
+    execute_sql_query(unified_db, query, engine=ENGINE_SQLITE)
+    execute_sql_query(unified_db, query, engine=ENGINE_SQLITE, formatted=True)
+    assert stored == [ENGINE_SQLITE, f"{ENGINE_SQLITE}:formatted"]
+    assert query_cache_tools.get_cached_result(unified_db, query, ENGINE_DUCKDB) is None
+
+
+def test_plan_review_only_for_queries_run_on_sqlite(unified_db):
+    calls = []
+
+    def review():
+        calls.append(True)
+        return "⚠️ PLANO DE EXECUÇÃO CUSTOSO"
+
+    query = "SELECT MAX(valor_total) AS maior FROM itens WHERE quantidade > 3"
+    first = execute_sql_query(
+        unified_db, query, engine=ENGINE_SQLITE, plan_review=review
+    )
+    cached = execute_sql_query(
+        unified_db, query, engine=ENGINE_SQLITE, plan_review=review
+    )
+    assert calls == [True]
+    assert first.endswith("⚠️ PLANO DE EXECUÇÃO CUSTOSO")
+    assert "PLANO" not in cached
+
+    sketch_query = "SELECT COUNT(DISTINCT razao_social_emitente) FROM itens"
+    execute_sql_query(unified_db, sketch_query, approximate=True, plan_review=review)
+    assert calls == [True]
+
+
+def test_result_with_interrupted_count_is_not_cached(unified_db, monkeypatch):
+    class InterruptedCountEngine:
+        def run(self, db_path, query, time_budget=None, cancel_event=None):
+            return {
+                "dataframe": pd.DataFrame({"valor_total": [1.0, 2.0]}),
+                "total_rows": None,
+            }
+
+    monkeypatch.setattr(
+        "tools.database_tools.get_engine", lambda name: InterruptedCountEngine()
+    )
+    query = "SELECT valor_total FROM itens WHERE quantidade > 0"
+    result = execute_sql_query(unified_db, query, engine=ENGINE_SQLITE)
+
+    assert "contagem interrompida" in result
+    assert query_cache_tools.get_cached_result(unified_db, query, ENGINE_SQLITE) is None
+
+
+def test_only_select_queries_are_executed(unified_db):
+    result = execute_sql_query(unified_db, "DELETE FROM itens", engine=ENGINE_SQLITE)
+    assert result.startswith("❌")
+    with sqlite3.connect(unified_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0] > 0
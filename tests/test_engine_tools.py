@@ -0,0 +1,116 @@
+"""
+Testes da escolha do motor de consulta (SQLite x DuckDB)
+Arquivo: test_engine_tools.py
+"""
+
+import sqlite3
+
+import pytest
+
+from tools import engine_tools
+from tools.database_tools import execute_sql_query
+from tools.engine_tools import (
+    choose_engine,
+    get_engine,
+    ENGINE_AUTO,
+    ENGINE_DUCKDB,
+    ENGINE_SQLITE,
+)
+
+pytest.importorskip("duckdb")
+
+LIKE_QUERY = (
+    "SELECT uf_emitente, SUM(valor_total) AS total FROM itens "
+    "WHERE descricao_do_produto_servico LIKE '%agua%' GROUP BY uf_emitente"
+)
+DIVISION_QUERY = (
+    "SELECT uf_emitente, COUNT(*) / 7 AS semanas FROM itens GROUP BY uf_emitente"
+)
+AGGREGATE_QUERY = (
+    "SELECT uf_emitente, COUNT(DISTINCT chave_de_acesso) AS notas FROM itens GROUP BY"
+    " uf_emitente"
+)
+
+
+@pytest.fixture
+def columnar_db(unified_db, monkeypatch):
+    """
+    Banco unificado com o modo automático mandando qualquer agregação para o DuckDB.
+    """
+    if ENGINE_DUCKDB not in engine_tools.available_engines(unified_db):
+        pytest.skip("banco sem cópia Parquet")
+    monkeypatch.setattr(engine_tools, "COLUMNAR_MIN_ROWS", 0)
+    return unified_db
+
+
+def _rows(db_path, engine, query):
+    df = get_engine(engine).run(db_path, query, max_rows=1000)["dataframe"]
+    return sorted(map(tuple, df.itertuples(index=False)))
+
+
+def test_aggregates_go_to_duckdb(columnar_db):
+    assert choose_engine(columnar_db, AGGREGATE_QUERY, ENGINE_AUTO) == ENGINE_DUCKDB
+    assert _rows(columnar_db, ENGINE_SQLITE, AGGREGATE_QUERY) == _rows(
+        columnar_db, ENGINE_DUCKDB, AGGREGATE_QUERY
+    )
+
+
+@pytest.mark.parametrize("query", [LIKE_QUERY, DIVISION_QUERY])
+@pytest.mark.parametrize("engine", [ENGINE_AUTO, ENGINE_DUCKDB])
+def test_sqlite_semantics_stay_on_sqlite(columnar_db, query, engine):
+    assert choose_engine(columnar_db, query, engine) == ENGINE_SQLITE
+
+
+@pytest.mark.parametrize("query", [LIKE_QUERY, DIVISION_QUERY])
+def test_engines_differ_where_routing_keeps_sqlite(columnar_db, query):
+    # Os dois motores divergem nessas consultas:
+    # por isso elas não podem ir para o DuckDB
+    assert _rows(columnar_db, ENGINE_SQLITE, query) != _rows(
+        columnar_db, ENGINE_DUCKDB, query
+    )
+
+
+@pytest.mark.parametrize("query", [LIKE_QUERY, DIVISION_QUERY])
+def test_auto_mode_returns_sqlite_result(columnar_db, query):
+    sqlite_result = execute_sql_query(columnar_db, query, engine=ENGINE_SQLITE)
+    assert "Nenhum resultado" not in sqlite_result
+    assert execute_sql_query(columnar_db, query, engine=ENGINE_AUTO) == sqlite_result
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT * FROM itens WHERE chave_de_acesso = 'x'",
+        "SELECT uf_emitente, SUM(valor_total) FROM itens GROUP BY uf_emitente",
+        "SELECT strftime('%Y', data_emissao), COUNT(*) FROM cabecalho GROUP BY 1",
+        "SELECT COUNT(*) FROM itens_fts WHERE itens_fts MATCH 'notebook'",
+        "SELECT uf_emitente, COUNT(*) FROM itens WHERE rowid > 10 GROUP BY uf_emitente",
+    ],
+)
+def test_auto_mode_keeps_sqlite(columnar_db, query):
+    # Listagens, rollups, funções do SQLite e busca textual
+    assert choose_engine(columnar_db, query, ENGINE_AUTO) == ENGINE_SQLITE
+
+
+def test_explicit_engine_is_respected(columnar_db):
+    listing = "SELECT * FROM itens LIMIT 5"
+    assert choose_engine(columnar_db, listing, ENGINE_DUCKDB) == ENGINE_DUCKDB
+    assert choose_engine(columnar_db, AGGREGATE_QUERY, ENGINE_SQLITE) == ENGINE_SQLITE
+
+
+def test_small_tables_stay_on_sqlite(unified_db, monkeypatch):
+    monkeypatch.setattr(engine_tools, "COLUMNAR_MIN_ROWS", 10**9)
+    assert choose_engine(unified_db, AGGREGATE_QUERY, ENGINE_AUTO) == ENGINE_SQLITE
+
+
+def test_database_without_columnar_copy_uses_sqlite(tmp_path):
+    db_path = str(tmp_path / "sem_parquet.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE itens (uf_emitente TEXT, valor_total REAL)")
+    conn.close()
+    assert (
+        choose_engine(
+            db_path, "SELECT uf_emitente, COUNT(*) FROM itens GROUP BY 1", ENGINE_DUCKDB
+        )
+        == ENGINE_SQLITE
+    )
@@ -0,0 +1,49 @@
+"""
+Testes do índice de busca textual e das instruções dadas ao agente
+Arquivo: test_fulltext_tools.py
+"""
+
+import sqlite3
+
+from tools.fulltext_tools import build_fulltext_index, describe_fulltext_indexes
+
+
+def _search(conn, term):
+    return conn.execute(
+        "SELECT COUNT(*) FROM itens_fts WHERE itens_fts MATCH ?",
+        (f"descricao_do_produto_servico: {term}",),
+    ).fetchone()[0]
+
+
+def test_match_finds_words_and_prefixes_but_not_infixes():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE itens (descricao_do_produto_servico TEXT)")
+    conn.executemany(
+        "INSERT INTO itens VALUES (?)", [("NOTEBOOK DELL",), ("CAFÉ TORRADO",)]
+    )
+    build_fulltext_index(conn, "itens")
+
+    assert _search(conn, "notebook") == 1
+    assert _search(conn, "note*") == 1
+    assert _search(conn, "cafe") == 1
+    assert _search(conn, "book") == 0
+    assert (
+        conn.execute(
+            "SELECT COUNT(*) FROM itens WHERE descricao_do_produto_servico LIKE"
+            " '%book%'"
+        ).fetchone()[0]
+        == 1
+    )
+
+
+def test_guidance_keeps_like_for_infix_searches():
+    text = describe_fulltext_indexes(
+        {
+            "itens": {
+                "fts_table": "itens_fts",
+                "columns": ["descricao_do_produto_servico"],
+            }
+        }
+    )
+    assert "MATCH" in text
+    assert "LIKE '%trecho%'" in text
@@ -0,0 +1,45 @@
+"""
+Testes da criação dos índices sugeridos (cópia do banco trocada pelo arquivo)
+Arquivo: test_index_advisor_tools.py
+"""
+
+import os
+import shutil
+
+from tools.answer_cache_tools import get_content_version
+from tools.catalog_tools import load_catalog
+from tools.connection_tools import read_connection, get_file_identity
+from tools.index_advisor_tools import (
+    suggest_indexes_for_query,
+    create_suggested_indexes,
+)
+
+
+def test_indexes_are_built_on_a_copy_and_keep_the_catalog(unified_db, tmp_path):
+    db_path = str(tmp_path / "indices.db")
+    shutil.copy(unified_db, db_path)
+    version = get_content_version(db_path)
+    identity = get_file_identity(db_path)
+
+    suggestions = suggest_indexes_for_query(
+        db_path, "SELECT COUNT(*) FROM itens WHERE quantidade = 3"
+    )
+    assert suggestions
+    result = create_suggested_indexes(db_path, suggestions)
+
+    assert result == {"created": [suggestions[0]["name"]], "errors": []}
+    assert get_file_identity(db_path) != identity
+    with read_connection(db_path) as conn:
+        names = {
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+        }
+    assert suggestions[0]["name"] in names
+    assert (
+        load_catalog(db_path)["objects"].keys()
+        == load_catalog(unified_db)["objects"].keys()
+    )
+    assert get_content_version(db_path) == version
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".building")]
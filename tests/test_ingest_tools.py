@@ -0,0 +1,22 @@
+"""
+Testes das métricas da ingestão
+Arquivo: test_ingest_tools.py
+"""
+
+import pytest
+
+from tools.ingest_tools import MemorySampler, get_memory_mb
+
+
+def test_memory_sampler_reports_growth_since_start():
+    if get_memory_mb() is None:
+        pytest.skip("memória do processo indisponível neste sistema")
+
+    sampler = MemorySampler()
+    block = bytearray(64 * 1024 * 1024)
+    block[::4096] = b"\1" * len(block[::4096])
+    sampler.sample()
+    del block
+
+    assert sampler.peak_delta_mb() >= 32
+    assert MemorySampler().peak_delta_mb() < 32
@@ -0,0 +1,67 @@
+"""
+Testes do roteador de intenções (perguntas frequentes respondidas sem LLM)
+Arquivo: test_intent_router_tools.py
+"""
+
+import sqlite3
+
+import pytest
+
+from tools.answer_format_tools import format_number
+from tools.intent_router_tools import match_intent, answer_with_intent
+
+
+@pytest.mark.parametrize(
+    "pergunta, intent",
+    [
+        ("Quantos registros existem no banco?", "total_registros"),
+        ("Qual é o número de registros?", "total_registros"),
+        ("Quantas notas fiscais foram emitidas?", "total_notas"),
+        ("Total de notas", "total_notas"),
+        ("Qual o valor total das notas fiscais?", "valor_total"),
+        ("Soma dos valores dos itens", "valor_total"),
+        ("Quem é o principal emitente?", "principal_emitente"),
+        ("Top 5 maiores emitentes por valor", "principal_emitente"),
+        ("Qual o maior destinatário das notas fiscais?", "principal_destinatario"),
+        ("Qual é o produto mais caro?", "produto_mais_caro"),
+        ("Valor total por UF", "valor_por_uf"),
+        ("Faturamento por estado de destino", "valor_por_uf"),
+        ("Evolução mensal das vendas", "valor_por_mes"),
+        ("Valor total por mês", "valor_por_mes"),
+    ],
+)
+def test_frequent_questions_match_their_intent(unified_db, pergunta, intent):
+    plan = match_intent(unified_db, pergunta)
+    assert plan is not None
+    assert plan["intent"] == intent
+
+
+@pytest.mark.parametrize(
+    "pergunta",
+    [
+        "Quantas notas fiscais foram emitidas em SP?",
+        "Qual o valor total das notas de janeiro?",
+        "Principal emitente de combustíveis",
+        "Qual a média de itens por nota?",
+        "Compare o faturamento de SP e RJ",
+    ],
+)
+def test_questions_with_details_go_to_the_agents(unified_db, pergunta):
+    assert match_intent(unified_db, pergunta) is None
+
+
+def test_top_count_and_destination_are_read_from_the_question(unified_db):
+    assert "LIMIT 5" in match_intent(unified_db, "Top 5 maiores emitentes")["query"]
+    origem = match_intent(unified_db, "Valor total por UF")["query"]
+    destino = match_intent(unified_db, "Valor total por UF de destino")["query"]
+    assert origem != destino
+
+
+def test_answer_matches_the_database(unified_db):
+    conn = sqlite3.connect(unified_db)
+    notas = conn.execute("SELECT COUNT(*) FROM cabecalho").fetchone()[0]
+    conn.close()
+
+    result = answer_with_intent(unified_db, "Quantas notas fiscais existem?")
+    assert result["intent"] == "total_notas"
+    assert format_number(notas) in result["answer"]
@@ -0,0 +1,30 @@
+"""
+Testes da descrição compacta do esquema usada nos prompts
+Arquivo: test_prompt_tools.py
+"""
+
+import sqlite3
+
+from tools.prompt_tools import describe_schema_compact
+
+DIA_SEMANA_NOTE = "dia_semana: 0=segunda"
+
+
+def test_weekday_note_for_integer_column(unified_db):
+    assert DIA_SEMANA_NOTE in describe_schema_compact(unified_db)
+
+
+def test_no_weekday_note_for_old_database_without_catalog(tmp_path):
+    db_path = str(tmp_path / "antigo.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE notas_fiscais"
+            " (data_emissao TEXT, dia_semana TEXT, valor_total REAL)"
+        )
+        conn.execute(
+            "INSERT INTO notas_fiscais VALUES ('2024-01-04', 'Thursday', 10.5)"
+        )
+
+    schema = describe_schema_compact(db_path)
+    assert "dia_semana" in schema
+    assert DIA_SEMANA_NOTE not in schema
@@ -0,0 +1,79 @@
+"""
+Testes da reescrita de consultas agregadas para as tabelas pré-agregadas
+Arquivo: test_rollup_tools.py
+"""
+
+import sqlite3
+
+import pytest
+
+from tools.rollup_tools import load_rollup_catalog, rewrite_with_rollups
+
+
+def _run(db_path, query):
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(query)
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    return columns, sorted(
+        tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+        for row in rows
+    )
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        (
+            "SELECT uf_emitente, SUM(valor_total) AS total FROM itens GROUP BY"
+            " uf_emitente ORDER BY total DESC"
+        ),
+        "SELECT cfop, COUNT(*), MAX(valor_total) FROM itens GROUP BY cfop",
+        "SELECT ano, mes, AVG(quantidade) AS media FROM itens GROUP BY ano, mes",
+        "SELECT SUM(valor_total) FROM notas_fiscais WHERE uf_emitente = 'SP'",
+        "SELECT COUNT(*) AS notas FROM cabecalho WHERE uf_emitente IN ('SP', 'RJ');",
+    ],
+)
+def test_rewritten_query_matches_original(unified_db, query):
+    rewritten = rewrite_with_rollups(query, load_rollup_catalog(unified_db))
+    assert rewritten is not None
+    sql, rollup_table = rewritten
+    assert rollup_table in sql
+    assert _run(unified_db, sql) == _run(unified_db, query)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        (
+            "SELECT uf_emitente, COUNT(DISTINCT chave_de_acesso) FROM itens GROUP BY"
+            " uf_emitente"
+        ),
+        (
+            "SELECT uf_emitente, cfop, SUM(valor_total) FROM itens GROUP BY"
+            " uf_emitente, cfop"
+        ),
+        "SELECT uf_emitente, SUM(valor_unitário) FROM itens GROUP BY uf_emitente",
+        "SELECT uf_emitente FROM itens GROUP BY uf_emitente",
+        (
+            "SELECT i.uf_emitente, SUM(i.valor_total) FROM itens i JOIN cabecalho c"
+            " USING (chave_de_acesso) GROUP BY 1"
+        ),
+        "SELECT SUM(valor_total) FROM itens WHERE quantidade > 3",
+        "SELECT SUM(valor_total) FROM (SELECT * FROM itens)",
+    ],
+)
+def test_queries_outside_the_rollups_are_not_rewritten(unified_db, query):
+    assert rewrite_with_rollups(query, load_rollup_catalog(unified_db)) is None
+
+
+def test_without_catalog_nothing_is_rewritten():
+    assert (
+        rewrite_with_rollups(
+            "SELECT uf_emitente, SUM(valor_total) FROM itens GROUP BY uf_emitente", []
+        )
+        is None
+    )
@@ -0,0 +1,180 @@
+"""
+Ferramentas de execução assíncrona das análises (fila de jobs canceláveis)
+Arquivo: analysis_jobs_tools.py
+"""
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+# Análises executadas ao mesmo tempo (as demais aguardam na fila)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+
+# Jobs finalizados mantidos em memória para consulta pela interface
+MAX_FINISHED_JOBS = 100
+
+JOB_PENDING = "pendente"
+JOB_RUNNING = "executando"
+JOB_DONE = "concluido"
+JOB_FAILED = "erro"
+JOB_CANCELLED = "cancelado"
+
+FINISHED_STATUSES = {JOB_DONE, JOB_FAILED, JOB_CANCELLED}
+
+
+class AnalysisCancelledError(Exception):
+    """Análise interrompida a pedido do usuário."""
+
+
+class AnalysisJobManager:
+    """
+    Executa análises em threads de fundo, fora da thread do script do Streamlit.
+
+    Cada job recebe um id, um evento de cancelamento e uma função para
+    publicar mensagens de andamento; a interface consulta o estado pelo id.
+    O cancelamento é cooperativo: a função do job deve verificar o evento
+    (as consultas SQL em andamento são interrompidas por ele).
+    """
+
+    def __init__(self, max_workers: int = ANALYSIS_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="analysis"
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        func: Callable[[threading.Event, Callable[[str], None]], str],
+        pergunta: str,
+        banco: str,
+    ) -> str:
+        """
+        Enfileira uma análise.
+
+        Args:
+            func: Função chamada com (evento de cancelamento,
+                função de mensagens) que retorna o resultado
+            pergunta (str): Pergunta do usuário
+            banco (str): Banco analisado
+
+        Returns:
+            str: Id do job
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "pergunta": pergunta,
+            "banco": banco,
+            "status": JOB_PENDING,
+            "message": None,
+            "result": None,
+            "error": None,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+
+        with self._lock:
+            self._jobs[job_id] = {
+                "job": job,
+                "cancel_event": threading.Event(),
+                "future": None,
+            }
+            self._prune()
+
+        future = self._executor.submit(self._run, job_id, func)
+        with self._lock:
+            self._jobs[job_id]["future"] = future
+        return job_id
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            self._jobs[job_id]["job"].update(changes)
+
+    def _run(self, job_id: str, func: Callable):
+        """
+        Executa o job na thread de fundo, registrando resultado, erro ou cancelamento.
+        """
+        cancel_event = self._jobs[job_id]["cancel_event"]
+        if cancel_event.is_set():
+            self._update(job_id, status=JOB_CANCELLED, finished_at=time.time())
+            return
+
+        self._update(job_id, status=JOB_RUNNING, started_at=time.time())
+        try:
+            result = func(
+                cancel_event, lambda message: self._update(job_id, message=message)
+            )
+            if cancel_event.is_set():
+                self._update(job_id, status=JOB_CANCELLED, finished_at=time.time())
+            else:
+                self._update(
+                    job_id, status=JOB_DONE, result=result, finished_at=time.time()
+                )
+        except Exception as e:
+            status = (
+                JOB_CANCELLED
+                if cancel_event.is_set() or isinstance(e, AnalysisCancelledError)
+                else JOB_FAILED
+            )
+            self._update(job_id, status=status, error=str(e), finished_at=time.time())
+
+    def cancel(self, job_id: str) -> bool:
+        """Solicita o cancelamento do job; jobs ainda na fila são removidos dela."""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry["job"]["status"] in FINISHED_STATUSES:
+                return False
+            entry["cancel_event"].set()
+            entry["job"]["message"] = "Cancelamento solicitado..."
+            future = entry["future"]
+
+        if future is not None and future.cancel():
+            self._update(job_id, status=JOB_CANCELLED, finished_at=time.time())
+        return True
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Cópia do estado do job (com o tempo decorrido), ou None se não existir."""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return None
+            job = dict(entry["job"])
+
+        started = job["started_at"] or job["submitted_at"]
+        job["elapsed_seconds"] = (job["finished_at"] or time.time()) - started
+        return job
+
+    def list_jobs(self) -> List[dict]:
+        """Estado de todos os jobs, do mais antigo ao mais recente."""
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [job for job in (self.get_job(job_id) for job_id in job_ids) if job]
+
+    def _prune(self):
+        """Descarta os jobs finalizados mais antigos (chamado com o lock adquirido)."""
+        finished = [
+            job_id
+            for job_id, entry in self._jobs.items()
+            if entry["job"]["status"] in FINISHED_STATUSES
+        ]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> AnalysisJobManager:
+    """Gerenciador de jobs do processo (compartilhado por todas as sessões)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = AnalysisJobManager()
+        return _manager
@@ -0,0 +1,189 @@
+"""
+Ferramentas de registro da latência e do consumo de tokens de cada análise, por pipeline
+Arquivo: analysis_metrics_tools.py
+"""
+
+import os
+import json
+import statistics
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+ANALYSIS_LOG_FILENAME = "analysis_runs.jsonl"
+
+# Tamanho máximo do registro de análises (o anterior é mantido como .1)
+ANALYSIS_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+# Pipelines comparados: dois agentes (SQL + redator), só o agente SQL com
+# formatação em Python e as respostas sem LLM (roteador de intenções e cache)
+MODE_DUAL = "dual"
+MODE_SINGLE = "single"
+MODE_ROUTER = "router"
+MODE_CACHE = "cache"
+
+MODE_LABELS = {
+    MODE_DUAL: "Dois agentes (SQL + redator)",
+    MODE_SINGLE: "Agente único (formatação em Python)",
+    MODE_ROUTER: "Roteador de intenções",
+    MODE_CACHE: "Cache de respostas",
+}
+
+TOKEN_FIELDS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "successful_requests",
+)
+
+# Consumo das respostas dadas sem LLM (cache e roteador)
+NO_LLM_USAGE = {field: 0 for field in TOKEN_FIELDS}
+
+_log_lock = threading.Lock()
+
+
+def get_analysis_log_path(db_path: str) -> Path:
+    """Retorna o caminho do registro de análises da pasta do banco."""
+    return Path(os.path.dirname(db_path) or ".") / ANALYSIS_LOG_FILENAME
+
+
+def extract_token_usage(result) -> Optional[dict]:
+    """
+    Tokens consumidos pela execução da crew (CrewOutput.token_usage).
+
+    Returns:
+        dict: prompt_tokens, completion_tokens, total_tokens e successful_requests
+              (None se a versão do CrewAI não informar o consumo)
+    """
+    usage = getattr(result, "token_usage", None)
+    if usage is None:
+        return None
+    if not isinstance(usage, dict):
+        usage = {field: getattr(usage, field, None) for field in TOKEN_FIELDS}
+    return {field: int(usage.get(field) or 0) for field in TOKEN_FIELDS}
+
+
+def record_analysis_run(
+    db_path: str,
+    mode: str,
+    pergunta: str,
+    elapsed_seconds: float,
+    token_usage: Optional[dict] = None,
+    status: str = "completed",
+    prompt_version: Optional[int] = None,
+    static_prompt_tokens: Optional[int] = None,
+):
+    """
+    Acrescenta a análise ao registro da pasta do banco (JSON por linha).
+
+    Análises com LLM gravam também a versão dos prompts e o tamanho estimado
+    da parte fixa do prompt (agentes, ferramentas e tasks sem a pergunta).
+    """
+    log_path = get_analysis_log_path(db_path)
+    entry = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "db_path": db_path,
+        "mode": mode,
+        "pergunta": pergunta,
+        "status": status,
+        "elapsed_seconds": round(elapsed_seconds, 3),
+        "token_usage": token_usage,
+        "prompt_version": prompt_version,
+        "static_prompt_tokens": static_prompt_tokens,
+    }
+
+    with _log_lock:
+        try:
+            if log_path.exists() and log_path.stat().st_size > ANALYSIS_LOG_MAX_BYTES:
+                os.replace(log_path, log_path.with_suffix(".1.jsonl"))
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def load_analysis_runs(db_path: str, limit: int = 500) -> List[dict]:
+    """Últimas análises registradas para o banco, da mais recente para a mais antiga."""
+    log_path = get_analysis_log_path(db_path)
+    if not log_path.exists():
+        return []
+
+    entries = []
+    try:
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("db_path") == db_path:
+                    entries.append(entry)
+    except OSError:
+        return []
+    return entries[::-1][:limit]
+
+
+def summarize_analysis_runs(runs: List[dict]) -> List[dict]:
+    """
+    Comparação lado a lado dos pipelines.
+
+    Só entram análises concluídas; as médias de tokens consideram apenas as
+    execuções em que o CrewAI informou o consumo. Pipelines com LLM são
+    separados por versão dos prompts (registros sem versão são da versão 1),
+    para comparar o consumo antes e depois de uma mudança nos prompts.
+
+    Returns:
+        List[dict]: Por pipeline e versão dos prompts, quantidade de análises,
+                    mediana e p90 da latência, média de tokens (prompt, resposta,
+                    total), de chamadas ao LLM e da parte fixa estimada do prompt
+    """
+    groups = {}
+    for run in runs:
+        if run.get("status") == "completed":
+            version = (
+                (run.get("prompt_version") or 1)
+                if run["mode"] in (MODE_DUAL, MODE_SINGLE)
+                else None
+            )
+            groups.setdefault((run["mode"], version), []).append(run)
+
+    order = list(MODE_LABELS)
+    summary = []
+    for mode, version in sorted(
+        groups,
+        key=lambda key: (
+            order.index(key[0]) if key[0] in order else len(order),
+            key[0],
+            key[1] or 0,
+        ),
+    ):
+        mode_runs = groups[(mode, version)]
+        latencies = sorted(run["elapsed_seconds"] for run in mode_runs)
+        usages = [run["token_usage"] for run in mode_runs if run.get("token_usage")]
+        static_tokens = [
+            run["static_prompt_tokens"]
+            for run in mode_runs
+            if run.get("static_prompt_tokens")
+        ]
+        row = {
+            "mode": mode,
+            "label": MODE_LABELS.get(mode, mode),
+            "prompt_version": version,
+            "runs": len(mode_runs),
+            "median_seconds": statistics.median(latencies),
+            "p90_seconds": latencies[
+                min(len(latencies) - 1, int(len(latencies) * 0.9))
+            ],
+        }
+        for field in TOKEN_FIELDS:
+            row[field] = (
+                sum(usage.get(field, 0) for usage in usages) / len(usages)
+                if usages
+                else None
+            )
+        row["static_prompt_tokens"] = (
+            sum(static_tokens) / len(static_tokens) if static_tokens else None
+        )
+        summary.append(row)
+    return summary
@@ -0,0 +1,342 @@
+"""
+Ferramentas de cache persistente de respostas por banco, com busca por semelhança
+Arquivo: answer_cache_tools.py
+"""
+
+import os
+import re
+import json
+import time
+import difflib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import List, Optional
+
+from tools.catalog_tools import load_catalog
+from tools.connection_tools import get_file_identity
+
+ANSWER_CACHE_FILENAME = "answer_cache.json"
+
+# Respostas guardadas por banco (as usadas há mais tempo são descartadas)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "200"))
+
+# Validade de cada resposta (horas); o banco reconstruído descarta todas antes disso
+ANSWER_CACHE_TTL_HOURS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", "168"))
+
+# Semelhança mínima entre palavras para a pergunta
+# contar como a mesma (erros de digitação, plurais)
+ANSWER_CACHE_WORD_SIMILARITY = float(os.getenv("ANSWER_CACHE_WORD_SIMILARITY", "0.8"))
+
+# Palavras menores que isso (UFs, siglas) precisam ser iguais; as demais devem ter o
+# mesmo início ("crescente" e "decrescente" são parecidas, mas opostas)
+MIN_FUZZY_WORD_LENGTH = 4
+
+# Palavras que não mudam o sentido da pergunta
+STOP_WORDS = {
+    "a",
+    "o",
+    "as",
+    "os",
+    "um",
+    "uma",
+    "de",
+    "do",
+    "da",
+    "dos",
+    "das",
+    "e",
+    "eh",
+    "em",
+    "no",
+    "na",
+    "nos",
+    "nas",
+    "qual",
+    "quais",
+    "me",
+    "diga",
+    "mostre",
+    "informe",
+    "por",
+    "favor",
+    "sao",
+    "foi",
+    "foram",
+    "que",
+    "ha",
+    "tem",
+    "existem",
+    "existe",
+    "banco",
+    "dados",
+    "arquivo",
+    "voce",
+    "pode",
+    "poderia",
+    "gostaria",
+    "saber",
+    "fiscal",
+    "fiscais",
+}
+
+_cache_lock = threading.Lock()
+_caches = {}
+_stats = {"hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def get_answer_cache_path(db_path: str) -> Path:
+    """Retorna o caminho do cache de respostas da pasta do banco."""
+    return Path(os.path.dirname(db_path) or ".") / ANSWER_CACHE_FILENAME
+
+
+def get_content_version(db_path: str) -> Optional[str]:
+    """
+    Versão do conteúdo do banco.
+
+    Usa o momento da ingestão gravado no catálogo: só muda quando o banco é
+    reconstruído, e não quando ganha um índice (que também troca o arquivo).
+    Bancos sem catálogo usam a identidade do arquivo.
+    """
+    identity = get_file_identity(db_path)
+    if identity is None:
+        return None
+    catalog = load_catalog(db_path)
+    if catalog and catalog.get("created_at"):
+        return catalog["created_at"]
+    return ":".join(str(part) for part in identity)
+
+
+def normalize_question(pergunta: str) -> str:
+    """Minúsculas, sem acentos nem pontuação e com espaços simples."""
+    text = unicodedata.normalize("NFKD", pergunta.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def question_terms(pergunta: str) -> List[str]:
+    """
+    Palavras que definem a pergunta: normalizadas,
+    sem palavras vazias e em ordem alfabética.
+    """
+    return sorted(
+        {
+            word
+            for word in normalize_question(pergunta).split()
+            if word not in STOP_WORDS
+        }
+    )
+
+
+def _same_word(word: str, other: str) -> bool:
+    if word == other:
+        return True
+    if (
+        any(char.isdigit() for char in word + other)
+        or min(len(word), len(other)) < MIN_FUZZY_WORD_LENGTH
+    ):
+        return False
+    if word[:3] != other[:3]:
+        return False
+    return (
+        difflib.SequenceMatcher(None, word, other).ratio()
+        >= ANSWER_CACHE_WORD_SIMILARITY
+    )
+
+
+def question_similarity(terms: List[str], other_terms: List[str]) -> float:
+    """
+    Semelhança entre duas perguntas (0 a 1).
+
+    Toda palavra de uma pergunta precisa ter uma equivalente na outra,
+    igual ou muito parecida (plural, erro de digitação); números, siglas e
+    palavras curtas precisam ser idênticos. Assim "principal emitente em SP"
+    nunca reaproveita a resposta de "principal emitente em RJ".
+
+    Returns:
+        float: Média da semelhança das palavras (0
+            se alguma palavra não tiver equivalente)
+    """
+    if not terms or not other_terms:
+        return 0.0
+
+    scores = []
+    for source, target in ((terms, other_terms), (other_terms, terms)):
+        for word in source:
+            matches = [
+                difflib.SequenceMatcher(None, word, candidate).ratio()
+                for candidate in target
+                if _same_word(word, candidate)
+            ]
+            if not matches:
+                return 0.0
+            scores.append(max(matches))
+    return sum(scores) / len(scores)
+
+
+def _load(db_path: str) -> dict:
+    """
+    Cache da pasta do banco, lido do disco na
+    primeira vez (chamado com o lock adquirido).
+    """
+    cache_path = get_answer_cache_path(db_path)
+    key = str(cache_path.resolve())
+    if key not in _caches:
+        cache = {}
+        if cache_path.exists():
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                # Cache corrompido: começa vazio
+                cache = {}
+        _caches[key] = cache if isinstance(cache, dict) else {}
+    return _caches[key]
+
+
+def _save(db_path: str, cache: dict):
+    """Grava o cache da pasta de forma atômica (arquivo temporário + rename)."""
+    cache_path = get_answer_cache_path(db_path)
+    tmp_path = cache_path.with_suffix(".tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def _database_entries(cache: dict, db_path: str, version: Optional[str]) -> list:
+    """
+    Respostas válidas do banco (chamado com o lock adquirido).
+
+    Descarta todas se a versão do banco mudou e as que passaram da validade;
+    a lista devolvida é a própria lista do cache.
+    """
+    db_key = os.path.abspath(db_path)
+    database = cache.get(db_key)
+    if database is None or database.get("version") != version:
+        if database is not None:
+            _stats["invalidations"] += 1
+        database = cache[db_key] = {"version": version, "entries": []}
+
+    expires = time.time() - ANSWER_CACHE_TTL_HOURS * 3600
+    valid = [entry for entry in database["entries"] if entry["created_at"] >= expires]
+    _stats["evictions"] += len(database["entries"]) - len(valid)
+    database["entries"] = valid
+    return valid
+
+
+def get_cached_answer(
+    db_path: str, pergunta: str, approximate: bool = False
+) -> Optional[dict]:
+    """
+    Procura a resposta de uma pergunta igual ou parecida no mesmo banco.
+
+    A busca é só lexical e local: primeiro a pergunta com as mesmas palavras
+    (ignorando ordem, acentos, pontuação e palavras vazias) e depois a mais
+    parecida segundo question_similarity. Respostas do modo aproximado não
+    são misturadas com as exatas.
+
+    Returns:
+        dict: Pergunta original, resposta, semelhança
+            e se foi igual (None se não houver)
+    """
+    version = get_content_version(db_path)
+    if version is None:
+        return None
+    terms = question_terms(pergunta)
+
+    with _cache_lock:
+        cache = _load(db_path)
+        entries = [
+            entry
+            for entry in _database_entries(cache, db_path, version)
+            if entry["approximate"] == approximate
+        ]
+
+        best, best_score = None, 0.0
+        for entry in entries:
+            score = (
+                1.0
+                if entry["terms"] == terms
+                else question_similarity(terms, entry["terms"])
+            )
+            if score > best_score:
+                best, best_score = entry, score
+            if score == 1.0:
+                break
+
+        if best is None:
+            _stats["misses"] += 1
+            return None
+
+        exact = best["terms"] == terms
+        _stats["hits" if exact else "similar_hits"] += 1
+        best["last_used"] = time.time()
+        best["hits"] += 1
+        _save(db_path, cache)
+        return {
+            "pergunta": best["pergunta"],
+            "answer": best["answer"],
+            "similarity": best_score,
+            "exact": exact,
+        }
+
+
+def store_answer(db_path: str, pergunta: str, answer: str, approximate: bool = False):
+    """Guarda a resposta da pergunta para a versão atual do banco."""
+    version = get_content_version(db_path)
+    terms = question_terms(pergunta)
+    if version is None or not terms:
+        return
+
+    with _cache_lock:
+        cache = _load(db_path)
+        entries = _database_entries(cache, db_path, version)
+        entries[:] = [
+            entry
+            for entry in entries
+            if not (entry["terms"] == terms and entry["approximate"] == approximate)
+        ]
+        now = time.time()
+        entries.append(
+            {
+                "pergunta": pergunta,
+                "terms": terms,
+                "answer": answer,
+                "approximate": approximate,
+                "created_at": now,
+                "last_used": now,
+                "hits": 0,
+            }
+        )
+
+        if len(entries) > ANSWER_CACHE_MAX_ENTRIES:
+            entries.sort(key=lambda entry: entry["last_used"])
+            _stats["evictions"] += len(entries) - ANSWER_CACHE_MAX_ENTRIES
+            del entries[: len(entries) - ANSWER_CACHE_MAX_ENTRIES]
+        _save(db_path, cache)
+
+
+def invalidate_answer_cache(db_path: str):
+    """
+    Descarta as respostas guardadas do banco
+    (usado após reconstruir ou alterar o banco).
+    """
+    with _cache_lock:
+        cache = _load(db_path)
+        if cache.pop(os.path.abspath(db_path), None) is not None:
+            _stats["invalidations"] += 1
+            _save(db_path, cache)
+
+
+def get_answer_cache_stats() -> dict:
+    """Acertos (iguais e por semelhança), falhas e descartes do cache de respostas."""
+    with _cache_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["similar_hits"] + stats["misses"]
+    stats["hit_rate"] = (
+        (stats["hits"] + stats["similar_hits"]) / lookups if lookups else 0.0
+    )
+    return stats
@@ -0,0 +1,173 @@
+"""
+Ferramentas de formatação das respostas no padrão brasileiro (R$ 1.234,56 e 1.234)
+Arquivo: answer_format_tools.py
+"""
+
+import numbers
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+# Quantidade máxima de itens em listas e rankings
+MAX_LIST_ITEMS = 10
+
+# Nomes de colunas com valores em reais; 'total' só conta
+# em colunas não inteiras (SUM de valores, não COUNT)
+MONEY_HINTS = (
+    "valor",
+    "preco",
+    "preço",
+    "faturamento",
+    "receita",
+    "ticket",
+    "montante",
+)
+NON_MONEY_HINTS = (
+    "quantidade",
+    "qtd",
+    "count",
+    "contagem",
+    "numero",
+    "número",
+    "notas",
+    "itens",
+    "registros",
+    "total_de_",
+)
+
+# Colunas numéricas que identificam o item (período, códigos) em vez de medir valores
+LABEL_NUMBER_COLUMNS = {
+    "ano",
+    "mes",
+    "dia",
+    "dia_semana",
+    "cfop",
+    "série",
+    "serie",
+    "número",
+    "numero",
+}
+
+
+def format_currency(value) -> str:
+    """Valor monetário no formato brasileiro: R$ 1.234,56."""
+    if value is None:
+        return "R$ 0,00"
+    text = (
+        f"{abs(float(value)):,.2f}".replace(",", "_")
+        .replace(".", ",")
+        .replace("_", ".")
+    )
+    return f"-R$ {text}" if float(value) < 0 else f"R$ {text}"
+
+
+def format_number(value, decimals: Optional[int] = None) -> str:
+    """Número com separador de milhar brasileiro: 1.234 (inteiros) ou 1.234,50."""
+    if value is None:
+        return "0"
+    if decimals is None:
+        decimals = 0 if float(value).is_integer() else 2
+    return (
+        f"{float(value):,.{decimals}f}".replace(",", "_")
+        .replace(".", ",")
+        .replace("_", ".")
+    )
+
+
+def format_month(ano, mes) -> str:
+    """Mês de referência: 01/2024."""
+    try:
+        return f"{int(mes):02d}/{int(ano)}"
+    except (TypeError, ValueError):
+        return f"{mes}/{ano}"
+
+
+def format_ranking(
+    items: List[Tuple[str, str]], limit: Optional[int] = MAX_LIST_ITEMS
+) -> str:
+    """Lista "1. Nome - Valor", uma linha por item (no máximo limit itens)."""
+    items = items[:limit] if limit else items
+    return "\n".join(
+        f"{position}. {name} - {value}"
+        for position, (name, value) in enumerate(items, 1)
+    )
+
+
+def _is_money_column(name: str, series: pd.Series) -> bool:
+    """
+    Colunas de valor (R$), pelo nome da coluna ou do alias.
+
+    Os termos de valor vêm antes dos de contagem: valor_total_notas e
+    total_valor_itens são valores, quantidade_notas é contagem.
+    """
+    normalized = name.lower()
+    if any(hint in normalized for hint in MONEY_HINTS):
+        return True
+    if any(hint in normalized for hint in NON_MONEY_HINTS):
+        return False
+    return "total" in normalized and pd.api.types.is_float_dtype(series)
+
+
+def _format_cell(value, money: bool) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return "-"
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        return format_currency(value) if money else format_number(value)
+    return str(value)
+
+
+def format_result_table(df: pd.DataFrame, limit: Optional[int] = MAX_LIST_ITEMS) -> str:
+    """
+    Resultado de uma consulta no formato final da resposta.
+
+    Um único valor vira só o valor ("R$ 1.234,56" ou "1.234"); uma linha
+    vira "coluna: valor" por coluna; várias linhas viram a lista
+    "1. Nome - Valor" (no máximo limit itens). Colunas de texto, ano e mês
+    formam o nome do item e as demais colunas numéricas, os valores.
+    """
+    if df.empty:
+        return "Nenhum resultado encontrado."
+
+    money = {col: _is_money_column(str(col), df[col]) for col in df.columns}
+    if df.shape == (1, 1):
+        return _format_cell(df.iat[0, 0], money[df.columns[0]])
+
+    if len(df) == 1:
+        return "\n".join(
+            f"{col}: {_format_cell(value, money[col])}"
+            for col, value in zip(df.columns, df.iloc[0])
+        )
+
+    value_columns = [
+        col
+        for col in df.columns
+        if pd.api.types.is_numeric_dtype(df[col])
+        and str(col).lower() not in LABEL_NUMBER_COLUMNS
+    ]
+    label_columns = [col for col in df.columns if col not in value_columns] or [
+        df.columns[0]
+    ]
+    value_columns = [col for col in value_columns if col not in label_columns]
+    lower = {str(col).lower(): col for col in label_columns}
+
+    items = []
+    for _, row in df.head(limit).iterrows():
+        labels = [
+            row[col] for col in label_columns if str(col).lower() not in ("ano", "mes")
+        ]
+        if "ano" in lower and "mes" in lower:
+            labels.insert(0, format_month(row[lower["ano"]], row[lower["mes"]]))
+        elif "ano" in lower or "mes" in lower:
+            labels.insert(0, row[lower.get("ano", lower.get("mes"))])
+        name = " / ".join("-" if pd.isna(label) else str(label) for label in labels)
+
+        values = [_format_cell(row[col], money[col]) for col in value_columns]
+        if len(value_columns) > 1:
+            values = [f"{col}: {value}" for col, value in zip(value_columns, values)]
+        items.append((name, ", ".join(values)))
+
+    if not value_columns:
+        return "\n".join(
+            f"{position}. {name}" for position, (name, _) in enumerate(items, 1)
+        )
+    return format_ranking(items, limit)
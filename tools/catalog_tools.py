@@ -0,0 +1,352 @@
+"""
+Ferramentas de catálogo: esquema e estatísticas das colunas gravados no próprio banco
+Arquivo: catalog_tools.py
+"""
+
+import json
+import math
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from tools.connection_tools import read_connection, get_file_identity
+from tools.rollup_tools import quote_identifier
+
+CATALOG_TABLE = "_catalog"
+
+# Amostra usada para estimar a quantidade de valores
+# distintos: blocos de rowids espalhados pela tabela
+SAMPLE_BLOCKS = 20
+SAMPLE_BLOCK_ROWS = 1000
+
+# Tamanho máximo dos textos gravados como mínimo/máximo
+MAX_VALUE_LENGTH = 80
+
+_catalog_cache = {}
+
+
+def _truncate(value):
+    """Limita o tamanho de valores textuais gravados no catálogo."""
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + "…"
+    return value
+
+
+def _indexed_distinct_counts(
+    conn: sqlite3.Connection, table_name: str
+) -> Dict[str, int]:
+    """
+    Estima valores distintos das colunas indexadas
+    a partir do sqlite_stat1 (gerado pelo ANALYZE).
+
+    A primeira estatística de cada índice é a média de linhas por valor da
+    primeira coluna; total de linhas dividido por ela estima os distintos.
+    """
+    try:
+        stats = conn.execute(
+            "SELECT idx, stat FROM sqlite_stat1 WHERE tbl = ?", (table_name,)
+        ).fetchall()
+    except sqlite3.Error:
+        return {}
+
+    estimates = {}
+    for index_name, stat in stats:
+        if not index_name:
+            continue
+        values = stat.split()
+        if len(values) < 2 or not values[1].isdigit() or int(values[1]) == 0:
+            continue
+        columns = [
+            row[2]
+            for row in conn.execute(
+                f"PRAGMA index_info({quote_identifier(index_name)})"
+            )
+        ]
+        if columns:
+            estimates[columns[0]] = max(1, round(int(values[0]) / int(values[1])))
+    return estimates
+
+
+def _sample_rows(
+    conn: sqlite3.Connection, table_name: str, columns: List[str], row_count: int
+) -> List[tuple]:
+    """
+    Lê blocos de rowids distribuídos pela tabela
+    (busca pelo rowid, sem varrer a tabela).
+    """
+    select_list = ", ".join(quote_identifier(col) for col in columns)
+    table = quote_identifier(table_name)
+
+    if row_count <= SAMPLE_BLOCKS * SAMPLE_BLOCK_ROWS:
+        return conn.execute(f"SELECT {select_list} FROM {table}").fetchall()
+
+    min_rowid, max_rowid = conn.execute(
+        f"SELECT MIN(rowid), MAX(rowid) FROM {table}"
+    ).fetchone()
+    step = (max_rowid - min_rowid) // SAMPLE_BLOCKS
+    rows = []
+    for block in range(SAMPLE_BLOCKS):
+        start = min_rowid + block * step
+        rows += conn.execute(
+            f"SELECT {select_list} FROM {table} WHERE rowid >= ? AND rowid < ?",
+            (start, start + SAMPLE_BLOCK_ROWS),
+        ).fetchall()
+    return rows
+
+
+def estimate_distinct(values: list, non_null_count: int) -> int:
+    """
+    Estima os valores distintos da coluna a partir de uma amostra (estimador GEE).
+
+    D ≈ sqrt(N/n) * f1 + (d - f1), onde f1 são os valores vistos uma única vez
+    na amostra de n linhas, d os distintos da amostra e N as linhas não nulas.
+    """
+    sample = [value for value in values if value is not None]
+    if not sample:
+        return 0
+
+    frequencies = {}
+    for value in sample:
+        frequencies[value] = frequencies.get(value, 0) + 1
+    distinct = len(frequencies)
+    if len(sample) >= non_null_count:
+        return distinct
+
+    singletons = sum(1 for count in frequencies.values() if count == 1)
+    if singletons == len(sample):
+        # Nenhum valor repetido na amostra: a coluna se comporta como chave
+        return non_null_count
+
+    estimate = math.sqrt(non_null_count / len(sample)) * singletons + (
+        distinct - singletons
+    )
+    return int(min(max(estimate, distinct), non_null_count))
+
+
+def describe_table(conn: sqlite3.Connection, table_name: str) -> dict:
+    """
+    Calcula as estatísticas das colunas de uma tabela.
+
+    Contagem de nulos, mínimo e máximo saem de uma única varredura com todas
+    as agregações; os distintos são estimados pelo sqlite_stat1 (colunas
+    indexadas) ou por uma amostra da tabela.
+    """
+    table_info = conn.execute(
+        f"PRAGMA table_info({quote_identifier(table_name)})"
+    ).fetchall()
+    names = [row[1] for row in table_info]
+
+    aggregates = ["COUNT(*)"]
+    for name in names:
+        column = quote_identifier(name)
+        aggregates += [f"COUNT({column})", f"MIN({column})", f"MAX({column})"]
+    values = conn.execute(
+        f"SELECT {', '.join(aggregates)} FROM {quote_identifier(table_name)}"
+    ).fetchone()
+    row_count = values[0]
+
+    indexed_distinct = _indexed_distinct_counts(conn, table_name)
+    sample = _sample_rows(conn, table_name, names, row_count) if row_count else []
+
+    columns = []
+    for position, row in enumerate(table_info):
+        non_null, min_value, max_value = values[1 + position * 3 : 4 + position * 3]
+        distinct = indexed_distinct.get(row[1])
+        if distinct is None:
+            distinct = estimate_distinct(
+                [sample_row[position] for sample_row in sample], non_null
+            )
+        if isinstance(min_value, int) and isinstance(max_value, int):
+            # Inteiros não têm mais valores distintos
+            # que o intervalo entre mínimo e máximo
+            distinct = min(distinct, max_value - min_value + 1)
+        columns.append(
+            {
+                "name": row[1],
+                "type": row[2],
+                "null_count": row_count - non_null,
+                "min": _truncate(min_value),
+                "max": _truncate(max_value),
+                "distinct_estimate": min(distinct, non_null),
+            }
+        )
+
+    return {"object_type": "table", "row_count": row_count, "columns": columns}
+
+
+def describe_view(
+    conn: sqlite3.Connection, view_name: str, base_tables: Dict[str, dict]
+) -> dict:
+    """
+    Descreve uma visão usando as estatísticas das tabelas de onde vêm as colunas.
+
+    As colunas são procuradas nas tabelas na ordem de base_tables (a
+    primeira que tiver a coluna é a origem).
+    """
+    row_count = conn.execute(
+        f"SELECT COUNT(*) FROM {quote_identifier(view_name)}"
+    ).fetchone()[0]
+
+    columns = []
+    for row in conn.execute(
+        f"PRAGMA table_info({quote_identifier(view_name)})"
+    ).fetchall():
+        column = {
+            "name": row[1],
+            "type": row[2],
+            "null_count": None,
+            "min": None,
+            "max": None,
+            "distinct_estimate": None,
+        }
+        for table in base_tables.values():
+            source = next(
+                (col for col in table["columns"] if col["name"] == row[1]), None
+            )
+            if source:
+                column.update(
+                    {key: value for key, value in source.items() if key != "name"}
+                )
+                break
+        columns.append(column)
+
+    return {"object_type": "view", "row_count": row_count, "columns": columns}
+
+
+def build_catalog(
+    conn: sqlite3.Connection,
+    object_names: List[str],
+    dataset_type: str,
+    view_sources: Optional[List[str]] = None,
+    created_at: Optional[str] = None,
+) -> dict:
+    """
+    Grava na tabela _catalog o esquema e as estatísticas de cada tabela/visão.
+
+    Deve ser chamado após o ANALYZE, cujas estatísticas são aproveitadas
+    para as colunas indexadas.
+
+    Args:
+        conn: Conexão com o banco recém-carregado
+        object_names: Tabelas e visões descritas, na ordem de apresentação
+        dataset_type (str): Tipo do banco ('header', 'items', 'unified')
+        view_sources: Tabelas de origem das colunas das visões,
+            por prioridade (padrão: ordem de object_names)
+        created_at: Momento da ingestão gravado (padrão: agora)
+
+    Returns:
+        dict: Descrição gravada por objeto
+    """
+    object_types = dict(
+        conn.execute(
+            "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')"
+        ).fetchall()
+    )
+
+    objects = {}
+    for name in object_names:
+        if object_types.get(name) == "table":
+            objects[name] = describe_table(conn, name)
+    sources = {
+        name: objects[name] for name in view_sources or object_names if name in objects
+    }
+    for name in object_names:
+        if object_types.get(name) == "view":
+            objects[name] = describe_view(conn, name, sources)
+
+    if created_at is None:
+        created_at = datetime.now().isoformat(timespec="microseconds")
+    conn.execute(f"DROP TABLE IF EXISTS {CATALOG_TABLE}")
+    conn.execute(
+        f"CREATE TABLE {CATALOG_TABLE} ("
+        "object_name TEXT PRIMARY KEY, object_type TEXT, dataset_type TEXT, "
+        "row_count INTEGER, columns TEXT, created_at TEXT)"
+    )
+    conn.executemany(
+        f"INSERT INTO {CATALOG_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (
+                name,
+                entry["object_type"],
+                dataset_type,
+                entry["row_count"],
+                json.dumps(entry["columns"], ensure_ascii=False, default=str),
+                created_at,
+            )
+            for name, entry in objects.items()
+        ],
+    )
+    conn.commit()
+    return objects
+
+
+def refresh_catalog(
+    conn: sqlite3.Connection, view_sources: Optional[List[str]] = None
+) -> Optional[dict]:
+    """
+    Regrava o catálogo com as estatísticas atuais
+    (ex.: após criar índices e rodar ANALYZE).
+
+    Mantém os objetos, o tipo do banco e o momento da ingestão do catálogo
+    existente, para que a versão do conteúdo não mude.
+
+    Returns:
+        dict: Descrição gravada por objeto, ou None se o banco não tiver catálogo
+    """
+    try:
+        rows = conn.execute(
+            f"SELECT object_name, dataset_type, created_at FROM {CATALOG_TABLE} ORDER"
+            " BY rowid"
+        ).fetchall()
+    except sqlite3.Error:
+        return None
+    if not rows:
+        return None
+    return build_catalog(
+        conn, [row[0] for row in rows], rows[0][1], view_sources, created_at=rows[0][2]
+    )
+
+
+def load_catalog(db_path: str) -> Optional[dict]:
+    """
+    Lê o catálogo do banco (em cache enquanto o arquivo não mudar).
+
+    Returns:
+        dict: 'dataset_type', 'created_at' (momento da ingestão) e 'objects'
+              (descrição por tabela/visão, na ordem de gravação), ou None se o
+              banco não tiver catálogo
+    """
+    identity = get_file_identity(db_path)
+    if identity is None:
+        return None
+
+    cached = _catalog_cache.get(db_path)
+    if cached and cached[0] == identity:
+        return cached[1]
+
+    try:
+        with read_connection(db_path) as conn:
+            rows = conn.execute(
+                "SELECT object_name, object_type, dataset_type, row_count, columns,"
+                f" created_at FROM {CATALOG_TABLE} ORDER BY rowid"
+            ).fetchall()
+    except sqlite3.Error:
+        rows = []
+
+    catalog = None
+    if rows:
+        catalog = {
+            "dataset_type": rows[0][2],
+            "created_at": rows[0][5],
+            "objects": {
+                name: {
+                    "object_type": object_type,
+                    "row_count": row_count,
+                    "columns": json.loads(columns),
+                }
+                for name, object_type, _, row_count, columns, _ in rows
+            },
+        }
+
+    _catalog_cache[db_path] = (identity, catalog)
+    return catalog
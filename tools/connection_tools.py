@@ -0,0 +1,296 @@
+"""
+Ferramentas de conexão: pool somente leitura e troca atômica de bancos SQLite
+Arquivo: connection_tools.py
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Conexões abertas no máximo por banco
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+
+# Cache de páginas por conexão (em KB) e tamanho máximo mapeado em memória (em bytes)
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Tempo máximo de espera por uma conexão livre (segundos)
+CHECKOUT_TIMEOUT = float(os.getenv("SQLITE_POOL_TIMEOUT", "30"))
+
+# Tempo máximo tentando substituir um banco que ainda tem
+# conexões abertas (no Windows o arquivo fica travado)
+SWAP_TIMEOUT = float(os.getenv("SQLITE_SWAP_TIMEOUT", "30"))
+
+# Arquivos auxiliares que o SQLite associa ao caminho do banco
+SIDE_FILE_SUFFIXES = ("-journal", "-wal", "-shm")
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_file_identity(db_path: str) -> Optional[tuple]:
+    """
+    Identifica a versão do arquivo do banco (inode, tamanho e data de modificação).
+    """
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class ConnectionPool:
+    """
+    Pool thread-safe de conexões somente leitura para um banco SQLite.
+
+    As conexões são reaproveitadas entre chamadas e descartadas quando o
+    arquivo do banco muda (reconstrução, novos índices), de modo que nenhuma
+    consulta enxergue uma versão antiga do arquivo.
+    """
+
+    def __init__(self, db_path: str, max_size: int = POOL_SIZE):
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self._idle = deque()
+        self._condition = threading.Condition()
+        self._open_count = 0
+        self._generation = 0
+        self._identity = get_file_identity(db_path)
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "hold_seconds_total": 0.0,
+            "connections_created": 0,
+            "invalidations": 0,
+        }
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """Abre uma conexão somente leitura com os pragmas de desempenho."""
+        conn = sqlite3.connect(
+            f"file:{os.path.abspath(self.db_path)}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = 1")
+        self._metrics["connections_created"] += 1
+        return conn
+
+    def invalidate(self):
+        """
+        Fecha as conexões livres; as que estão em uso são fechadas ao serem devolvidas.
+        """
+        with self._condition:
+            self._discard_idle()
+            self._identity = get_file_identity(self.db_path)
+            self._metrics["invalidations"] += 1
+            self._condition.notify_all()
+
+    def _discard_idle(self):
+        """
+        Fecha as conexões livres e inicia uma nova
+        geração (chamado com o lock adquirido).
+        """
+        while self._idle:
+            self._idle.popleft().close()
+            self._open_count -= 1
+        self._generation += 1
+
+    def _checkout(self) -> tuple:
+        """
+        Obtém uma conexão livre (ou abre uma nova), esperando se o pool estiver cheio.
+        """
+        start = time.perf_counter()
+        waited = False
+
+        with self._condition:
+            # Arquivo reconstruído ou alterado: as conexões atuais ficam obsoletas
+            identity = get_file_identity(self.db_path)
+            if identity != self._identity:
+                self._discard_idle()
+                self._identity = identity
+                self._metrics["invalidations"] += 1
+
+            while not self._idle and self._open_count >= self.max_size:
+                waited = True
+                remaining = CHECKOUT_TIMEOUT - (time.perf_counter() - start)
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Nenhuma conexão disponível para {self.db_path} após"
+                        f" {CHECKOUT_TIMEOUT:.0f}s"
+                    )
+                self._condition.wait(remaining)
+
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._open_count += 1
+                try:
+                    conn = self._open_connection()
+                except Exception:
+                    self._open_count -= 1
+                    raise
+
+            wait_seconds = time.perf_counter() - start
+            self._metrics["checkouts"] += 1
+            self._metrics["wait_seconds_total"] += wait_seconds
+            self._metrics["wait_seconds_max"] = max(
+                self._metrics["wait_seconds_max"], wait_seconds
+            )
+            if waited:
+                self._metrics["waits"] += 1
+
+            return conn, self._generation
+
+    def _checkin(self, conn: sqlite3.Connection, generation: int, hold_seconds: float):
+        """
+        Devolve a conexão ao pool (ou a fecha se pertencer a uma geração anterior).
+        """
+        with self._condition:
+            self._metrics["hold_seconds_total"] += hold_seconds
+            if generation == self._generation:
+                self._idle.append(conn)
+            else:
+                conn.close()
+                self._open_count -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Empresta uma conexão do pool durante o bloco with."""
+        conn, generation = self._checkout()
+        start = time.perf_counter()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._checkin(conn, generation, time.perf_counter() - start)
+
+    def close(self):
+        """Fecha todas as conexões livres do pool."""
+        with self._condition:
+            self._discard_idle()
+
+    def get_metrics(self) -> dict:
+        """Métricas de uso do pool (empréstimos, esperas e tempo de uso)."""
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics.update(
+                {
+                    "db_path": self.db_path,
+                    "open_connections": self._open_count,
+                    "idle_connections": len(self._idle),
+                    "in_use_connections": self._open_count - len(self._idle),
+                    "max_size": self.max_size,
+                }
+            )
+        checkouts = metrics["checkouts"]
+        metrics["wait_seconds_avg"] = (
+            metrics["wait_seconds_total"] / checkouts if checkouts else 0.0
+        )
+        metrics["hold_seconds_avg"] = (
+            metrics["hold_seconds_total"] / checkouts if checkouts else 0.0
+        )
+        return metrics
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Retorna o pool do banco, criando-o na primeira utilização."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path)
+        return pool
+
+
+@contextmanager
+def read_connection(db_path: str) -> Iterator[sqlite3.Connection]:
+    """
+    Empresta uma conexão somente leitura do pool do banco.
+
+    Exemplo:
+        with read_connection("dados/banco.db") as conn:
+            conn.execute("SELECT COUNT(*) FROM notas_fiscais")
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
+
+    with get_pool(db_path).connection() as conn:
+        yield conn
+
+
+def invalidate_pool(db_path: str):
+    """Descarta as conexões do banco (usado após reconstruir ou alterar o arquivo)."""
+    with _pools_lock:
+        pool = _pools.get(os.path.abspath(db_path))
+    if pool is not None:
+        pool.invalidate()
+
+
+def get_pool_metrics(db_path: Optional[str] = None) -> dict:
+    """Métricas de um banco ou, sem argumento, de todos os pools abertos."""
+    with _pools_lock:
+        pools = dict(_pools)
+
+    if db_path is not None:
+        pool = pools.get(os.path.abspath(db_path))
+        return pool.get_metrics() if pool else {}
+    return {path: pool.get_metrics() for path, pool in pools.items()}
+
+
+def remove_database_file(db_path: str):
+    """Remove o arquivo do banco e os arquivos auxiliares do SQLite, se existirem."""
+    for path in [db_path] + [db_path + suffix for suffix in SIDE_FILE_SUFFIXES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def swap_database(build_path: str, db_path: str):
+    """
+    Coloca o banco construído em build_path no lugar de db_path (os.replace, atômico).
+
+    Consultas em andamento terminam na versão anterior, que continua aberta
+    por elas; as novas abrem o arquivo novo. O banco construído deve estar
+    fechado e sem journal pendente. Journals da versão anterior são removidos
+    antes da troca para não serem aplicados ao arquivo novo.
+
+    No Windows um arquivo aberto não pode ser substituído: as conexões livres
+    do pool são fechadas e a troca é repetida até SWAP_TIMEOUT segundos,
+    enquanto as conexões em uso são devolvidas.
+
+    Raises:
+        PermissionError: Se o arquivo continuar em uso após SWAP_TIMEOUT
+    """
+    for suffix in SIDE_FILE_SUFFIXES:
+        try:
+            os.remove(db_path + suffix)
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # Windows: arquivo auxiliar em uso por uma conexão da versão anterior
+            pass
+
+    deadline = time.perf_counter() + SWAP_TIMEOUT
+    while True:
+        invalidate_pool(db_path)
+        try:
+            os.replace(build_path, db_path)
+            break
+        except PermissionError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.1)
+
+    invalidate_pool(db_path)
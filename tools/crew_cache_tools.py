@@ -0,0 +1,182 @@
+"""
+Ferramentas de cache dos agentes, tools e crews pré-montados por banco, com aquecimento
+Arquivo: crew_cache_tools.py
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from tools.answer_cache_tools import get_content_version
+
+# Bancos com agentes e crews montados mantidos em
+# memória (os usados há mais tempo são descartados)
+CREW_CACHE_MAX_ENTRIES = int(os.getenv("CREW_CACHE_MAX_ENTRIES", "8"))
+
+# Contexto da análise em andamento na thread (pergunta, evento de
+# cancelamento, modo aproximado, motor e formatação): as tools e
+# os callbacks montados uma vez por banco o leem a cada chamada
+_run_context = threading.local()
+
+
+@contextmanager
+def analysis_context(**values):
+    """Define o contexto da análise executada na thread atual (restaurado ao sair)."""
+    previous = getattr(_run_context, "values", None)
+    _run_context.values = values
+    try:
+        yield values
+    finally:
+        _run_context.values = previous
+
+
+def get_analysis_context() -> dict:
+    """Contexto da análise em andamento na thread atual (vazio fora de uma análise)."""
+    return getattr(_run_context, "values", None) or {}
+
+
+class PrebuiltCrewCache:
+    """
+    Objetos montados uma vez por banco e reutilizados em todas as perguntas.
+
+    A chave é o caminho do banco e a versão do conteúdo (muda quando o banco
+    é reconstruído, não quando ganha um índice); uma versão nova substitui a
+    anterior do mesmo banco. A montagem de cada chave acontece uma única vez,
+    mesmo com aquecimento e perguntas chegando ao mesmo tempo.
+    """
+
+    def __init__(self, max_entries: int = CREW_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "builds": 0,
+            "build_seconds": 0.0,
+            "warmups": 0,
+            "errors": 0,
+        }
+
+    def _key(self, db_path: str) -> Optional[tuple]:
+        version = get_content_version(db_path)
+        return None if version is None else (os.path.abspath(db_path), version)
+
+    def get(self, db_path: str, builder: Callable[[str], dict]) -> dict:
+        """
+        Objetos montados para o banco (montados
+        agora por builder se ainda não existirem).
+
+        Args:
+            db_path (str): Banco analisado
+            builder: Função chamada com o caminho do banco que monta os objetos
+
+        Returns:
+            dict: O que builder devolveu para a versão atual do banco
+        """
+        key = self._key(db_path)
+        if key is None:
+            return builder(db_path)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._entries[key]
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        # Só uma thread monta cada chave; as demais esperam e reaproveitam o resultado
+        with build_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._stats["hits"] += 1
+                    return self._entries[key]
+
+            started = time.perf_counter()
+            try:
+                prebuilt = builder(db_path)
+            except Exception:
+                with self._lock:
+                    self._stats["errors"] += 1
+                    self._building.pop(key, None)
+                raise
+
+            with self._lock:
+                for stale in [other for other in self._entries if other[0] == key[0]]:
+                    del self._entries[stale]
+                self._entries[key] = prebuilt
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._building.pop(key, None)
+                self._stats["builds"] += 1
+                self._stats["build_seconds"] += time.perf_counter() - started
+            return prebuilt
+
+    def warm(self, db_path: str, builder: Callable[[str], dict]) -> bool:
+        """
+        Monta os objetos do banco em uma thread de fundo.
+
+        Returns:
+            bool: True se a montagem foi iniciada (False
+                se já estão prontos ou sendo montados)
+        """
+        key = self._key(db_path)
+        if key is None:
+            return False
+        with self._lock:
+            if key in self._entries or key in self._building:
+                return False
+            self._building[key] = threading.Lock()
+            self._stats["warmups"] += 1
+
+        def build():
+            try:
+                self.get(db_path, builder)
+            except Exception:
+                # A pergunta seguinte tenta montar de novo e mostra o erro
+                pass
+
+        threading.Thread(target=build, name="crew-warmup", daemon=True).start()
+        return True
+
+    def is_ready(self, db_path: str) -> bool:
+        """Se os objetos da versão atual do banco já estão montados."""
+        key = self._key(db_path)
+        with self._lock:
+            return key is not None and key in self._entries
+
+    def invalidate(self, db_path: Optional[str] = None):
+        """Descarta os objetos montados de um banco (ou de todos)."""
+        with self._lock:
+            if db_path is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(db_path)
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+    def get_stats(self) -> dict:
+        """Bancos montados, reaproveitamentos, montagens e tempo médio de montagem."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["build_seconds_avg"] = (
+            stats["build_seconds"] / stats["builds"] if stats["builds"] else 0.0
+        )
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_crew_cache() -> PrebuiltCrewCache:
+    """Cache de agentes e crews do processo (compartilhado por todas as sessões)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PrebuiltCrewCache()
+        return _cache
@@ -0,0 +1,337 @@
+"""
+Ferramentas de leitura de CSV: detecção de codificação/dialeto e leitura em blocos
+Arquivo: csv_reader_tools.py
+"""
+
+import io
+import os
+import re
+import csv
+from contextlib import contextmanager
+from typing import IO, Iterator, List, Optional, Union
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # Sem pyarrow a leitura usa o parser do pandas
+    pa = None
+    pa_csv = None
+
+
+# Tamanho da amostra usada para detectar codificação, separador e decimal
+SNIFF_SAMPLE_BYTES = 64 * 1024
+
+# Motor de leitura: 'auto' (pyarrow se instalado), 'arrow' ou 'pandas'
+CSV_ENGINE = os.getenv("CSV_ENGINE", "auto")
+
+# Tamanho dos blocos lidos em paralelo pelo leitor do Arrow
+ARROW_BLOCK_SIZE = 4 * 1024 * 1024
+
+CANDIDATE_DELIMITERS = [",", ";", "\t", "|"]
+
+# Codificações testadas, da mais restrita para a
+# mais permissiva (latin-1 aceita qualquer byte)
+CANDIDATE_ENCODINGS = ["utf-8", "cp1252", "latin-1"]
+
+_COMMA_DECIMAL = re.compile(r"^-?\d{1,3}(\.\d{3})*,\d+$|^-?\d+,\d+$")
+_DOT_DECIMAL = re.compile(r"^-?\d+\.\d+$")
+_THOUSANDS_DOT = re.compile(r"^-?\d{1,3}(\.\d{3})+,\d+$")
+
+
+class _PrefixedStream(io.RawIOBase):
+    """
+    Fluxo que devolve primeiro a amostra já lida e depois o restante do fluxo original.
+    """
+
+    def __init__(self, prefix: bytes, stream: IO[bytes]):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Detecta a codificação da amostra (BOM, UTF-8, cp1252 ou latin-1)."""
+    if sample.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+
+    # A amostra pode terminar no meio de um caractere multibyte
+    cut = sample.rfind(b"\n")
+    text_sample = sample[:cut] if cut > 0 else sample
+
+    for encoding in CANDIDATE_ENCODINGS:
+        try:
+            text_sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def detect_delimiter(lines: List[str]) -> str:
+    """
+    Escolhe o separador que divide as linhas da
+    amostra em um número constante de campos.
+    """
+    best = ","
+    best_score = (0, 0)
+    for delimiter in CANDIDATE_DELIMITERS:
+        counts = [len(row) for row in csv.reader(lines, delimiter=delimiter)]
+        if not counts or counts[0] < 2:
+            continue
+        # Prioriza linhas com o mesmo número de campos do cabeçalho, depois mais colunas
+        score = (sum(1 for count in counts if count == counts[0]), counts[0])
+        if score > best_score:
+            best, best_score = delimiter, score
+    return best
+
+
+def detect_decimal(lines: List[str], delimiter: str) -> tuple:
+    """Detecta o separador decimal (e de milhar) pelos campos numéricos da amostra."""
+    comma = dot = thousands = 0
+    for row in list(csv.reader(lines, delimiter=delimiter))[1:]:
+        for field in row:
+            field = field.strip()
+            if _COMMA_DECIMAL.match(field):
+                comma += 1
+                if _THOUSANDS_DOT.match(field):
+                    thousands += 1
+            elif _DOT_DECIMAL.match(field):
+                dot += 1
+
+    if comma > dot:
+        return ",", "." if thousands else None
+    return ".", None
+
+
+def sniff_csv_dialect(sample: bytes) -> dict:
+    """
+    Detecta codificação, separador de campos e
+    separador decimal a partir de uma amostra.
+
+    Args:
+        sample (bytes): Início do arquivo CSV
+
+    Returns:
+        dict: 'encoding' ('utf-8-sig' quando há BOM), 'delimiter', 'decimal' e
+            'thousands' (None se não houver)
+    """
+    encoding = detect_encoding(sample)
+    text = sample.decode(encoding, errors="replace")
+
+    # Descarta a última linha, possivelmente incompleta
+    lines = text.splitlines()
+    if len(lines) > 1 and not text.endswith(("\n", "\r")):
+        lines = lines[:-1]
+
+    delimiter = detect_delimiter(lines)
+    decimal, thousands = detect_decimal(lines, delimiter)
+
+    return {
+        "encoding": encoding,
+        "delimiter": delimiter,
+        "decimal": decimal,
+        "thousands": thousands,
+    }
+
+
+def sniff_csv_file(csv_path: str) -> dict:
+    """Detecta o dialeto de um CSV em disco lendo apenas o início do arquivo."""
+    with open(csv_path, "rb") as f:
+        return sniff_csv_dialect(f.read(SNIFF_SAMPLE_BYTES))
+
+
+def read_csv_header(csv_path: str) -> List[str]:
+    """
+    Lê apenas a linha de cabeçalho do CSV,
+    respeitando codificação e separador detectados.
+    """
+    with open(csv_path, "rb") as f:
+        sample = f.read(SNIFF_SAMPLE_BYTES)
+    if not sample.strip():
+        return []
+
+    dialect = sniff_csv_dialect(sample)
+    text = sample.decode(dialect["encoding"], errors="replace")
+    header = next(csv.reader(text.splitlines()[:1], delimiter=dialect["delimiter"]), [])
+    return [col.strip() for col in header]
+
+
+@contextmanager
+def open_sniffed_source(csv_input: Union[str, IO[bytes]]) -> Iterator[tuple]:
+    """
+    Abre um CSV (caminho ou fluxo binário) e detecta seu dialeto.
+
+    Fluxos que não permitem voltar ao início (ex.: saída do unrar) são
+    reconstituídos com a amostra lida, sem reler o arquivo.
+
+    Yields:
+        tuple: (fluxo binário posicionado no início, dialeto)
+    """
+    if isinstance(csv_input, (str, os.PathLike)):
+        with open(csv_input, "rb") as f:
+            dialect = sniff_csv_dialect(f.read(SNIFF_SAMPLE_BYTES))
+            f.seek(0)
+            yield f, dialect
+    else:
+        sample = csv_input.read(SNIFF_SAMPLE_BYTES)
+        dialect = sniff_csv_dialect(sample)
+        yield (
+            io.BufferedReader(
+                _PrefixedStream(sample, csv_input), buffer_size=SNIFF_SAMPLE_BYTES
+            ),
+            dialect,
+        )
+
+
+def _arrow_type(dtype) -> Optional[object]:
+    """Converte um tipo declarado do pandas no tipo equivalente do Arrow."""
+    mapping = {
+        "float64": pa.float64(),
+        "Int8": pa.int8(),
+        "Int16": pa.int16(),
+        "Int32": pa.int32(),
+        "Int64": pa.int64(),
+        "object": pa.string(),
+        "str": pa.string(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+    }
+    return mapping.get(str(dtype))
+
+
+def _arrow_pandas_types(arrow_type) -> Optional[object]:
+    """
+    Mapeia inteiros do Arrow para inteiros anuláveis
+    do pandas (evita virar float com nulos).
+    """
+    mapping = {
+        pa.int8(): pd.Int8Dtype(),
+        pa.int16(): pd.Int16Dtype(),
+        pa.int32(): pd.Int32Dtype(),
+        pa.int64(): pd.Int64Dtype(),
+    }
+    return mapping.get(arrow_type)
+
+
+def _iter_arrow_chunks(
+    stream: IO[bytes], dialect: dict, chunk_size: int, dtype: Optional[dict]
+) -> Iterator[pd.DataFrame]:
+    """
+    Lê o CSV com o leitor multi-thread do Arrow,
+    devolvendo DataFrames de até chunk_size linhas.
+    """
+    column_types = {}
+    for column, column_dtype in (dtype or {}).items():
+        arrow_type = _arrow_type(column_dtype)
+        if arrow_type is not None:
+            column_types[column] = arrow_type
+
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(
+            use_threads=True,
+            block_size=ARROW_BLOCK_SIZE,
+            # O Arrow já descarta o BOM do UTF-8; outras codificações são convertidas
+            encoding=(
+                "utf8"
+                if dialect["encoding"].startswith("utf-8")
+                else dialect["encoding"]
+            ),
+        ),
+        parse_options=pa_csv.ParseOptions(
+            delimiter=dialect["delimiter"], newlines_in_values=True
+        ),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types,
+            decimal_point=dialect["decimal"],
+            strings_can_be_null=True,
+        ),
+    )
+
+    def to_frame(batches):
+        return pa.Table.from_batches(batches).to_pandas(
+            types_mapper=_arrow_pandas_types, split_blocks=True
+        )
+
+    batches = []
+    rows = 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        while rows >= chunk_size:
+            table = pa.Table.from_batches(batches)
+            frame = to_frame(table.slice(0, chunk_size).to_batches())
+            batches = table.slice(chunk_size).to_batches()
+            rows = table.num_rows - chunk_size
+
+            # Libera as referências ao bloco antes de entregá-lo
+            del table
+            yield frame
+            del frame
+
+    if rows:
+        yield to_frame(batches)
+
+
+def _iter_pandas_chunks(
+    stream: IO[bytes], dialect: dict, chunk_size: int, dtype: Optional[dict]
+) -> Iterator[pd.DataFrame]:
+    """Lê o CSV com o parser do pandas (quando o pyarrow não está instalado)."""
+    return pd.read_csv(
+        stream,
+        encoding=dialect["encoding"],
+        sep=dialect["delimiter"],
+        decimal=dialect["decimal"],
+        thousands=dialect["thousands"],
+        chunksize=chunk_size,
+        dtype=dtype,
+    )
+
+
+def iter_csv_chunks(
+    csv_input: Union[str, IO[bytes]],
+    chunk_size: int,
+    dtype: Optional[dict] = None,
+    engine: Optional[str] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Lê um CSV em blocos, detectando codificação,
+    separador e decimal pela amostra inicial.
+
+    Com pyarrow instalado o arquivo é interpretado pelo leitor colunar
+    multi-thread do Arrow; caso contrário (ou com engine='pandas') usa o
+    parser do pandas. Os blocos têm os mesmos tipos nos dois motores.
+
+    Args:
+        csv_input: Caminho do CSV ou fluxo binário com o conteúdo
+        chunk_size (int): Quantidade de linhas por bloco
+        dtype (dict): Tipos declarados das colunas (colunas ausentes são ignoradas)
+        engine (str): 'auto', 'arrow' ou 'pandas' (padrão: variável CSV_ENGINE)
+
+    Yields:
+        pd.DataFrame: Blocos de até chunk_size linhas
+    """
+    engine = engine or CSV_ENGINE
+    use_arrow = pa_csv is not None and engine in ("auto", "arrow")
+    if engine == "arrow" and pa_csv is None:
+        raise ImportError("O motor 'arrow' requer o pacote pyarrow")
+
+    with open_sniffed_source(csv_input) as (stream, dialect):
+        # Separador de milhar não é suportado pelo Arrow
+        if use_arrow and not dialect["thousands"]:
+            yield from _iter_arrow_chunks(stream, dialect, chunk_size, dtype)
+        else:
+            yield from _iter_pandas_chunks(stream, dialect, chunk_size, dtype)
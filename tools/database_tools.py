@@ -0,0 +1,287 @@
+"""
+Ferramentas de consulta aos bancos SQLite de notas fiscais
+Arquivo: database_tools.py
+"""
+
+import threading
+from typing import Callable, Optional
+
+import pandas as pd
+
+from tools.answer_format_tools import format_result_table, MAX_LIST_ITEMS
+from tools.catalog_tools import load_catalog
+from tools.connection_tools import read_connection
+from tools.engine_tools import choose_engine, get_engine, ENGINE_SQLITE, QUERY_ENGINE
+from tools.fulltext_tools import load_fulltext_indexes, describe_fulltext_indexes
+from tools.query_governor_tools import QueryCancelledError, QUERY_TIME_BUDGET
+from tools.query_cache_tools import get_cached_result, store_result
+from tools.sketch_tools import answer_with_sketches, APPROX_MODE
+
+# Tabelas do banco unificado (cabeçalhos + itens) e visão que as une
+HEADER_TABLE = "cabecalho"
+ITEMS_TABLE = "itens"
+MAIN_TABLE = "notas_fiscais"
+
+
+def read_database_schema(db_path: str) -> dict:
+    """
+    Lê tabelas, colunas e total de registros do banco.
+
+    Usa o catálogo gravado na ingestão (_catalog); bancos sem catálogo são
+    inspecionados com PRAGMA table_info e COUNT(*).
+
+    Returns:
+        dict: 'tables' (colunas com tipo por tabela/visão, notas_fiscais por último),
+              'total_registros' e 'catalog' (None se o banco não tiver catálogo)
+    """
+    catalog = load_catalog(db_path)
+    if catalog:
+        tables = {
+            name: [(col["name"], col["type"]) for col in entry["columns"]]
+            for name, entry in catalog["objects"].items()
+        }
+        return {
+            "tables": tables,
+            "total_registros": catalog["objects"][MAIN_TABLE]["row_count"],
+            "catalog": catalog,
+        }
+
+    with read_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
+        object_names = {row[0] for row in cursor.fetchall()}
+
+        # Banco unificado: tabelas de cabeçalhos e
+        # itens + visão notas_fiscais com o join
+        is_unified = HEADER_TABLE in object_names and ITEMS_TABLE in object_names
+        table_names = (
+            [HEADER_TABLE, ITEMS_TABLE, MAIN_TABLE] if is_unified else [MAIN_TABLE]
+        )
+
+        tables = {}
+        for table_name in table_names:
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            tables[table_name] = [(col[1], col[2]) for col in cursor.fetchall()]
+
+        cursor.execute(f"SELECT COUNT(*) FROM {MAIN_TABLE}")
+        total = cursor.fetchone()[0]
+
+    return {"tables": tables, "total_registros": total, "catalog": None}
+
+
+def describe_dataset(tables: dict) -> dict:
+    """
+    Identifica o tipo do banco (cabeçalhos, itens ou unificado) pelas colunas.
+
+    Args:
+        tables (dict): Colunas (em minúsculas) por tabela/visão
+    """
+    is_unified = HEADER_TABLE in tables and ITEMS_TABLE in tables
+    available_columns = tables[MAIN_TABLE]
+
+    # Detecta se é arquivo de cabeçalhos ou itens
+    is_header_file = not is_unified and "valor_nota_fiscal" in available_columns
+    is_items_file = (
+        "valor_total" in available_columns
+        and "descricao_do_produto_servico" in available_columns
+    )
+
+    if is_unified:
+        file_type = "unified"
+    else:
+        file_type = (
+            "header" if is_header_file else "items" if is_items_file else "unknown"
+        )
+
+    return {
+        "type": file_type,
+        "valor_column": (
+            "valor_nota_fiscal"
+            if is_header_file
+            else "valor_total" if is_items_file else None
+        ),
+        "has_products": "descricao_do_produto_servico" in available_columns,
+        "has_quantity": "quantidade" in available_columns,
+        "uf_emitente": "uf_emitente" in available_columns,
+        "razao_social_emitente": "razao_social_emitente" in available_columns,
+        "all_columns": available_columns,
+        "tables": tables,
+    }
+
+
+def get_available_columns(db_path: str) -> dict:
+    """Retorna as colunas disponíveis no banco de dados e identifica o tipo"""
+    try:
+        schema = read_database_schema(db_path)
+        tables = {
+            table_name: [name.lower() for name, _ in columns]
+            for table_name, columns in schema["tables"].items()
+        }
+        return describe_dataset(tables)
+
+    except Exception as e:
+        return {"type": "error", "error": str(e)}
+
+
+def get_database_statistics(db_path: str) -> dict:
+    """Obtém estatísticas básicas do arquivo"""
+    try:
+        # Apenas o total de registros (gravado no catálogo durante a ingestão)
+        return {"total_registros": read_database_schema(db_path)["total_registros"]}
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def get_database_schema(db_path: str, info_type: str = "schema") -> str:
+    """Função auxiliar para obter informações do esquema"""
+    try:
+        if info_type.lower() == "schema":
+            schema = read_database_schema(db_path)
+            tables = schema["tables"]
+
+            # Banco unificado: descreve as duas tabelas e a visão que as une
+            if HEADER_TABLE in tables and ITEMS_TABLE in tables:
+                result = ""
+                for table_name, title in [
+                    (HEADER_TABLE, "TABELA 'cabecalho' (uma linha por nota fiscal)"),
+                    (ITEMS_TABLE, "TABELA 'itens' (uma linha por item de nota fiscal)"),
+                    (
+                        MAIN_TABLE,
+                        (
+                            "VISÃO 'notas_fiscais' (itens + cabeçalho, JOIN por"
+                            " chave_de_acesso)"
+                        ),
+                    ),
+                ]:
+                    result += f"ESQUEMA DA {title}:\n\n"
+                    for name, data_type in tables[table_name]:
+                        result += f"- {name} ({data_type})\n"
+                    result += "\n"
+            else:
+                result = "ESQUEMA DA TABELA 'notas_fiscais':\n\n"
+                for name, data_type in tables[MAIN_TABLE]:
+                    result += f"- {name} ({data_type})\n"
+
+            # Lista também o total de registros
+            result += f"\nTotal de registros: {schema['total_registros']}"
+
+            # Índices de busca textual disponíveis para produtos e empresas
+            fulltext_info = describe_fulltext_indexes(load_fulltext_indexes(db_path))
+            if fulltext_info:
+                result += f"\n\n{fulltext_info}"
+
+            return result
+
+        elif info_type.lower() == "sample":
+            with read_connection(db_path) as conn:
+                df = pd.read_sql_query("SELECT * FROM notas_fiscais LIMIT 3", conn)
+            return f"AMOSTRA DOS DADOS:\n\n{df.to_string(index=False)}"
+
+    except Exception as e:
+        return f"Erro ao obter informações: {str(e)}"
+
+
+def execute_sql_query(
+    db_path: str,
+    query: str,
+    time_budget: float = QUERY_TIME_BUDGET,
+    cancel_event: Optional[threading.Event] = None,
+    approximate: bool = APPROX_MODE,
+    engine: str = QUERY_ENGINE,
+    formatted: bool = False,
+    plan_review: Optional[Callable[[], Optional[str]]] = None,
+) -> str:
+    """
+    Executa consulta SQL e retorna resultado formatado
+
+    Só consultas SELECT são executadas (o banco não é alterado pelo agente).
+    Elas têm limite de tempo e apenas as primeiras QUERY_ROW_LIMIT linhas
+    são lidas; o total real é informado por uma contagem à parte.
+    No modo aproximado, distintos, medianas/percentis e rankings simples são
+    respondidos pelos esboços gravados na ingestão, sem varrer a tabela.
+    O motor ('auto', 'sqlite' ou 'duckdb') é escolhido por choose_engine;
+    se o DuckDB falhar, a consulta é refeita no SQLite.
+    Com formatted, as linhas já vêm no formato da resposta final (R$ 1.234,56,
+    listas "1. Nome - Valor" com até MAX_LIST_ITEMS itens) em vez da tabela.
+    plan_review é chamada só quando a consulta vai de fato ao SQLite (fora
+    do cache, dos esboços e do DuckDB); o aviso devolvido é acrescentado ao
+    resultado, mas não entra no cache.
+    """
+    try:
+        if query.strip().upper().startswith("SELECT"):
+            if approximate:
+                sketch_result = answer_with_sketches(db_path, query)
+                if sketch_result is not None:
+                    return sketch_result
+
+            # Mesma consulta (normalizada), mesmo motor e
+            # mesma versão do banco: resultado em cache
+            engine_name = choose_engine(db_path, query, engine)
+            variant = f"{engine_name}:formatted" if formatted else engine_name
+            cached = get_cached_result(db_path, query, variant)
+            if cached is not None:
+                return cached
+
+            warning = (
+                plan_review()
+                if plan_review is not None and engine_name == ENGINE_SQLITE
+                else None
+            )
+            try:
+                governed = get_engine(engine_name).run(
+                    db_path, query, time_budget=time_budget, cancel_event=cancel_event
+                )
+            except QueryCancelledError:
+                raise
+            except Exception:
+                if engine_name == ENGINE_SQLITE:
+                    raise
+                # Diferenças de dialeto entre os motores: o SQLite é a referência
+                governed = get_engine(ENGINE_SQLITE).run(
+                    db_path, query, time_budget=time_budget, cancel_event=cancel_event
+                )
+
+            df = governed["dataframe"]
+            total_rows = governed["total_rows"]
+            shown = min(len(df), MAX_LIST_ITEMS) if formatted else len(df)
+            table = format_result_table(df) if formatted else df.to_string(index=False)
+
+            if df.empty:
+                result = "Nenhum resultado encontrado."
+            elif total_rows is None:
+                result = f"Encontrados mais de {len(df)} registros:\n\n"
+                result += table
+                result += (
+                    "\n\n... e mais registros (contagem interrompida pelo limite de"
+                    " tempo)."
+                )
+            else:
+                result = f"Encontrados {total_rows} registros:\n\n"
+                result += table
+
+                if total_rows > shown:
+                    result += f"\n\n... e mais {total_rows - shown} registros."
+
+            # Contagem interrompida pelo limite de
+            # tempo: outra execução pode completá-la
+            if total_rows is not None:
+                store_result(db_path, query, result, variant)
+            if warning:
+                result += f"\n\n{warning}"
+            return result
+        else:
+            # A ferramenta só lê: uma alteração deixaria desatualizados os
+            # rollups, o catálogo, os esboços e a cópia Parquet do banco
+            return "❌ Apenas consultas SELECT são permitidas."
+
+    except QueryCancelledError as e:
+        return f"⏱️ {e}"
+    except Exception as e:
+        # O SQLite não tem MEDIAN/PERCENTILE: os esboços
+        # respondem essas consultas mesmo fora do modo aproximado
+        if "no such function" in str(e).lower():
+            sketch_result = answer_with_sketches(db_path, query)
+            if sketch_result is not None:
+                return sketch_result
+        return f"Erro na consulta: {str(e)}"
@@ -0,0 +1,517 @@
+"""
+Ferramentas de motores de consulta: SQLite e DuckDB sobre cópias Parquet (colunar)
+Arquivo: engine_tools.py
+"""
+
+import os
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from tools.catalog_tools import load_catalog
+from tools.connection_tools import read_connection, get_file_identity
+from tools.query_governor_tools import (
+    run_governed_query,
+    QueryDeadline,
+    QueryCancelledError,
+    QUERY_ROW_LIMIT,
+    QUERY_TIME_BUDGET,
+    FETCH_BATCH_SIZE,
+)
+from tools.rollup_tools import (
+    load_rollup_catalog,
+    rewrite_with_rollups,
+    tokenize_sql,
+    token_identifier,
+    quote_identifier,
+)
+
+try:
+    import duckdb
+except ImportError:  # Motor colunar opcional (pip install duckdb)
+    duckdb = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Sem pyarrow não há cópia Parquet
+    pa = None
+    pq = None
+
+
+ENGINE_SQLITE = "sqlite"
+ENGINE_DUCKDB = "duckdb"
+ENGINE_AUTO = "auto"
+
+# Motor padrão: "auto" escolhe pelo formato da
+# consulta; "sqlite" ou "duckdb" fixam o motor
+QUERY_ENGINE = os.getenv("QUERY_ENGINE", ENGINE_AUTO)
+
+# Cópia Parquet gerada na ingestão: "auto" (só com
+# o DuckDB instalado), "1" (sempre) ou "0" (nunca)
+COLUMNAR_EXPORT = os.getenv("COLUMNAR_EXPORT", "auto")
+
+# No modo automático, agregações vão para o DuckDB a partir deste tamanho de tabela
+COLUMNAR_MIN_ROWS = int(os.getenv("COLUMNAR_MIN_ROWS", "50000"))
+
+# Threads do DuckDB por consulta (0 = padrão do DuckDB, um por núcleo)
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", "0"))
+
+COLUMNAR_TABLE = "_columnar"
+COLUMNAR_SUFFIX = ".columnar"
+
+# Intervalo de verificação do prazo/cancelamento das consultas no DuckDB (segundos)
+WATCH_INTERVAL = 0.05
+
+AGGREGATE_FUNCTIONS = {"COUNT", "SUM", "AVG", "MIN", "MAX", "TOTAL", "GROUP_CONCAT"}
+
+# Funções com sintaxe ou semântica diferentes no DuckDB: a consulta fica no SQLite
+SQLITE_ONLY_FUNCTIONS = {
+    "STRFTIME",
+    "JULIANDAY",
+    "DATETIME",
+    "DATE",
+    "TIME",
+    "UNIXEPOCH",
+    "TYPEOF",
+    "PRINTF",
+}
+SQLITE_ONLY_WORDS = {"MATCH", "ROWID", "GLOB"}
+
+# Operadores que dão resultados diferentes sem erro: LIKE diferencia maiúsculas no
+# DuckDB e "/" entre inteiros é divisão inteira no SQLite e decimal no DuckDB
+SQLITE_SEMANTICS_WORDS = {"LIKE"}
+SQLITE_SEMANTICS_OPERATORS = {"/"}
+
+
+def get_columnar_dir(db_path: str) -> str:
+    """Pasta das cópias Parquet do banco (uma subpasta por versão)."""
+    return f"{db_path}{COLUMNAR_SUFFIX}"
+
+
+def _columnar_export_enabled() -> bool:
+    if pq is None or COLUMNAR_EXPORT == "0":
+        return False
+    return COLUMNAR_EXPORT == "1" or duckdb is not None
+
+
+def _arrow_type(series: pd.Series):
+    """
+    Tipo Arrow equivalente ao tipo que a coluna
+    recebe no SQLite (INTEGER, REAL ou TEXT).
+    """
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return pa.int64()
+    if pd.api.types.is_float_dtype(series):
+        return pa.float64()
+    return pa.string()
+
+
+def _to_arrow(series: pd.Series, arrow_type):
+    """Converte a coluna do bloco para o tipo fixado pelo primeiro bloco."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        # Mesmo formato gravado no SQLite
+        series = series.dt.strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        return pa.array(series, type=arrow_type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(
+            series.map(lambda value: None if pd.isna(value) else str(value)),
+            type=pa.string(),
+        )
+
+
+class ColumnarCopy:
+    """
+    Cópia Parquet das tabelas de dados, gravada durante a ingestão.
+
+    Cada bloco já limpo é convertido para Arrow e acrescentado ao arquivo da
+    sua tabela, sem reler o banco ao final. Os arquivos ficam em uma
+    subpasta nova de <banco>.columnar e só passam a valer quando save
+    registra os caminhos (relativos à pasta do banco) na tabela _columnar.
+    """
+
+    def __init__(self, db_path: str):
+        self.enabled = _columnar_export_enabled()
+        self.db_path = db_path
+        self.version_dir = os.path.join(get_columnar_dir(db_path), uuid.uuid4().hex[:8])
+        self.elapsed_seconds = 0.0
+        self._writers = {}
+
+    def observer(self, table_name: str) -> Callable[[pd.DataFrame], None]:
+        """Função que grava os blocos de uma tabela (chunk_observer da ingestão)."""
+
+        def write(chunk: pd.DataFrame):
+            self.write(table_name, chunk)
+
+        return write
+
+    def write(self, table_name: str, chunk: pd.DataFrame):
+        """
+        Acrescenta um bloco ao arquivo Parquet da
+        tabela; o primeiro bloco define o esquema.
+        """
+        if not self.enabled:
+            return
+
+        start = time.perf_counter()
+        if table_name not in self._writers:
+            os.makedirs(self.version_dir, exist_ok=True)
+            schema = pa.schema(
+                [(col, _arrow_type(chunk[col])) for col in chunk.columns]
+            )
+            file_path = os.path.join(self.version_dir, f"{table_name}.parquet")
+            self._writers[table_name] = (
+                schema,
+                pq.ParquetWriter(file_path, schema, compression="zstd"),
+                file_path,
+            )
+
+        schema, writer, _ = self._writers[table_name]
+        writer.write_table(
+            pa.Table.from_arrays(
+                [_to_arrow(chunk[field.name], field.type) for field in schema],
+                schema=schema,
+            )
+        )
+        self.elapsed_seconds += time.perf_counter() - start
+
+    def close(self):
+        """Fecha os arquivos abertos (pode ser chamado mais de uma vez)."""
+        for _, writer, _ in self._writers.values():
+            if writer.is_open:
+                writer.close()
+
+    def save(self, conn: sqlite3.Connection) -> dict:
+        """
+        Fecha os arquivos e registra a cópia na tabela _columnar do banco em construção.
+
+        Returns:
+            dict: Tabelas copiadas e tempo gasto (nenhuma se a cópia estiver desativada)
+        """
+        start = time.perf_counter()
+        self.close()
+        base_dir = os.path.dirname(self.db_path) or "."
+        files = [
+            (table_name, os.path.relpath(file_path, base_dir))
+            for table_name, (_, _, file_path) in self._writers.items()
+        ]
+        if files:
+            conn.execute(f"DROP TABLE IF EXISTS {COLUMNAR_TABLE}")
+            conn.execute(
+                f"CREATE TABLE {COLUMNAR_TABLE} (table_name TEXT PRIMARY KEY, file_path"
+                " TEXT)"
+            )
+            conn.executemany(f"INSERT INTO {COLUMNAR_TABLE} VALUES (?, ?)", files)
+            conn.commit()
+
+        return {
+            "columnar_tables": [table_name for table_name, _ in files],
+            "columnar_seconds": self.elapsed_seconds + time.perf_counter() - start,
+        }
+
+
+def load_columnar_files(db_path: str) -> Dict[str, str]:
+    """
+    Arquivos Parquet da versão atual do banco, por tabela (vazio se não houver cópia).
+    """
+    try:
+        with read_connection(db_path) as conn:
+            rows = conn.execute(
+                f"SELECT table_name, file_path FROM {COLUMNAR_TABLE}"
+            ).fetchall()
+    except (sqlite3.Error, OSError):
+        return {}
+
+    base_dir = os.path.dirname(db_path) or "."
+    files = {
+        table_name: os.path.abspath(os.path.join(base_dir, file_path))
+        for table_name, file_path in rows
+    }
+    return files if all(os.path.exists(path) for path in files.values()) else {}
+
+
+def remove_stale_columnar_copies(db_path: str):
+    """Remove as cópias Parquet de versões anteriores (ou de ingestões que falharam)."""
+    columnar_dir = get_columnar_dir(db_path)
+    if not os.path.isdir(columnar_dir):
+        return
+
+    current = (
+        {os.path.dirname(path) for path in load_columnar_files(db_path).values()}
+        if os.path.exists(db_path)
+        else set()
+    )
+    for name in os.listdir(columnar_dir):
+        path = os.path.abspath(os.path.join(columnar_dir, name))
+        if path not in current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class QueryEngine:
+    """
+    Interface dos motores de consulta.
+
+    run recebe a consulta e devolve o mesmo dicionário de run_governed_query
+    (DataFrame, total de linhas, se foi truncado e tempo gasto), com limite
+    de tempo e cancelamento.
+    """
+
+    name = ""
+
+    def is_available(self, db_path: str) -> bool:
+        raise NotImplementedError
+
+    def run(
+        self,
+        db_path: str,
+        query: str,
+        max_rows: int = QUERY_ROW_LIMIT,
+        time_budget: float = QUERY_TIME_BUDGET,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> dict:
+        raise NotImplementedError
+
+
+class SQLiteEngine(QueryEngine):
+    """Motor por linhas: o próprio banco SQLite, com índices e tabelas pré-agregadas."""
+
+    name = ENGINE_SQLITE
+
+    def is_available(self, db_path: str) -> bool:
+        return os.path.exists(db_path)
+
+    def run(
+        self,
+        db_path,
+        query,
+        max_rows=QUERY_ROW_LIMIT,
+        time_budget=QUERY_TIME_BUDGET,
+        cancel_event=None,
+    ) -> dict:
+        # Consultas agregadas simples são respondidas pelas tabelas pré-agregadas
+        rewritten = rewrite_with_rollups(query, load_rollup_catalog(db_path))
+        with read_connection(db_path) as conn:
+            try:
+                return run_governed_query(
+                    conn,
+                    rewritten[0] if rewritten else query,
+                    max_rows=max_rows,
+                    time_budget=time_budget,
+                    cancel_event=cancel_event,
+                )
+            except QueryCancelledError:
+                raise
+            except Exception:
+                if not rewritten:
+                    raise
+                return run_governed_query(
+                    conn,
+                    query,
+                    max_rows=max_rows,
+                    time_budget=time_budget,
+                    cancel_event=cancel_event,
+                )
+
+
+class DuckDBEngine(QueryEngine):
+    """
+    Motor colunar: DuckDB em memória lendo a cópia Parquet do banco.
+
+    As tabelas viram visões sobre os arquivos Parquet e as visões do SQLite
+    (ex.: notas_fiscais do banco unificado) são recriadas com o mesmo SQL.
+    A conexão de cada banco é reaproveitada enquanto o arquivo não mudar.
+    """
+
+    name = ENGINE_DUCKDB
+
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def is_available(self, db_path: str) -> bool:
+        return duckdb is not None and bool(load_columnar_files(db_path))
+
+    def _connection(self, db_path: str):
+        """Conexão DuckDB do banco, recriada quando o arquivo do banco muda."""
+        identity = get_file_identity(db_path)
+        key = os.path.abspath(db_path)
+        with self._lock:
+            cached = self._connections.get(key)
+            if cached and cached[0] == identity:
+                return cached[1]
+
+            files = load_columnar_files(db_path)
+            if not files:
+                raise FileNotFoundError(f"Banco sem cópia Parquet: {db_path}")
+
+            conn = duckdb.connect(":memory:")
+            if DUCKDB_THREADS:
+                conn.execute(f"SET threads TO {DUCKDB_THREADS}")
+            for table_name, file_path in files.items():
+                conn.execute(
+                    f"CREATE VIEW {quote_identifier(table_name)} AS SELECT * FROM"
+                    f" read_parquet('{file_path.replace(chr(39), chr(39) * 2)}')"
+                )
+            with read_connection(db_path) as sqlite_conn:
+                views = sqlite_conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'view'"
+                ).fetchall()
+            for (view_sql,) in views:
+                try:
+                    conn.execute(view_sql)
+                except duckdb.Error:
+                    # Visão com SQL específico do SQLite:
+                    # consultas sobre ela ficam no SQLite
+                    pass
+
+            if cached:
+                cached[1].close()
+            self._connections[key] = (identity, conn)
+            return conn
+
+    def run(
+        self,
+        db_path,
+        query,
+        max_rows=QUERY_ROW_LIMIT,
+        time_budget=QUERY_TIME_BUDGET,
+        cancel_event=None,
+    ) -> dict:
+        query = query.strip().rstrip(";")
+        cursor = self._connection(db_path).cursor()
+        deadline = QueryDeadline(time_budget, cancel_event)
+        finished = threading.Event()
+
+        def watch():
+            # O DuckDB não tem progress handler: a consulta é interrompida de fora
+            while not finished.wait(WATCH_INTERVAL):
+                if deadline():
+                    cursor.interrupt()
+                    return
+
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+        start = time.perf_counter()
+        try:
+            try:
+                cursor.execute(query)
+                columns = [description[0] for description in cursor.description or []]
+                rows = []
+                while len(rows) <= max_rows:
+                    batch = cursor.fetchmany(
+                        min(FETCH_BATCH_SIZE, max_rows + 1 - len(rows))
+                    )
+                    if not batch:
+                        break
+                    rows.extend(batch)
+
+                truncated = len(rows) > max_rows
+                rows = rows[:max_rows]
+                total_rows = len(rows)
+                if truncated:
+                    try:
+                        total_rows = cursor.execute(
+                            f"SELECT COUNT(*) FROM ({query})"
+                        ).fetchone()[0]
+                    except duckdb.InterruptException:
+                        if deadline.cancelled:
+                            raise
+                        total_rows = None
+            except duckdb.InterruptException:
+                raise deadline.error()
+        finally:
+            finished.set()
+            watcher.join()
+            cursor.close()
+
+        return {
+            "dataframe": pd.DataFrame.from_records(rows, columns=columns),
+            "total_rows": total_rows,
+            "truncated": truncated,
+            "elapsed_seconds": time.perf_counter() - start,
+        }
+
+
+_engines = {ENGINE_SQLITE: SQLiteEngine(), ENGINE_DUCKDB: DuckDBEngine()}
+
+
+def get_engine(name: str) -> QueryEngine:
+    """Motor pelo nome ('sqlite' ou 'duckdb')."""
+    return _engines[name]
+
+
+def available_engines(db_path: str) -> List[str]:
+    """
+    Motores que podem consultar o banco (o DuckDB exige o pacote e a cópia Parquet).
+    """
+    return [name for name, engine in _engines.items() if engine.is_available(db_path)]
+
+
+def _needs_sqlite_semantics(tokens: list) -> bool:
+    """
+    Se a consulta usa operadores que o DuckDB
+    avalia de outro jeito sem erro (LIKE, divisão).
+    """
+    return any(
+        (token[0] == "word" and token[1].upper() in SQLITE_SEMANTICS_WORDS)
+        or (token[0] == "op" and token[1] in SQLITE_SEMANTICS_OPERATORS)
+        for token in tokens
+    )
+
+
+def choose_engine(db_path: str, query: str, engine: str = QUERY_ENGINE) -> str:
+    """
+    Escolhe o motor da consulta.
+
+    No modo automático o DuckDB recebe agregações (GROUP BY ou funções de
+    agregação) sobre tabelas com pelo menos COLUMNAR_MIN_ROWS linhas que
+    as tabelas pré-agregadas não respondem; buscas pontuais, listagens,
+    busca textual (MATCH), funções próprias do SQLite e operadores que
+    o DuckDB avalia de outro jeito sem erro (LIKE, divisão) ficam no SQLite.
+    Esses operadores mantêm a consulta no SQLite mesmo com o DuckDB escolhido.
+
+    Returns:
+        str: 'sqlite' ou 'duckdb'
+    """
+    if engine == ENGINE_SQLITE or not _engines[ENGINE_DUCKDB].is_available(db_path):
+        return ENGINE_SQLITE
+    tokens = tokenize_sql(query.strip().rstrip(";"))
+    if not tokens or _needs_sqlite_semantics(tokens):
+        return ENGINE_SQLITE
+    if engine == ENGINE_DUCKDB:
+        return ENGINE_DUCKDB
+
+    words = [token[1].upper() if token[0] == "word" else None for token in tokens]
+    calls = {
+        words[index]
+        for index in range(len(tokens) - 1)
+        if words[index] and tokens[index + 1][1] == "("
+    }
+    identifiers = {
+        token_identifier(token) for token in tokens if token[0] in ("word", "quoted")
+    }
+
+    if calls & SQLITE_ONLY_FUNCTIONS or set(words) & SQLITE_ONLY_WORDS:
+        return ENGINE_SQLITE
+    if any(name.endswith("_fts") for name in identifiers if name):
+        return ENGINE_SQLITE
+    if "GROUP" not in words and not calls & AGGREGATE_FUNCTIONS:
+        return ENGINE_SQLITE
+    if rewrite_with_rollups(query, load_rollup_catalog(db_path)):
+        return ENGINE_SQLITE
+
+    catalog = load_catalog(db_path)
+    objects = catalog["objects"] if catalog else {}
+    rows = max(
+        (entry["row_count"] for name, entry in objects.items() if name in identifiers),
+        default=0,
+    )
+    return ENGINE_DUCKDB if rows >= COLUMNAR_MIN_ROWS else ENGINE_SQLITE
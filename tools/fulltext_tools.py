@@ -0,0 +1,153 @@
+"""
+Ferramentas de busca textual: índices FTS5 de descrições de produtos e nomes de empresas
+Arquivo: fulltext_tools.py
+"""
+
+import re
+import sqlite3
+from typing import Dict, Optional
+
+from tools.connection_tools import read_connection, get_file_identity
+from tools.rollup_tools import quote_identifier
+
+# Colunas de texto indexadas (só as que existem em cada tabela)
+FULLTEXT_COLUMNS = [
+    "descricao_do_produto_servico",
+    "razao_social_emitente",
+    "nome_destinatário",
+]
+
+# Tokenização sem distinção de acentos e maiúsculas ("CAFÉ" encontra "cafe").
+# Encontra palavras inteiras e prefixos, não trechos do meio de uma palavra: o
+# tokenizador trigram encontraria, mas no SQLite disponível não ignora acentos.
+# Buscas por prefixo ('note*') percorrem a faixa de termos do próprio índice;
+# índices de prefixo (opção prefix) dobrariam o tamanho e o tempo de construção.
+FULLTEXT_TOKENIZER = "unicode61 remove_diacritics 2"
+
+FULLTEXT_SUFFIX = "_fts"
+
+_CONTENT_PATTERN = re.compile(r"content\s*=\s*'([^']+)'", re.IGNORECASE)
+
+_fulltext_cache = {}
+
+
+def get_fulltext_table(table_name: str) -> str:
+    """Nome do índice textual de uma tabela."""
+    return f"{table_name}{FULLTEXT_SUFFIX}"
+
+
+def build_fulltext_index(conn: sqlite3.Connection, table_name: str) -> Optional[str]:
+    """
+    Cria o índice FTS5 das colunas de texto da tabela.
+
+    O índice usa a própria tabela como conteúdo (external content): guarda
+    apenas os termos, e o rowid de cada resultado é o rowid da tabela.
+
+    Args:
+        conn: Conexão com o banco recém-carregado
+        table_name (str): Tabela indexada
+
+    Returns:
+        str: Nome do índice criado, ou None se a tabela
+            não tiver colunas de texto indexáveis
+    """
+    table_columns = [
+        row[1]
+        for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")
+    ]
+    columns = [col for col in FULLTEXT_COLUMNS if col in table_columns]
+    if not columns:
+        return None
+
+    fts_table = get_fulltext_table(table_name)
+    conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(fts_table)}")
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {quote_identifier(fts_table)} USING fts5("
+        f"{', '.join(quote_identifier(col) for col in columns)}, "
+        f"content='{table_name}', content_rowid='rowid', "
+        f"tokenize='{FULLTEXT_TOKENIZER}')"
+    )
+    conn.execute(
+        f"INSERT INTO {quote_identifier(fts_table)}({quote_identifier(fts_table)})"
+        " VALUES ('rebuild')"
+    )
+    conn.commit()
+    return fts_table
+
+
+def load_fulltext_indexes(db_path: str) -> Dict[str, dict]:
+    """
+    Índices textuais do banco (em cache enquanto o arquivo não mudar).
+
+    Returns:
+        dict: {tabela de conteúdo: {'fts_table',
+            'columns'}}; vazio se o banco não tiver índices
+    """
+    identity = get_file_identity(db_path)
+    if identity is None:
+        return {}
+
+    cached = _fulltext_cache.get(db_path)
+    if cached and cached[0] == identity:
+        return cached[1]
+
+    indexes = {}
+    try:
+        with read_connection(db_path) as conn:
+            rows = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql LIKE"
+                " 'CREATE VIRTUAL TABLE%fts5%'"
+            ).fetchall()
+            for name, sql in rows:
+                content = _CONTENT_PATTERN.search(sql)
+                if not content:
+                    continue
+                columns = [
+                    row[1]
+                    for row in conn.execute(
+                        f"PRAGMA table_info({quote_identifier(name)})"
+                    )
+                ]
+                indexes[content.group(1)] = {"fts_table": name, "columns": columns}
+    except sqlite3.Error:
+        indexes = {}
+
+    _fulltext_cache[db_path] = (identity, indexes)
+    return indexes
+
+
+def describe_fulltext_indexes(indexes: Dict[str, dict]) -> str:
+    """
+    Instruções de uso dos índices textuais para o agente (vazio se não houver índices).
+    """
+    if not indexes:
+        return ""
+
+    lines = ["BUSCA TEXTUAL (índice FTS5, ignora acentos e maiúsculas):"]
+    for table_name, index in indexes.items():
+        lines.append(
+            f"- {index['fts_table']} (tabela {table_name}):"
+            f" {', '.join(index['columns'])}"
+        )
+
+    table_name, index = next(iter(indexes.items()))
+    fts_table = index["fts_table"]
+    lines += [
+        (
+            "Palavras inteiras ou começos de palavra: MATCH no índice em vez de LIKE"
+            " '%termo%' (que varre a tabela inteira):"
+        ),
+        (
+            f"  SELECT ... FROM {table_name} WHERE rowid IN (SELECT rowid FROM"
+            f" {fts_table} WHERE {fts_table} MATCH '{index['columns'][0]}: notebook*')"
+        ),
+        (
+            "Sintaxe do MATCH: 'termo' (palavra inteira), 'termo*' (prefixo), '\"duas"
+            " palavras\"' (frase), 'a AND b', 'a OR b', 'coluna: termo' (só uma coluna)"
+        ),
+        (
+            "O MATCH não encontra trechos do meio ou do fim de uma palavra ('book' não"
+            " acha 'NOTEBOOK'): para esses use LIKE '%trecho%'"
+        ),
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,502 @@
+"""
+Ferramentas de recomendação de índices a partir das consultas executadas
+Arquivo: index_advisor_tools.py
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from tools.catalog_tools import refresh_catalog
+from tools.connection_tools import (
+    read_connection,
+    get_file_identity,
+    swap_database,
+    remove_database_file,
+)
+from tools.database_tools import HEADER_TABLE, ITEMS_TABLE
+from tools.ingest_tools import get_build_path
+from tools.manifest_tools import refresh_database_entry
+from tools.rollup_tools import (
+    tokenize_sql,
+    token_identifier,
+    quote_identifier,
+    SQL_KEYWORDS,
+)
+
+WORKLOAD_FILENAME = "query_workload.json"
+
+# Quantidade mínima de execuções para um padrão de consulta virar sugestão de índice
+INDEX_ADVISOR_MIN_COUNT = int(os.getenv("INDEX_ADVISOR_MIN_COUNT", "3"))
+
+# Cria automaticamente os índices sugeridos a cada consulta registrada
+INDEX_ADVISOR_AUTO_CREATE = os.getenv("INDEX_ADVISOR_AUTO_CREATE", "0") == "1"
+
+# Espera máxima (segundos) por um banco bloqueado
+# ao copiar o banco para criar os índices
+INDEX_BUILD_BUSY_TIMEOUT = int(os.getenv("INDEX_BUILD_BUSY_TIMEOUT", "30"))
+
+# Limite de colunas de um índice (colunas extras só entram se o índice couber inteiro)
+MAX_INDEX_COLUMNS = 6
+
+# Padrões guardados por banco (os menos frequentes são descartados)
+MAX_PATTERNS_PER_DATABASE = 500
+
+EQUALITY_OPERATORS = {"=", "==", "IN", "IS"}
+RANGE_OPERATORS = {"<", ">", "<=", ">=", "<>", "!=", "BETWEEN", "LIKE", "GLOB"}
+CLAUSE_KEYWORDS = {"SELECT", "WHERE", "HAVING", "ON"}
+TABLE_KEYWORDS = {"FROM", "JOIN"}
+ALIAS_STOP_WORDS = SQL_KEYWORDS | {
+    "JOIN",
+    "LEFT",
+    "RIGHT",
+    "INNER",
+    "OUTER",
+    "CROSS",
+    "NATURAL",
+    "ON",
+    "USING",
+}
+
+_workload_lock = threading.Lock()
+
+# Uma criação de índices por vez: duas cópias trocadas
+# em sequência perderiam os índices da primeira
+_create_lock = threading.Lock()
+
+
+def get_workload_path(db_path: str) -> Path:
+    """Retorna o caminho do registro de consultas da pasta do banco."""
+    return Path(os.path.dirname(db_path) or ".") / WORKLOAD_FILENAME
+
+
+def load_workload(db_path: str) -> dict:
+    """
+    Carrega o registro de consultas de todos os bancos da pasta (vazio se não existir).
+    """
+    workload_path = get_workload_path(db_path)
+    if not workload_path.exists():
+        return {}
+
+    try:
+        with open(workload_path, "r", encoding="utf-8") as f:
+            workload = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    return workload if isinstance(workload, dict) else {}
+
+
+def save_workload(db_path: str, workload: dict):
+    """Grava o registro de consultas de forma atômica (arquivo temporário + rename)."""
+    workload_path = get_workload_path(db_path)
+    tmp_path = workload_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(workload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, workload_path)
+
+
+def _get_table_columns(conn: sqlite3.Connection) -> dict:
+    """
+    Retorna {nome: (tipo, colunas)} das tabelas e visões do banco (tabelas virtuais,
+    como os índices FTS5, não são indexáveis).
+    """
+    objects = {}
+    for name, object_type in conn.execute(
+        "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') "
+        "AND COALESCE(sql, '') NOT LIKE 'CREATE VIRTUAL TABLE%'"
+    ):
+        columns = [
+            row[1].lower()
+            for row in conn.execute(f"PRAGMA table_info({quote_identifier(name)})")
+        ]
+        objects[name.lower()] = (object_type, columns)
+    return objects
+
+
+def _resolve_base_table(table: str, column: str, objects: dict) -> Optional[str]:
+    """Tabela que realmente guarda a coluna (visões não podem ser indexadas)."""
+    object_type, columns = objects.get(table, (None, []))
+    if object_type == "table":
+        return table if column in columns else None
+
+    # Visão notas_fiscais do banco unificado: itens primeiro, depois cabeçalho
+    for base_table in (ITEMS_TABLE, HEADER_TABLE):
+        if base_table in objects and column in objects[base_table][1]:
+            return base_table
+    return None
+
+
+def analyze_query_columns(query: str, objects: dict) -> List[dict]:
+    """
+    Identifica, por tabela, as colunas usadas em filtros, agrupamentos e ordenação.
+
+    Args:
+        query (str): Consulta SQL
+        objects: Tabelas e visões do banco (_get_table_columns)
+
+    Returns:
+        List[dict]: Um padrão por tabela com 'eq', 'range', 'group', 'order' e 'other'
+    """
+    tokens = tokenize_sql(query)
+    if not tokens:
+        return []
+    upper = [token[1].upper() if token[0] == "word" else None for token in tokens]
+
+    # Tabelas do FROM/JOIN e seus aliases
+    aliases = {}
+    table_positions = set()
+    for index, word in enumerate(upper):
+        if word not in TABLE_KEYWORDS or index + 1 >= len(tokens):
+            continue
+        table = token_identifier(tokens[index + 1])
+        if table not in objects:
+            continue
+        aliases[table] = table
+        table_positions.add(index + 1)
+
+        alias_index = index + 2
+        if alias_index < len(tokens) and upper[alias_index] == "AS":
+            alias_index += 1
+        if (
+            alias_index < len(tokens)
+            and tokens[alias_index][0] in ("word", "quoted")
+            and upper[alias_index] not in ALIAS_STOP_WORDS
+        ):
+            aliases[token_identifier(tokens[alias_index])] = table
+            table_positions.add(alias_index)
+
+    tables = sorted(set(aliases.values()))
+    if not tables:
+        return []
+
+    patterns = {}
+    clause = None
+    for index, token in enumerate(tokens):
+        word = upper[index]
+        if word in CLAUSE_KEYWORDS:
+            clause = word
+            continue
+        if word == "BY" and index > 0 and upper[index - 1] in ("GROUP", "ORDER"):
+            clause = upper[index - 1]
+            continue
+
+        name = token_identifier(token)
+        if name is None or index in table_positions or (word and word in SQL_KEYWORDS):
+            continue
+        if index + 1 < len(tokens) and tokens[index + 1][1] in ("(", "."):
+            continue
+        if index > 0 and upper[index - 1] == "AS":
+            continue
+
+        # Coluna qualificada (alias.coluna) ou resolvida pelas tabelas da consulta
+        qualified = index > 1 and tokens[index - 1][1] == "."
+        if qualified:
+            candidates = [aliases.get(token_identifier(tokens[index - 2]))]
+        else:
+            candidates = tables
+        base_table = next(
+            (
+                resolved
+                for resolved in (
+                    _resolve_base_table(table, name, objects)
+                    for table in candidates
+                    if table
+                )
+                if resolved
+            ),
+            None,
+        )
+        if base_table is None:
+            continue
+
+        pattern = patterns.setdefault(
+            base_table, {"eq": [], "range": [], "group": [], "order": [], "other": []}
+        )
+        next_word = upper[index + 1] if index + 1 < len(tokens) else None
+        next_text = tokens[index + 1][1] if index + 1 < len(tokens) else None
+        previous_index = index - 3 if qualified else index - 1
+        previous_text = tokens[previous_index][1] if previous_index >= 0 else None
+
+        if clause in ("WHERE", "ON"):
+            if (
+                next_word in EQUALITY_OPERATORS
+                or next_text in EQUALITY_OPERATORS
+                or previous_text in ("=", "==")
+            ):
+                kind = "eq"
+            elif next_word in RANGE_OPERATORS or next_text in RANGE_OPERATORS:
+                kind = "range"
+            else:
+                kind = "other"
+        elif clause == "GROUP":
+            kind = "group"
+        elif clause == "ORDER":
+            kind = "order"
+        else:
+            kind = "other"
+
+        if name not in pattern[kind]:
+            pattern[kind].append(name)
+
+    results = []
+    for table, pattern in sorted(patterns.items()):
+        if pattern["eq"] or pattern["range"] or pattern["group"] or pattern["order"]:
+            results.append({"table": table, **pattern})
+    return results
+
+
+def record_query(db_path: str, query: str) -> List[dict]:
+    """
+    Registra as colunas de filtro, agrupamento e ordenação de uma consulta.
+
+    Args:
+        db_path (str): Banco consultado
+        query (str): Consulta SQL gerada pelo agente
+
+    Returns:
+        List[dict]: Padrões registrados (vazio se a consulta não usa colunas indexáveis)
+    """
+    try:
+        with read_connection(db_path) as conn:
+            objects = _get_table_columns(conn)
+    except (sqlite3.Error, OSError):
+        return []
+
+    patterns = analyze_query_columns(query, objects)
+    if not patterns:
+        return []
+
+    with _workload_lock:
+        workload = load_workload(db_path)
+        entries = workload.setdefault(db_path, {})
+
+        for pattern in patterns:
+            key = "|".join(
+                [pattern["table"]]
+                + [
+                    f"{kind}={','.join(pattern[kind])}"
+                    for kind in ("eq", "range", "group", "order", "other")
+                ]
+            )
+            entry = entries.setdefault(key, {**pattern, "count": 0})
+            entry["count"] += 1
+            entry["last_seen"] = datetime.now().isoformat(timespec="seconds")
+
+        if len(entries) > MAX_PATTERNS_PER_DATABASE:
+            ranked = sorted(
+                entries.items(),
+                key=lambda item: (item[1]["count"], item[1]["last_seen"]),
+                reverse=True,
+            )
+            workload[db_path] = dict(ranked[:MAX_PATTERNS_PER_DATABASE])
+
+        save_workload(db_path, workload)
+
+    return patterns
+
+
+def _index_columns(pattern: dict) -> List[str]:
+    """
+    Ordem das colunas do índice: igualdades, agrupamento, ordenação e um
+    intervalo; as demais colunas usadas só entram se o índice ficar
+    cobrindo toda a consulta dentro do limite de colunas.
+    """
+    key_columns = []
+    for column in (
+        pattern["eq"] + pattern["group"] + pattern["order"] + pattern["range"][:1]
+    ):
+        if column not in key_columns:
+            key_columns.append(column)
+
+    covering = key_columns + [
+        col for col in pattern["range"][1:] + pattern["other"] if col not in key_columns
+    ]
+    covering = list(dict.fromkeys(covering))
+    if len(covering) <= MAX_INDEX_COLUMNS:
+        return covering
+    return key_columns[:MAX_INDEX_COLUMNS]
+
+
+def _existing_indexes(conn: sqlite3.Connection, table: str) -> List[List[str]]:
+    """Colunas (em ordem) de cada índice existente na tabela."""
+    indexes = []
+    for row in conn.execute(f"PRAGMA index_list({quote_identifier(table)})"):
+        columns = [
+            info[2].lower()
+            for info in conn.execute(f"PRAGMA index_info({quote_identifier(row[1])})")
+            if info[2]
+        ]
+        indexes.append(columns)
+    return indexes
+
+
+def _build_suggestion(table: str, columns: List[str], count: int) -> dict:
+    """
+    Sugestão de índice com nome estável (derivado das colunas) e comando CREATE INDEX.
+    """
+    digest = hashlib.md5(",".join(columns).encode()).hexdigest()[:8]
+    index_name = f"idx_auto_{table}_{columns[0]}_{digest}"
+    return {
+        "table": table,
+        "columns": columns,
+        "count": count,
+        "name": index_name,
+        "statement": (
+            f"CREATE INDEX IF NOT EXISTS {quote_identifier(index_name)} ON"
+            f" {quote_identifier(table)}"
+            f"({', '.join(quote_identifier(col) for col in columns)})"
+        ),
+    }
+
+
+def suggest_indexes_for_query(db_path: str, query: str) -> List[dict]:
+    """
+    Propõe índices para uma única consulta (sem esperar pelo histórico de execuções).
+
+    Args:
+        db_path (str): Banco consultado
+        query (str): Consulta SQL
+
+    Returns:
+        List[dict]: Sugestões no formato de suggest_indexes,
+            só para tabelas sem índice equivalente
+    """
+    try:
+        with read_connection(db_path) as conn:
+            objects = _get_table_columns(conn)
+            patterns = analyze_query_columns(query, objects)
+            existing = {
+                pattern["table"]: _existing_indexes(conn, pattern["table"])
+                for pattern in patterns
+            }
+    except (sqlite3.Error, OSError):
+        return []
+
+    suggestions = []
+    for pattern in patterns:
+        columns = _index_columns(pattern)
+        if not columns or any(
+            index[: len(columns)] == columns for index in existing[pattern["table"]]
+        ):
+            continue
+        suggestions.append(_build_suggestion(pattern["table"], columns, 1))
+    return suggestions
+
+
+def suggest_indexes(
+    db_path: str, min_count: int = INDEX_ADVISOR_MIN_COUNT
+) -> List[dict]:
+    """
+    Propõe índices para os padrões de consulta mais frequentes do banco.
+
+    Args:
+        db_path (str): Banco analisado
+        min_count (int): Execuções mínimas de um padrão para gerar sugestão
+
+    Returns:
+        List[dict]: Sugestões com tabela, colunas,
+            execuções atendidas e comando CREATE INDEX
+    """
+    entries = load_workload(db_path).get(db_path, {})
+    if not entries or not os.path.exists(db_path):
+        return []
+
+    candidates = {}
+    for pattern in entries.values():
+        columns = _index_columns(pattern)
+        if not columns:
+            continue
+        key = (pattern["table"], tuple(columns))
+        candidates[key] = candidates.get(key, 0) + pattern["count"]
+
+    with read_connection(db_path) as conn:
+        existing = {table: _existing_indexes(conn, table) for table, _ in candidates}
+
+    suggestions = []
+    for (table, columns), count in sorted(
+        candidates.items(), key=lambda item: item[1], reverse=True
+    ):
+        if count < min_count:
+            continue
+        columns = list(columns)
+
+        # Já atendido por um índice existente ou por uma sugestão mais abrangente
+        if any(index[: len(columns)] == columns for index in existing[table]):
+            continue
+        if any(
+            s["table"] == table and s["columns"][: len(columns)] == columns
+            for s in suggestions
+        ):
+            continue
+
+        suggestions.append(_build_suggestion(table, columns, count))
+
+    return suggestions
+
+
+def create_suggested_indexes(db_path: str, suggestions: List[dict]) -> dict:
+    """
+    Cria os índices sugeridos e atualiza as estatísticas do planejador (ANALYZE).
+
+    Os índices são criados em uma cópia do banco, que depois substitui o
+    arquivo (swap_database), sem bloquear as consultas em andamento. O
+    catálogo da cópia é regravado com as novas estatísticas; a cópia Parquet
+    continua válida, pois os dados não mudam.
+
+    Args:
+        db_path (str): Banco onde os índices serão criados
+        suggestions: Sugestões devolvidas por suggest_indexes
+
+    Returns:
+        dict: Nomes dos índices criados e erros encontrados
+    """
+    created = []
+    errors = []
+    if not suggestions:
+        return {"created": created, "errors": errors}
+
+    with _create_lock:
+        identity = get_file_identity(db_path)
+        build_path = get_build_path(db_path)
+        try:
+            conn = sqlite3.connect(build_path, timeout=INDEX_BUILD_BUSY_TIMEOUT)
+            try:
+                with read_connection(db_path) as source:
+                    source.backup(conn)
+                for suggestion in suggestions:
+                    try:
+                        conn.execute(suggestion["statement"])
+                        created.append(suggestion["name"])
+                    except sqlite3.Error as e:
+                        errors.append(f"{suggestion['statement']} -> {e}")
+                if created:
+                    conn.execute("ANALYZE")
+                    refresh_catalog(conn, [ITEMS_TABLE, HEADER_TABLE])
+                conn.commit()
+            finally:
+                conn.close()
+
+            if created:
+                # O banco foi reconstruído durante a criação: a cópia está desatualizada
+                if get_file_identity(db_path) != identity:
+                    errors.append(
+                        "Banco alterado durante a criação dos índices; tente novamente"
+                    )
+                    return {"created": [], "errors": errors}
+                swap_database(build_path, db_path)
+        except (sqlite3.Error, OSError) as e:
+            errors.append(str(e))
+            return {"created": [], "errors": errors}
+        finally:
+            remove_database_file(build_path)
+
+    # Índices não mudam o conteúdo: o banco continua válido para a ingestão incremental
+    refresh_database_entry(db_path, os.path.dirname(db_path) or ".")
+
+    return {"created": created, "errors": errors}
@@ -0,0 +1,967 @@
+"""
+Ferramentas para ingestão de arquivos CSV em bancos SQLite
+Arquivo: ingest_tools.py
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import uuid
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import IO, Callable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from tools.csv_reader_tools import iter_csv_chunks
+from tools.connection_tools import swap_database, remove_database_file
+from tools.catalog_tools import build_catalog
+from tools.database_tools import describe_dataset, HEADER_TABLE, ITEMS_TABLE
+from tools.rollup_tools import build_rollups
+from tools.sketch_tools import SketchBuilder
+from tools.fulltext_tools import build_fulltext_index
+from tools.engine_tools import ColumnarCopy, remove_stale_columnar_copies
+
+try:
+    import resource
+except ImportError:  # Windows não possui o módulo resource
+    resource = None
+
+
+TABLE_NAME = "notas_fiscais"
+
+# Versão do formato gerado pela ingestão; alterar força a reconstrução dos bancos
+INGEST_VERSION = 8
+
+# Quantidade de linhas lidas por vez durante a ingestão em streaming
+DEFAULT_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "100000"))
+
+# Quantidade máxima de processos usados na ingestão
+# de vários CSVs (0 = núcleos disponíveis)
+DEFAULT_INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+
+# Colunas indexadas após a carga (só as que existem em cada tabela)
+INDEXED_COLUMNS = [
+    "data_emissao",
+    "uf_emitente",
+    "valor_total",
+    "valor_nota_fiscal",
+    "descricao_do_produto_servico",
+]
+
+# Banco unificado: chave de acesso indexada nas duas tabelas para o JOIN
+UNIFIED_INDEXED_COLUMNS = ["chave_de_acesso"] + INDEXED_COLUMNS
+
+# Nomes curtos usados nos nomes dos índices
+INDEX_NAME_SUFFIXES = {
+    "descricao_do_produto_servico": "produto",
+    "chave_de_acesso": "chave",
+}
+
+# Esquema declarado dos layouts de NF-e (nomes das colunas como exportados no CSV).
+# Códigos (CNPJ, NCM, IE) são texto para preservar zeros à esquerda; colunas
+# com poucos valores distintos são categóricas para reduzir a memória por bloco.
+NFE_COMMON_DTYPES = {
+    "CHAVE DE ACESSO": "object",
+    "MODELO": "category",
+    "SÉRIE": "Int16",
+    "NÚMERO": "Int64",
+    "NATUREZA DA OPERAÇÃO": "category",
+    "DATA EMISSÃO": "object",
+    "CPF/CNPJ Emitente": "object",
+    "RAZÃO SOCIAL EMITENTE": "object",
+    "INSCRIÇÃO ESTADUAL EMITENTE": "object",
+    "UF EMITENTE": "category",
+    "MUNICÍPIO EMITENTE": "category",
+    "CNPJ DESTINATÁRIO": "object",
+    "NOME DESTINATÁRIO": "object",
+    "UF DESTINATÁRIO": "category",
+    "INDICADOR IE DESTINATÁRIO": "category",
+    "DESTINO DA OPERAÇÃO": "category",
+    "CONSUMIDOR FINAL": "category",
+    "PRESENÇA DO COMPRADOR": "category",
+}
+
+HEADER_CSV_DTYPES = {
+    **NFE_COMMON_DTYPES,
+    "EVENTO MAIS RECENTE": "category",
+    "DATA/HORA EVENTO MAIS RECENTE": "object",
+    "VALOR NOTA FISCAL": "float64",
+}
+
+ITEMS_CSV_DTYPES = {
+    **NFE_COMMON_DTYPES,
+    "NÚMERO PRODUTO": "Int32",
+    "DESCRIÇÃO DO PRODUTO/SERVIÇO": "object",
+    "CÓDIGO NCM/SH": "object",
+    "NCM/SH (TIPO DE PRODUTO)": "category",
+    "CFOP": "category",
+    "QUANTIDADE": "float64",
+    "UNIDADE": "category",
+    "VALOR UNITÁRIO": "float64",
+    "VALOR TOTAL": "float64",
+}
+
+# Colunas ausentes no arquivo são ignoradas pelo
+# pandas, então um único mapa atende os dois layouts
+NFE_CSV_DTYPES = {**HEADER_CSV_DTYPES, **ITEMS_CSV_DTYPES}
+
+# Formato das datas nos CSVs da NF-e (o mesmo gravado no SQLite)
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+NUMERIC_COLUMNS = ["quantidade", "valor_unitário", "valor_total", "valor_nota_fiscal"]
+
+# Origem dos dados: caminho de um CSV, par (arquivo RAR, nome do CSV dentro dele)
+# ou, para o banco unificado, {'cabecalho': origem, 'itens': origem}
+CsvSource = Union[str, Tuple[str, str], dict]
+
+
+def clean_column_name(col_name: str) -> str:
+    """Limpa nome da coluna para uso no SQL"""
+    return (
+        col_name.lower()
+        .replace(" ", "_")
+        .replace("/", "_")
+        .replace("-", "_")
+        .replace("(", "")
+        .replace(")", "")
+        .replace("ç", "c")
+        .replace("ã", "a")
+        .replace("õ", "o")
+    )
+
+
+def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepara os dados de um bloco já lido com os tipos de NFE_CSV_DTYPES.
+
+    As datas são interpretadas com formato fixo (sem inferência) e mantidas
+    no texto original; ano, mes e dia_semana (0 = segunda ... 6 = domingo)
+    são derivados de forma vetorizada em inteiros compactos.
+    """
+
+    # Converte data
+    if "data_emissao" in df.columns:
+        emission = pd.to_datetime(
+            df["data_emissao"], format=DATE_FORMAT, errors="coerce"
+        )
+        df["data_emissao"] = df["data_emissao"].where(emission.notna())
+        df["ano"] = emission.dt.year.astype("Int16")
+        df["mes"] = emission.dt.month.astype("Int8")
+        df["dia_semana"] = emission.dt.dayofweek.astype("Int8")
+
+    # Valores numéricos - verifica se as colunas existem antes
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            if not pd.api.types.is_float_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = df[col].fillna(0)
+
+    return df
+
+
+def get_memory_mb() -> Optional[float]:
+    """
+    Retorna a memória residente (RSS) atual do processo em MB.
+
+    Sem /proc (macOS) usa o pico do processo (ru_maxrss), que só cresce.
+
+    Returns:
+        Optional[float]: Memória em MB ou None se indisponível no sistema
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # No macOS o valor vem em bytes, no Linux em kilobytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class MemorySampler:
+    """
+    Pico de memória de uma ingestão: o RSS é
+    amostrado a cada bloco e comparado ao do início.
+
+    O pico do processo (ru_maxrss) incluiria ingestões anteriores no mesmo
+    processo e a memória do próprio aplicativo; a diferença mede só a ingestão.
+    """
+
+    def __init__(self):
+        self.baseline = get_memory_mb()
+        self.peak = self.baseline
+
+    def sample(self):
+        """Registra a memória atual se for a maior vista até agora."""
+        current = get_memory_mb()
+        if current is not None and (self.peak is None or current > self.peak):
+            self.peak = current
+
+    def peak_delta_mb(self) -> Optional[float]:
+        """
+        Maior acréscimo de memória desde o início (None se indisponível no sistema).
+        """
+        self.sample()
+        if self.baseline is None or self.peak is None:
+            return None
+        return max(0.0, self.peak - self.baseline)
+
+
+def quote_identifier(name: str) -> str:
+    """Escapa um identificador (tabela ou coluna) para uso no SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _iter_sqlite_rows(df: pd.DataFrame) -> Iterator[tuple]:
+    """Converte um DataFrame em tuplas com tipos aceitos pelo sqlite3."""
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+
+    df = df.astype(object).where(df.notna(), None)
+    return df.itertuples(index=False, name=None)
+
+
+def stream_csv_to_sqlite(
+    csv_path: Union[str, IO[bytes]],
+    db_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    table_name: str = TABLE_NAME,
+    column_cleaner: Callable[[str], str] = clean_column_name,
+    data_cleaner: Callable[[pd.DataFrame], pd.DataFrame] = clean_data,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    dtype: Optional[dict] = None,
+    chunk_observer: Optional[Callable[[pd.DataFrame], None]] = None,
+    memory_sampler: Optional[MemorySampler] = None,
+) -> dict:
+    """
+    Converte um CSV para SQLite lendo o arquivo em blocos de tamanho fixo.
+
+    Codificação, separador e decimal são detectados pelo início do arquivo
+    (iter_csv_chunks). Cada bloco é limpo e inserido na tabela dentro de uma
+    única transação, de modo que o uso de memória depende apenas de
+    chunk_size e não do tamanho do arquivo. Em caso de erro a tabela
+    anterior é preservada.
+
+    Args:
+        csv_path: Caminho do arquivo CSV ou fluxo binário com o conteúdo
+        db_path (str): Caminho do banco SQLite de destino
+        chunk_size (int): Quantidade de linhas por bloco
+        table_name (str): Nome da tabela de destino (substituída se existir)
+        column_cleaner: Função de limpeza dos nomes das colunas
+        data_cleaner: Função de limpeza aplicada a cada bloco
+        progress_callback: Função chamada com (linhas, blocos) após cada bloco
+        dtype (dict): Tipos das colunas do CSV (padrão: esquema declarado da NF-e)
+        chunk_observer: Função chamada com cada bloco
+            já limpo (ex.: construção dos esboços)
+        memory_sampler: Amostragem de memória
+            compartilhada entre tabelas (padrão: uma nova)
+
+    Returns:
+        dict: Métricas da ingestão (linhas, blocos, colunas, tempo de limpeza, linhas/s,
+              pico de memória acima do início da ingestão)
+    """
+    if memory_sampler is None:
+        memory_sampler = MemorySampler()
+    start = time.perf_counter()
+    rows = 0
+    chunks = 0
+    columns = []
+    clean_seconds = 0.0
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+
+        insert_sql = None
+        for chunk in iter_csv_chunks(
+            csv_path, chunk_size, NFE_CSV_DTYPES if dtype is None else dtype
+        ):
+            clean_start = time.perf_counter()
+            chunk.columns = [column_cleaner(col) for col in chunk.columns]
+            chunk = data_cleaner(chunk)
+            clean_seconds += time.perf_counter() - clean_start
+
+            # O primeiro bloco define o esquema da tabela
+            if insert_sql is None:
+                columns = chunk.columns.tolist()
+                conn.execute(pd.io.sql.get_schema(chunk, table_name, con=conn))
+                insert_sql = (
+                    f"INSERT INTO {quote_identifier(table_name)} "
+                    f"({', '.join(quote_identifier(col) for col in columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})"
+                )
+
+            if chunk.columns.tolist() != columns:
+                chunk = chunk.reindex(columns=columns)
+
+            if chunk_observer:
+                chunk_observer(chunk)
+
+            conn.executemany(insert_sql, _iter_sqlite_rows(chunk))
+            memory_sampler.sample()
+            rows += len(chunk)
+            chunks += 1
+
+            if progress_callback:
+                progress_callback(rows, chunks)
+
+        if insert_sql is None:
+            raise ValueError("Arquivo CSV sem registros")
+
+        conn.execute("COMMIT")
+
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        "rows": rows,
+        "chunks": chunks,
+        "columns": columns,
+        "elapsed_seconds": elapsed,
+        "clean_seconds": clean_seconds,
+        "rows_per_second": rows / elapsed if elapsed > 0 else 0.0,
+        "peak_memory_mb": memory_sampler.peak_delta_mb(),
+    }
+
+
+def get_source_name(source: CsvSource) -> str:
+    """Retorna o nome do arquivo CSV de uma origem de dados."""
+    if isinstance(source, dict):
+        return (
+            f"{get_source_name(source[HEADER_TABLE])} +"
+            f" {get_source_name(source[ITEMS_TABLE])}"
+        )
+    if isinstance(source, (tuple, list)):
+        return os.path.basename(source[1])
+    return os.path.basename(source)
+
+
+@contextmanager
+def open_csv_source(source: CsvSource) -> Iterator[Union[str, IO[bytes]]]:
+    """
+    Abre uma origem de dados para leitura pelo pandas.
+
+    CSVs em disco são lidos pelo caminho; CSVs dentro de um RAR são
+    descompactados em fluxo, sem arquivo intermediário.
+    """
+    if isinstance(source, (tuple, list)):
+        # Importação tardia: só o modo RAR depende do CrewAI
+        from tools.rar_tools import RarExtractorTool
+
+        rar_path, member_name = source
+        with RarExtractorTool().open_member(rar_path, member_name) as stream:
+            yield stream
+    else:
+        yield source
+
+
+def plan_archive_jobs(
+    rar_path: str, members: List[dict], destination_folder: str = "dados"
+) -> List[Tuple[CsvSource, str]]:
+    """
+    Monta os jobs de ingestão direta dos CSVs contidos em um RAR.
+
+    Args:
+        rar_path (str): Caminho do arquivo RAR
+        members: Arquivos do RAR (RarExtractorTool.list_members)
+        destination_folder (str): Pasta onde os bancos serão criados
+
+    Returns:
+        List[tuple]: Pares ((rar, nome do CSV), caminho do banco)
+    """
+    jobs = []
+    for member in members:
+        if not member["name"].lower().endswith(".csv"):
+            continue
+        db_name = Path(member["name"]).with_suffix(".db").name
+        jobs.append(((rar_path, member["name"]), f"{destination_folder}/{db_name}"))
+    return jobs
+
+
+def plan_unified_jobs(
+    jobs: List[Tuple[CsvSource, str]], destination_folder: str = "dados"
+) -> List[Tuple[CsvSource, str]]:
+    """
+    Agrupa os CSVs de cabeçalhos e itens do mesmo período em um banco unificado.
+
+    Arquivos '<prefixo>Cabecalho.csv' e '<prefixo>Itens.csv' viram um único
+    job com destino '<prefixo>Unificado.db'; arquivos sem par continuam como
+    jobs individuais.
+
+    Args:
+        jobs: Lista de pares (origem do CSV, caminho do banco)
+        destination_folder (str): Pasta onde os bancos serão criados
+
+    Returns:
+        List[tuple]: Jobs com os pares cabeçalho/itens unificados
+    """
+    groups = {}
+    for csv_source, db_path in jobs:
+        stem = Path(get_source_name(csv_source)).stem
+        lowered = stem.lower()
+        for kind, suffix in ((HEADER_TABLE, "cabecalho"), (ITEMS_TABLE, "itens")):
+            if lowered.endswith(suffix):
+                groups.setdefault(stem[: -len(suffix)], {})[kind] = (
+                    csv_source,
+                    db_path,
+                )
+
+    unified_jobs = []
+    paired = set()
+    for prefix, group in groups.items():
+        if len(group) != 2:
+            continue
+        unified_source = {kind: job[0] for kind, job in group.items()}
+        unified_jobs.append(
+            (unified_source, f"{destination_folder}/{prefix}Unificado.db")
+        )
+        paired.update(job[1] for job in group.values())
+
+    return unified_jobs + [job for job in jobs if job[1] not in paired]
+
+
+def plan_indexes(
+    conn: sqlite3.Connection, table_name: str, candidate_columns: List[str]
+) -> List[str]:
+    """
+    Monta os comandos de criação de índices para as colunas que existem na tabela.
+
+    Args:
+        conn: Conexão com o banco
+        table_name (str): Tabela a indexar
+        candidate_columns: Colunas desejadas, na ordem de criação
+
+    Returns:
+        List[str]: Comandos CREATE INDEX
+    """
+    table_columns = {
+        row[1]
+        for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")
+    }
+
+    statements = []
+    for column in candidate_columns:
+        if column not in table_columns:
+            continue
+        suffix = INDEX_NAME_SUFFIXES.get(column, column)
+        index_name = (
+            f"idx_{suffix}"
+            if table_name == TABLE_NAME
+            else f"idx_{table_name}_{suffix}"
+        )
+        statements.append(
+            f"CREATE INDEX IF NOT EXISTS {quote_identifier(index_name)} "
+            f"ON {quote_identifier(table_name)}({quote_identifier(column)});"
+        )
+    return statements
+
+
+def _finalize_database(
+    db_path: str,
+    index_tables: List[Tuple[str, List[str]]],
+    source_tables: List[str],
+    sketch_builders: Optional[List[SketchBuilder]] = None,
+    columnar_copy: Optional[ColumnarCopy] = None,
+) -> dict:
+    """
+    Finaliza um banco recém-carregado: índices, rollups, busca textual, estatísticas do
+    planejador, catálogo, esboços e cópia Parquet.
+
+    Os índices são criados só depois da carga completa e apenas para as
+    colunas existentes, assim como os índices FTS5 das colunas de texto
+    (produtos e empresas); em seguida o ANALYZE grava as estatísticas usadas
+    pelo planejador de consultas do SQLite e a tabela _catalog registra o
+    esquema e as estatísticas das colunas.
+
+    Args:
+        db_path (str): Caminho do banco
+        index_tables: Pares (tabela, colunas candidatas a índice)
+        source_tables: Tabelas de dados, origem das
+            tabelas pré-agregadas e dos índices textuais
+        sketch_builders: Esboços construídos durante
+            a carga, gravados na tabela _sketches
+        columnar_copy: Cópia Parquet gravada durante
+            a carga, registrada na tabela _columnar
+
+    Returns:
+        dict: Estatísticas finais, tempos de cada fase e erros de criação de índices
+    """
+    conn = sqlite3.connect(db_path)
+
+    start = time.perf_counter()
+    indexes = [
+        statement
+        for table_name, columns in index_tables
+        for statement in plan_indexes(conn, table_name, columns)
+    ]
+    indexes_created = 0
+    index_errors = []
+    for index in indexes:
+        try:
+            conn.execute(index)
+            indexes_created += 1
+        except sqlite3.Error as e:
+            index_errors.append(f"{index} -> {e}")
+    index_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rollups_created = sum(
+        build_rollups(conn, source_table) for source_table in source_tables
+    )
+    rollup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fulltext_indexes = [
+        fts
+        for fts in (
+            build_fulltext_index(conn, source_table) for source_table in source_tables
+        )
+        if fts
+    ]
+    fulltext_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    conn.execute("ANALYZE")
+    conn.commit()
+    analyze_seconds = time.perf_counter() - start
+
+    # Catálogo com esquema e estatísticas das
+    # colunas, lido pelas ferramentas de consulta
+    start = time.perf_counter()
+    object_names = {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')"
+        )
+    }
+    table_names = [
+        name for name in (HEADER_TABLE, ITEMS_TABLE) if name in object_names
+    ] + [TABLE_NAME]
+    available_cols = describe_dataset(
+        {
+            name: [
+                row[1].lower()
+                for row in conn.execute(f"PRAGMA table_info({quote_identifier(name)})")
+            ]
+            for name in table_names
+        }
+    )
+    # Na visão notas_fiscais as colunas comuns vêm da tabela de itens
+    catalog = build_catalog(
+        conn,
+        table_names,
+        available_cols["type"],
+        view_sources=[ITEMS_TABLE, HEADER_TABLE],
+    )
+    catalog_seconds = time.perf_counter() - start
+
+    # Esboços para o modo aproximado: o tempo inclui
+    # a atualização feita a cada bloco da carga
+    start = time.perf_counter()
+    sketches_created = sum(builder.save(conn) for builder in sketch_builders or [])
+    sketch_seconds = (
+        time.perf_counter()
+        - start
+        + sum(builder.elapsed_seconds for builder in sketch_builders or [])
+    )
+
+    # Cópia colunar para o motor DuckDB
+    columnar = (
+        columnar_copy.save(conn)
+        if columnar_copy
+        else {"columnar_tables": [], "columnar_seconds": 0.0}
+    )
+
+    # Verifica estatísticas finais
+    cursor = conn.cursor()
+    final_count = catalog[TABLE_NAME]["row_count"]
+
+    estados_count = 0
+    if available_cols["uf_emitente"]:
+        cursor.execute(
+            "SELECT COUNT(DISTINCT uf_emitente) FROM notas_fiscais WHERE uf_emitente IS"
+            " NOT NULL"
+        )
+        estados_count = cursor.fetchone()[0]
+
+    total_value = 0
+    if available_cols["valor_column"]:
+        cursor.execute(
+            f"SELECT SUM({available_cols['valor_column']}) FROM notas_fiscais WHERE"
+            f" {available_cols['valor_column']} IS NOT NULL"
+        )
+        total_value = cursor.fetchone()[0] or 0
+
+    conn.close()
+
+    return {
+        "final_count": final_count,
+        "estados_count": estados_count,
+        "total_value": total_value,
+        "indexes_created": indexes_created,
+        "indexes_total": len(indexes),
+        "index_errors": index_errors,
+        "index_seconds": index_seconds,
+        "rollups_created": rollups_created,
+        "rollup_seconds": rollup_seconds,
+        "fulltext_indexes": fulltext_indexes,
+        "fulltext_seconds": fulltext_seconds,
+        "analyze_seconds": analyze_seconds,
+        "catalog_seconds": catalog_seconds,
+        "sketches_created": sketches_created,
+        "sketch_seconds": sketch_seconds,
+        **columnar,
+    }
+
+
+def combine_observers(
+    *observers: Callable[[pd.DataFrame], None]
+) -> Callable[[pd.DataFrame], None]:
+    """
+    Encadeia as funções que acompanham cada bloco carregado (esboços, cópia Parquet).
+    """
+
+    def observe(chunk: pd.DataFrame):
+        for observer in observers:
+            observer(chunk)
+
+    return observe
+
+
+def get_build_path(db_path: str) -> str:
+    """Arquivo temporário, na mesma pasta do banco, onde a nova versão é construída."""
+    return f"{db_path}.{uuid.uuid4().hex[:8]}.building"
+
+
+def create_join_view(conn: sqlite3.Connection) -> List[str]:
+    """
+    Cria a visão notas_fiscais unindo cada item ao cabeçalho da sua nota.
+
+    A visão traz todas as colunas de 'itens' e as colunas exclusivas de
+    'cabecalho' (ex.: valor_nota_fiscal), ligadas por chave_de_acesso.
+
+    Returns:
+        List[str]: Colunas da visão
+    """
+    header_columns = [
+        row[1] for row in conn.execute(f"PRAGMA table_info({HEADER_TABLE})")
+    ]
+    item_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({ITEMS_TABLE})")]
+    header_only = [col for col in header_columns if col not in item_columns]
+
+    select_list = ", ".join(
+        [f"i.{quote_identifier(col)}" for col in item_columns]
+        + [f"c.{quote_identifier(col)}" for col in header_only]
+    )
+
+    existing = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = ?", (TABLE_NAME,)
+    ).fetchone()
+    if existing:
+        conn.execute(f"DROP {existing[0].upper()} {TABLE_NAME}")
+
+    conn.execute(
+        f"CREATE VIEW {TABLE_NAME} AS SELECT {select_list} FROM {ITEMS_TABLE} i LEFT"
+        f" JOIN {HEADER_TABLE} c ON c.chave_de_acesso = i.chave_de_acesso"
+    )
+    conn.commit()
+
+    return item_columns + header_only
+
+
+def ingest_unified_database(
+    unified_source: dict,
+    db_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    Carrega cabeçalhos e itens em um único banco com as tabelas 'cabecalho' e 'itens'.
+
+    As duas tabelas são indexadas por chave_de_acesso e a visão notas_fiscais
+    faz o JOIN entre elas, mantendo compatíveis as consultas existentes.
+    O banco é construído em um arquivo temporário e só substitui db_path
+    depois de finalizado (índices, ANALYZE, catálogo); até lá as consultas
+    continuam usando a versão anterior. Não lança exceções: falhas são
+    devolvidas no campo 'error' do resultado.
+
+    Args:
+        unified_source (dict): {'cabecalho': origem, 'itens': origem}
+        db_path (str): Caminho do banco SQLite de destino
+        chunk_size (int): Quantidade de linhas por bloco
+        progress_callback: Função chamada com (linhas,
+            blocos) acumulados após cada bloco
+
+    Returns:
+        dict: Resultado da ingestão com métricas e estatísticas do banco
+    """
+    result = {
+        "source": unified_source,
+        "source_name": get_source_name(unified_source),
+        "db_path": db_path,
+        "success": False,
+        "error": None,
+    }
+
+    build_path = get_build_path(db_path)
+    columnar_copy = ColumnarCopy(db_path)
+    try:
+        start = time.perf_counter()
+        rows = 0
+        chunks = 0
+        clean_seconds = 0.0
+        sketch_builders = []
+        memory_sampler = MemorySampler()
+
+        for table_name in (HEADER_TABLE, ITEMS_TABLE):
+
+            def report_progress(
+                table_rows: int, table_chunks: int, base=(rows, chunks)
+            ):
+                if progress_callback:
+                    progress_callback(base[0] + table_rows, base[1] + table_chunks)
+
+            sketch_builder = SketchBuilder(table_name)
+            sketch_builders.append(sketch_builder)
+            with open_csv_source(unified_source[table_name]) as csv_input:
+                report = stream_csv_to_sqlite(
+                    csv_input,
+                    build_path,
+                    chunk_size=chunk_size,
+                    table_name=table_name,
+                    progress_callback=report_progress,
+                    chunk_observer=combine_observers(
+                        sketch_builder.update, columnar_copy.observer(table_name)
+                    ),
+                    memory_sampler=memory_sampler,
+                )
+            rows += report["rows"]
+            chunks += report["chunks"]
+            clean_seconds += report["clean_seconds"]
+
+        conn = sqlite3.connect(build_path)
+        columns = create_join_view(conn)
+        conn.close()
+
+        elapsed = time.perf_counter() - start
+        result.update(
+            {
+                "rows": rows,
+                "chunks": chunks,
+                "columns": columns,
+                "elapsed_seconds": elapsed,
+                "clean_seconds": clean_seconds,
+                "rows_per_second": rows / elapsed if elapsed > 0 else 0.0,
+                "peak_memory_mb": memory_sampler.peak_delta_mb(),
+            }
+        )
+        # Rollups por tabela: somar valor_nota_fiscal
+        # pela visão repetiria o valor em cada item
+        result.update(
+            _finalize_database(
+                build_path,
+                [
+                    (HEADER_TABLE, UNIFIED_INDEXED_COLUMNS),
+                    (ITEMS_TABLE, UNIFIED_INDEXED_COLUMNS),
+                ],
+                [ITEMS_TABLE, HEADER_TABLE],
+                sketch_builders,
+                columnar_copy,
+            )
+        )
+        swap_database(build_path, db_path)
+        result.update({"success": True, "chunk_size": chunk_size})
+
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        remove_database_file(build_path)
+        # Cópias Parquet de versões anteriores (ou desta, se a ingestão falhou)
+        columnar_copy.close()
+        remove_stale_columnar_copies(db_path)
+
+    return result
+
+
+def ingest_csv_file(
+    csv_source: CsvSource,
+    db_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    Converte um CSV em banco SQLite completo: carga em blocos, índices e estatísticas.
+
+    O CSV pode estar em disco ou dentro de um RAR (par (rar, nome do CSV));
+    neste caso ele é lido em fluxo sem ser extraído. O banco é construído
+    em um arquivo temporário e trocado atomicamente com db_path ao final,
+    de modo que consultas concorrentes nunca vejam uma tabela incompleta.
+    Não lança exceções: falhas são devolvidas no campo 'error' do
+    resultado, o que permite executar a função em processos separados.
+
+    Args:
+        csv_source: Caminho do CSV ou par (arquivo RAR, nome do CSV)
+        db_path (str): Caminho do banco SQLite de destino
+        chunk_size (int): Quantidade de linhas por bloco
+        progress_callback: Função chamada com (linhas, blocos) após cada bloco
+
+    Returns:
+        dict: Resultado da ingestão com métricas e estatísticas do banco
+    """
+    result = {
+        "source": csv_source,
+        "source_name": get_source_name(csv_source),
+        "db_path": db_path,
+        "success": False,
+        "error": None,
+    }
+
+    build_path = get_build_path(db_path)
+    columnar_copy = ColumnarCopy(db_path)
+    try:
+        sketch_builder = SketchBuilder(TABLE_NAME)
+        with open_csv_source(csv_source) as csv_input:
+            result.update(
+                stream_csv_to_sqlite(
+                    csv_input,
+                    build_path,
+                    chunk_size=chunk_size,
+                    progress_callback=progress_callback,
+                    chunk_observer=combine_observers(
+                        sketch_builder.update, columnar_copy.observer(TABLE_NAME)
+                    ),
+                )
+            )
+
+        result.update(
+            _finalize_database(
+                build_path,
+                [(TABLE_NAME, INDEXED_COLUMNS)],
+                [TABLE_NAME],
+                [sketch_builder],
+                columnar_copy,
+            )
+        )
+        swap_database(build_path, db_path)
+        result.update({"success": True, "chunk_size": chunk_size})
+
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        remove_database_file(build_path)
+        # Cópias Parquet de versões anteriores (ou desta, se a ingestão falhou)
+        columnar_copy.close()
+        remove_stale_columnar_copies(db_path)
+
+    return result
+
+
+def _ingest_worker(
+    csv_source: CsvSource, db_path: str, chunk_size: int, progress_queue
+) -> dict:
+    """Executa a ingestão em um processo do pool, publicando o progresso na fila."""
+
+    def report_progress(rows: int, chunks: int):
+        progress_queue.put((db_path, rows, chunks))
+
+    if isinstance(csv_source, dict):
+        return ingest_unified_database(csv_source, db_path, chunk_size, report_progress)
+    return ingest_csv_file(csv_source, db_path, chunk_size, report_progress)
+
+
+def ingest_csv_files_parallel(
+    jobs: List[Tuple[CsvSource, str]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_workers: int = DEFAULT_INGEST_WORKERS,
+    progress_callback: Optional[Callable[[str, int, int], None]] = None,
+    result_callback: Optional[Callable[[dict], None]] = None,
+    poll_interval: float = 0.2,
+) -> List[dict]:
+    """
+    Converte vários CSVs em paralelo, um processo por arquivo.
+
+    Os callbacks são chamados sempre na thread de quem chamou a função,
+    portanto podem atualizar a interface do Streamlit com segurança.
+
+    Args:
+        jobs: Lista de pares (origem do CSV, caminho do banco)
+        chunk_size (int): Quantidade de linhas por bloco
+        max_workers (int): Processos no pool (0 = núcleos disponíveis)
+        progress_callback: Função chamada com (banco, linhas, blocos) durante a carga
+        result_callback: Função chamada com o resultado de cada arquivo ao terminar
+        poll_interval (float): Intervalo em segundos entre verificações de progresso
+
+    Returns:
+        List[dict]: Resultados da ingestão na mesma ordem de jobs
+    """
+    if not jobs:
+        return []
+
+    workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    results = {}
+
+    def drain(queue):
+        while not queue.empty():
+            db_path, rows, chunks = queue.get()
+            if progress_callback:
+                progress_callback(db_path, rows, chunks)
+
+    def collect(result):
+        results[result["db_path"]] = result
+        if result_callback:
+            result_callback(result)
+
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    _ingest_worker, csv_source, db_path, chunk_size, progress_queue
+                ): (csv_source, db_path)
+                for csv_source, db_path in jobs
+            }
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=poll_interval)
+                drain(progress_queue)
+
+                for future in done:
+                    csv_source, db_path = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Processo interrompido (ex.: falta de memória)
+                        result = {
+                            "source": csv_source,
+                            "source_name": get_source_name(csv_source),
+                            "db_path": db_path,
+                            "success": False,
+                            "error": str(e),
+                        }
+                    collect(result)
+
+    return [results[db_path] for _, db_path in jobs]
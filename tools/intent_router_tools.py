@@ -0,0 +1,452 @@
+"""
+Ferramentas de roteamento de intenções: perguntas frequentes respondidas sem LLM
+Arquivo: intent_router_tools.py
+"""
+
+import os
+import re
+import time
+import threading
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from tools.answer_cache_tools import normalize_question
+from tools.answer_format_tools import (
+    format_currency,
+    format_number,
+    format_month,
+    format_ranking,
+    MAX_LIST_ITEMS,
+)
+from tools.database_tools import (
+    get_available_columns,
+    HEADER_TABLE,
+    ITEMS_TABLE,
+    MAIN_TABLE,
+)
+from tools.engine_tools import choose_engine, get_engine, QUERY_ENGINE
+from tools.query_governor_tools import QueryCancelledError, QUERY_TIME_BUDGET
+from tools.rollup_tools import quote_identifier
+
+# Responde perguntas frequentes sem acionar os agentes ("0" desativa)
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "1") == "1"
+
+# Início opcional das perguntas ("qual é o", "me diga os", "quais são as"...)
+_PREFIX = (
+    r"(?:(?:qual|quais|quem|me diga|mostre|liste|informe)\s+)?"
+    r"(?:(?:e|eh|sao|foi|foram)\s+)?(?:(?:o|a|os|as)\s+)?"
+)
+_NOTAS = r"(?:\s+(?:de|das)\s+notas(?:\s+fiscais)?)?"
+_TOP = r"(?:(?:top|os|as)\s+)?(?P<n>\d{1,2})\s+"
+
+
+class Intent:
+    """
+    Classe de pergunta: padrões (a pergunta normalizada inteira deve casar)
+    e a função que monta a consulta e formata a resposta para o banco.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        patterns: List[str],
+        build: Callable[[dict, dict], Optional[dict]],
+    ):
+        self.name = name
+        self.patterns = [re.compile(_PREFIX + pattern) for pattern in patterns]
+        self.build = build
+
+    def match(self, question: str) -> Optional[dict]:
+        for pattern in self.patterns:
+            found = pattern.fullmatch(question)
+            if found:
+                return found.groupdict()
+        return None
+
+
+def _column(col_info: dict, table: str, *candidates: str) -> Optional[str]:
+    """Primeira coluna candidata existente na tabela (nomes com e sem acento)."""
+    columns = col_info["tables"].get(table, [])
+    return next((quote_identifier(col) for col in candidates if col in columns), None)
+
+
+def _value_source(col_info: dict) -> Optional[tuple]:
+    """
+    Tabela e coluna de valor: itens no banco unificado
+    (valor_total), notas_fiscais nos demais.
+    """
+    if not col_info["valor_column"]:
+        return None
+    table = ITEMS_TABLE if col_info["type"] == "unified" else MAIN_TABLE
+    return table, quote_identifier(col_info["valor_column"])
+
+
+def _top_count(params: dict) -> int:
+    return min(int(params.get("n") or 1), MAX_LIST_ITEMS) or 1
+
+
+def _build_total_records(col_info: dict, params: dict) -> dict:
+    return {
+        "query": f"SELECT COUNT(*) FROM {MAIN_TABLE}",
+        "format": lambda df: f"Total de registros: {format_number(df.iat[0, 0])}",
+    }
+
+
+def _build_total_notes(col_info: dict, params: dict) -> Optional[dict]:
+    if col_info["type"] in ("unified", "header"):
+        query = (
+            "SELECT COUNT(*) FROM"
+            f" {HEADER_TABLE if col_info['type'] == 'unified' else MAIN_TABLE}"
+        )
+    elif _column(col_info, MAIN_TABLE, "chave_de_acesso"):
+        query = f"SELECT COUNT(DISTINCT chave_de_acesso) FROM {MAIN_TABLE}"
+    else:
+        return None
+    return {
+        "query": query,
+        "format": lambda df: f"Total de notas fiscais: {format_number(df.iat[0, 0])}",
+    }
+
+
+def _build_total_value(col_info: dict, params: dict) -> Optional[dict]:
+    source = _value_source(col_info)
+    if source is None:
+        return None
+    table, value = source
+    return {
+        "query": f"SELECT SUM({value}) FROM {table}",
+        "format": lambda df: f"Valor total: {format_currency(df.iat[0, 0])}",
+    }
+
+
+def _build_top_party(label_one: str, label_many: str, *name_columns: str):
+    """Ranking de emitentes ou destinatários pelo valor total."""
+
+    def build(col_info: dict, params: dict) -> Optional[dict]:
+        source = _value_source(col_info)
+        if source is None:
+            return None
+        table, value = source
+        name = _column(col_info, table, *name_columns)
+        if name is None:
+            return None
+
+        limit = _top_count(params)
+        query = (
+            f"SELECT {name}, SUM({value}) AS total FROM {table} WHERE {name} IS NOT"
+            f" NULL GROUP BY {name} ORDER BY total DESC LIMIT {limit}"
+        )
+
+        def format_answer(df):
+            if limit == 1:
+                return f"{label_one}: {df.iat[0, 0]} - {format_currency(df.iat[0, 1])}"
+            return f"{label_many}:\n" + format_ranking(
+                [
+                    (row[0], format_currency(row[1]))
+                    for row in df.itertuples(index=False)
+                ]
+            )
+
+        return {"query": query, "format": format_answer}
+
+    return build
+
+
+def _build_most_expensive_product(col_info: dict, params: dict) -> Optional[dict]:
+    table = ITEMS_TABLE if col_info["type"] == "unified" else MAIN_TABLE
+    product = _column(col_info, table, "descricao_do_produto_servico")
+    price = _column(col_info, table, "valor_unitário", "valor_unitario")
+    if product is None or price is None:
+        return None
+
+    limit = _top_count(params)
+    query = (
+        f"SELECT {product}, MAX({price}) AS preco FROM {table} WHERE {price} IS NOT"
+        f" NULL GROUP BY {product} ORDER BY preco DESC LIMIT {limit}"
+    )
+
+    def format_answer(df):
+        if limit == 1:
+            return (
+                f"Produto mais caro: {df.iat[0, 0]} - {format_currency(df.iat[0, 1])}"
+            )
+        return "Produtos mais caros:\n" + format_ranking(
+            [(row[0], format_currency(row[1])) for row in df.itertuples(index=False)]
+        )
+
+    return {"query": query, "format": format_answer}
+
+
+def _build_total_by_uf(col_info: dict, params: dict) -> Optional[dict]:
+    source = _value_source(col_info)
+    if source is None:
+        return None
+    table, value = source
+    if params.get("destino"):
+        uf = _column(col_info, table, "uf_destinatário", "uf_destinatario")
+    else:
+        uf = _column(col_info, table, "uf_emitente")
+    if uf is None:
+        return None
+
+    query = (
+        f"SELECT {uf}, SUM({value}) AS total FROM {table} WHERE {uf} IS NOT NULL GROUP"
+        f" BY {uf} ORDER BY total DESC"
+    )
+    return {
+        "query": query,
+        "format": lambda df: "\n".join(
+            f"{row[0]}: {format_currency(row[1])}" for row in df.itertuples(index=False)
+        ),
+    }
+
+
+def _build_total_by_month(col_info: dict, params: dict) -> Optional[dict]:
+    source = _value_source(col_info)
+    if source is None:
+        return None
+    table, value = source
+    if (
+        _column(col_info, table, "ano") is None
+        or _column(col_info, table, "mes") is None
+    ):
+        return None
+
+    query = (
+        f"SELECT ano, mes, SUM({value}) AS total FROM {table} WHERE ano IS NOT NULL AND"
+        " mes IS NOT NULL GROUP BY ano, mes ORDER BY ano, mes"
+    )
+    return {
+        "query": query,
+        "format": lambda df: "\n".join(
+            f"{format_month(row[0], row[1])}: {format_currency(row[2])}"
+            for row in df.itertuples(index=False)
+        ),
+    }
+
+
+# Complemento opcional "das notas fiscais", "das vendas" ou "dos itens"
+_DAS_NOTAS = r"(?:\s+(?:das|dos)\s+(?:notas(?:\s+fiscais)?|vendas|itens))?"
+_NO_BANCO = r"(?:\s+(?:no|do)\s+(?:banco|arquivo))?"
+_VALUE = r"(?:valor|faturamento|total|soma)(?:\s+total)?" + _DAS_NOTAS
+
+INTENTS = [
+    Intent(
+        "total_registros",
+        [
+            r"(?:quantidade|numero|total)\s+(?:de\s+)?registros" + _NO_BANCO,
+            r"quantos\s+registros(?:\s+(?:tem|ha|existem))?" + _NO_BANCO,
+        ],
+        _build_total_records,
+    ),
+    Intent(
+        "total_notas",
+        [
+            r"(?:quantidade|numero|total)\s+de\s+notas(?:\s+fiscais)?(?:\s+emitidas)?",
+            r"quantas\s+notas(?:\s+fiscais)?"
+            r"(?:\s+(?:tem|ha|existem|foram\s+emitidas))?",
+        ],
+        _build_total_notes,
+    ),
+    Intent(
+        "valor_total",
+        [
+            r"(?:valor|faturamento)\s+total" + _DAS_NOTAS,
+            r"soma\s+(?:do|dos)\s+valor(?:es)?"
+            r"(?:\s+(?:das|dos)\s+(?:notas(?:\s+fiscais)?|itens))?",
+        ],
+        _build_total_value,
+    ),
+    Intent(
+        "principal_emitente",
+        [
+            r"(?:principal|maior)\s+emitente"
+            + _NOTAS
+            + r"(?:\s+(?:por|em)\s+valor(?:\s+total)?)?",
+            r"emitente\s+com\s+(?:o\s+)?(?:maior|mais)\s+"
+            r"(?:valor|faturamento)(?:\s+total)?",
+            _TOP
+            + r"(?:maiores|principais)\s+emitentes"
+            + _NOTAS
+            + r"(?:\s+(?:por|em)\s+valor(?:\s+total)?)?",
+        ],
+        _build_top_party(
+            "Principal emitente", "Principais emitentes", "razao_social_emitente"
+        ),
+    ),
+    Intent(
+        "principal_destinatario",
+        [
+            r"(?:principal|maior)\s+destinatario"
+            + _NOTAS
+            + r"(?:\s+(?:por|em)\s+valor(?:\s+total)?)?",
+            r"destinatario\s+com\s+(?:o\s+)?(?:maior|mais)\s+"
+            r"(?:valor|faturamento)(?:\s+total)?",
+            _TOP
+            + r"(?:maiores|principais)\s+destinatarios"
+            + _NOTAS
+            + r"(?:\s+(?:por|em)\s+valor(?:\s+total)?)?",
+        ],
+        _build_top_party(
+            "Principal destinatário",
+            "Principais destinatários",
+            "nome_destinatário",
+            "nome_destinatario",
+        ),
+    ),
+    Intent(
+        "produto_mais_caro",
+        [
+            r"produto\s+(?:mais\s+caro"
+            r"|de\s+maior\s+(?:valor|preco)(?:\s+unitario)?"
+            r"|com\s+(?:o\s+)?maior\s+(?:valor|preco)(?:\s+unitario)?)",
+            _TOP + r"produtos\s+(?:mais\s+caros"
+            r"|de\s+maior\s+(?:valor|preco)\s+unitario"
+            r"|com\s+maior\s+(?:valor|preco)\s+unitario)",
+        ],
+        _build_most_expensive_product,
+    ),
+    Intent(
+        "valor_por_uf",
+        [
+            _VALUE + r"\s+por\s+(?:uf|estado)"
+            r"(?:\s+(?:emitente|do\s+emitente|de\s+origem)"
+            r"|\s+(?P<destino>de\s+destino|do\s+destinatario|destinatario))?"
+        ],
+        _build_total_by_uf,
+    ),
+    Intent(
+        "valor_por_mes",
+        [
+            _VALUE + r"\s+(?:por\s+mes|mensal)",
+            r"(?:evolucao|faturamento|valor)\s+mensal" + _DAS_NOTAS,
+        ],
+        _build_total_by_month,
+    ),
+]
+
+
+class IntentRouterStats:
+    """
+    Contadores do roteador: perguntas respondidas
+    sem LLM (acertos) e enviadas aos agentes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._by_intent = {}
+
+    def record(self, intent: Optional[str]):
+        with self._lock:
+            if intent is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._by_intent[intent] = self._by_intent.get(intent, 0) + 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "by_intent": dict(self._by_intent),
+            }
+
+
+_router_stats = IntentRouterStats()
+
+
+def match_intent(db_path: str, pergunta: str) -> Optional[dict]:
+    """
+    Procura a intenção da pergunta e monta a consulta para o esquema do banco.
+
+    Returns:
+        dict: Intenção, consulta e formatador (None se nenhuma intenção casar
+              ou se o banco não tiver as colunas necessárias)
+    """
+    question = normalize_question(pergunta)
+    col_info = None
+    for intent in INTENTS:
+        params = intent.match(question)
+        if params is None:
+            continue
+        if col_info is None:
+            col_info = get_available_columns(db_path)
+            if col_info["type"] == "error":
+                return None
+        plan = intent.build(col_info, params)
+        if plan:
+            return {"intent": intent.name, **plan}
+    return None
+
+
+def answer_with_intent(
+    db_path: str,
+    pergunta: str,
+    cancel_event: Optional[threading.Event] = None,
+    engine: str = QUERY_ENGINE,
+) -> Optional[dict]:
+    """
+    Responde perguntas frequentes direto no banco, sem acionar os agentes.
+
+    A pergunta normalizada (sem acentos e pontuação) precisa casar por
+    inteiro com um dos padrões: perguntas com filtros ou detalhes extras
+    seguem para os agentes. A consulta roda no motor escolhido para ela
+    (com as tabelas pré-agregadas no SQLite) e a resposta é formatada no
+    padrão do formatador de respostas ("Nome - R$ 1.234,56").
+
+    Returns:
+        dict: Intenção, consulta, resposta e tempo gasto (None se a pergunta
+              deve ir para os agentes)
+    """
+    if not INTENT_ROUTER:
+        return None
+
+    start = time.perf_counter()
+    plan = match_intent(db_path, pergunta)
+    if plan is not None:
+        try:
+            engine_name = choose_engine(db_path, plan["query"], engine)
+            governed = get_engine(engine_name).run(
+                db_path,
+                plan["query"],
+                max_rows=MAX_LIST_ITEMS * 100,
+                time_budget=QUERY_TIME_BUDGET,
+                cancel_event=cancel_event,
+            )
+            df = governed["dataframe"]
+            answer = (
+                plan["format"](df)
+                if not df.empty and pd.notna(df.iat[0, 0])
+                else "Nenhum resultado encontrado."
+            )
+        except QueryCancelledError as e:
+            # Cancelamento pelo usuário interrompe a
+            # análise; tempo esgotado segue para os agentes
+            if not e.timed_out:
+                raise
+            plan = None
+        except Exception:
+            # Falha na consulta montada: os agentes respondem
+            plan = None
+
+    _router_stats.record(plan["intent"] if plan else None)
+    if plan is None:
+        return None
+
+    return {
+        "intent": plan["intent"],
+        "query": plan["query"],
+        "answer": answer,
+        "elapsed_seconds": time.perf_counter() - start,
+    }
+
+
+def get_intent_router_stats() -> dict:
+    """Taxa de perguntas respondidas pelo roteador sem LLM, no total e por intenção."""
+    return _router_stats.get_stats()
@@ -0,0 +1,273 @@
+"""
+Ferramentas para ingestão incremental baseada no conteúdo dos CSVs
+Arquivo: manifest_tools.py
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from tools.csv_reader_tools import read_csv_header
+from tools.ingest_tools import INGEST_VERSION, CsvSource
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+
+# Tamanho dos blocos lidos ao calcular o hash dos arquivos
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def get_manifest_path(folder: str = "dados") -> Path:
+    """Retorna o caminho do manifesto de ingestão da pasta."""
+    return Path(folder) / MANIFEST_FILENAME
+
+
+def load_manifest(folder: str = "dados") -> dict:
+    """
+    Carrega o manifesto de ingestão da pasta.
+
+    Returns:
+        dict: Entradas do manifesto indexadas pelo
+            caminho do banco (vazio se não existir)
+    """
+    manifest_path = get_manifest_path(folder)
+    if not manifest_path.exists():
+        return {}
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        # Manifesto corrompido: tudo será reconstruído
+        return {}
+
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(manifest: dict, folder: str = "dados"):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+    manifest_path = get_manifest_path(folder)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def hash_file(path: str) -> str:
+    """Calcula o SHA-256 do conteúdo do arquivo lendo-o em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def describe_csv(csv_path: str, previous: Optional[dict] = None) -> dict:
+    """
+    Descreve um CSV pelo conteúdo: hash, tamanho e colunas.
+
+    Se tamanho e data de modificação forem iguais aos da entrada anterior
+    do manifesto, o hash gravado é reaproveitado sem reler o arquivo.
+
+    Args:
+        csv_path (str): Caminho do arquivo CSV
+        previous (dict): Entrada anterior do manifesto para este banco
+
+    Returns:
+        dict: Descrição do arquivo
+    """
+    stat = os.stat(csv_path)
+    previous_csv = (previous or {}).get("csv", {})
+
+    if (
+        previous_csv.get("content_id")
+        and previous_csv.get("size") == stat.st_size
+        and previous_csv.get("mtime_ns") == stat.st_mtime_ns
+    ):
+        content_id = previous_csv["content_id"]
+    else:
+        content_id = f"sha256:{hash_file(csv_path)}"
+
+    return {
+        "source": csv_path,
+        "content_id": content_id,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "columns": read_csv_header(csv_path),
+    }
+
+
+def describe_archive_member(rar_path: str, member: dict) -> dict:
+    """
+    Descreve um CSV contido em um RAR pelo CRC32 e tamanho informados na listagem.
+
+    Args:
+        rar_path (str): Caminho do arquivo RAR
+        member (dict): Arquivo do RAR (RarExtractorTool.list_members)
+
+    Returns:
+        dict: Descrição do arquivo (content_id None se o CRC não estiver disponível)
+    """
+    content_id = (
+        f"crc32:{member['crc']}:{member['size']}" if member.get("crc") else None
+    )
+
+    return {
+        "source": f"{rar_path}::{member['name']}",
+        "content_id": content_id,
+        "size": member.get("size"),
+        "mtime_ns": None,
+        "columns": None,
+    }
+
+
+def describe_source(
+    csv_source: CsvSource, entry: Optional[dict], members_by_name: dict
+) -> dict:
+    """
+    Descreve qualquer origem de dados (CSV, CSV dentro de RAR ou par cabeçalho/itens).
+
+    Para o banco unificado o content_id combina os das duas origens, de modo
+    que a alteração de qualquer um dos CSVs reconstrói o banco.
+    """
+    if isinstance(csv_source, dict):
+        previous_parts = ((entry or {}).get("csv") or {}).get("parts", {})
+        parts = {
+            kind: describe_source(
+                source, {"csv": previous_parts.get(kind, {})}, members_by_name
+            )
+            for kind, source in sorted(csv_source.items())
+        }
+        content_ids = [part["content_id"] for part in parts.values()]
+        return {
+            "source": " + ".join(part["source"] for part in parts.values()),
+            "content_id": "|".join(content_ids) if all(content_ids) else None,
+            "size": sum(part["size"] or 0 for part in parts.values()),
+            "mtime_ns": None,
+            "columns": {kind: part["columns"] for kind, part in parts.items()},
+            "parts": parts,
+        }
+
+    if isinstance(csv_source, (tuple, list)):
+        rar_path, member_name = csv_source
+        return describe_archive_member(
+            rar_path, members_by_name.get(member_name, {"name": member_name})
+        )
+
+    return describe_csv(csv_source, entry)
+
+
+def describe_database(db_path: str) -> Optional[dict]:
+    """
+    Descreve o arquivo do banco (tamanho e data de modificação) ou None se não existir.
+    """
+    if not os.path.exists(db_path):
+        return None
+
+    stat = os.stat(db_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_up_to_date(entry: Optional[dict], csv_info: dict, db_path: str) -> bool:
+    """
+    Verifica se o banco registrado no manifesto corresponde ao CSV atual.
+
+    O banco é reaproveitado quando o conteúdo e as colunas do CSV são os
+    mesmos, a versão do pipeline de ingestão não mudou e o arquivo do banco
+    continua exatamente como foi gerado.
+    """
+    if not entry or not csv_info["content_id"]:
+        return False
+
+    return (
+        entry.get("ingest_version") == INGEST_VERSION
+        and entry.get("csv", {}).get("content_id") == csv_info["content_id"]
+        and entry.get("csv", {}).get("columns") == csv_info["columns"]
+        and entry.get("db") is not None
+        and entry.get("db") == describe_database(db_path)
+    )
+
+
+def refresh_database_entry(db_path: str, folder: str = "dados"):
+    """
+    Atualiza a descrição do banco no manifesto após alterações que não mudam
+    os dados (ex.: índices criados depois da ingestão), evitando que o banco
+    seja reconstruído na próxima ingestão.
+    """
+    manifest = load_manifest(folder)
+    entry = manifest.get(db_path)
+    if not entry:
+        return
+
+    entry["db"] = describe_database(db_path)
+    save_manifest(manifest, folder)
+
+
+def plan_incremental_ingest(
+    jobs: List[Tuple[CsvSource, str]],
+    folder: str = "dados",
+    archive_members: Optional[List[dict]] = None,
+) -> Tuple[List[Tuple[CsvSource, str]], List[dict], dict]:
+    """
+    Separa os CSVs que precisam ser convertidos dos que já têm banco atualizado.
+
+    Args:
+        jobs: Lista de pares (origem do CSV, caminho do banco)
+        folder (str): Pasta onde fica o manifesto
+        archive_members: Listagem do RAR, necessária para origens dentro de um RAR
+
+    Returns:
+        tuple: (jobs a converter, entradas reaproveitadas,
+            descrições dos CSVs por banco)
+    """
+    manifest = load_manifest(folder)
+    members_by_name = {member["name"]: member for member in archive_members or []}
+
+    pending = []
+    reused = []
+    csv_infos = {}
+
+    for csv_source, db_path in jobs:
+        entry = manifest.get(db_path)
+
+        csv_info = describe_source(csv_source, entry, members_by_name)
+        csv_infos[db_path] = csv_info
+
+        if is_up_to_date(entry, csv_info, db_path):
+            reused.append(entry)
+        else:
+            pending.append((csv_source, db_path))
+
+    return pending, reused, csv_infos
+
+
+def record_ingest_results(results: List[dict], csv_infos: dict, folder: str = "dados"):
+    """
+    Registra no manifesto os bancos gerados com sucesso.
+
+    Args:
+        results: Resultados de ingest_csv_file
+        csv_infos: Descrições dos CSVs devolvidas por plan_incremental_ingest
+        folder (str): Pasta onde fica o manifesto
+    """
+    manifest = load_manifest(folder)
+
+    for result in results:
+        db_path = result["db_path"]
+        if not result["success"]:
+            manifest.pop(db_path, None)
+            continue
+
+        manifest[db_path] = {
+            "ingest_version": INGEST_VERSION,
+            "db_path": db_path,
+            "csv": csv_infos[db_path],
+            "db": describe_database(db_path),
+            "db_columns": result["columns"],
+            "final_count": result["final_count"],
+        }
+
+    save_manifest(manifest, folder)
@@ -0,0 +1,209 @@
+"""
+Ferramentas de montagem dos prompts dos agentes a partir do catálogo (formato compacto)
+Arquivo: prompt_tools.py
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    # tiktoken é opcional: sem ele os tokens são estimados pelo tamanho do texto
+    tiktoken = None
+
+from tools.answer_format_tools import format_number
+from tools.database_tools import (
+    read_database_schema,
+    describe_dataset,
+    HEADER_TABLE,
+    ITEMS_TABLE,
+    MAIN_TABLE,
+)
+from tools.fulltext_tools import load_fulltext_indexes, describe_fulltext_indexes
+
+# Versão dos prompts gravada em cada análise (1 =
+# prompts escritos à mão com listas de colunas)
+PROMPT_VERSION = 2
+
+# Codificação usada para contar tokens (modelos gpt-4o)
+# e caracteres por token na estimativa sem tiktoken
+TOKEN_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+# Uma tabela que repete mais da metade das colunas de outra é descrita pela diferença
+MIN_SHARED_COLUMNS = 0.5
+
+# Granularidade de cada tabela/visão conhecida
+OBJECT_GRAIN = {
+    HEADER_TABLE: "1 linha por nota",
+    ITEMS_TABLE: "1 linha por item",
+    MAIN_TABLE: "visão",
+}
+
+# Observações por tipo de banco
+DATASET_NOTES = {
+    "unified": [
+        (
+            "Contar notas: COUNT(*) em cabecalho; produtos: itens; notas_fiscais junta"
+            " os dois por chave_de_acesso"
+        ),
+        (
+            "Valor da nota: valor_nota_fiscal (cabecalho); valor dos itens: valor_total"
+            " (itens)"
+        ),
+    ],
+    "header": [
+        "Só cabeçalhos (sem produtos): cada linha é uma nota; valor: valor_nota_fiscal"
+    ],
+    "items": [
+        "Cada linha é um item de nota; valor: valor_total; notas: COUNT(DISTINCT"
+        " chave_de_acesso)"
+    ],
+}
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens do texto pelo tiktoken ou, sem ele, estimados por CHARS_PER_TOKEN."""
+    global _encoding
+    if tiktoken is not None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+                except Exception:
+                    # Codificação indisponível (sem acesso à rede para baixá-la)
+                    _encoding = False
+        if _encoding:
+            return len(_encoding.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _describe_columns(columns: List[str], previous: Dict[str, List[str]]) -> str:
+    """
+    Colunas de uma tabela em uma linha.
+
+    Se a tabela repetir boa parte das colunas de uma já descrita, lista só a
+    diferença ("= itens + a, b" ou "= cabecalho - a + b").
+    """
+    best, shared = None, 0
+    for name, other in previous.items():
+        common = len(set(columns) & set(other))
+        if common > shared:
+            best, shared = name, common
+    if best is None or shared < len(columns) * MIN_SHARED_COLUMNS:
+        return ", ".join(columns)
+
+    removed = [col for col in previous[best] if col not in columns]
+    added = [col for col in columns if col not in previous[best]]
+    text = f"= {best}"
+    if removed:
+        text += f" - {', '.join(removed)}"
+    if added:
+        text += f" + {', '.join(added)}"
+    return text
+
+
+def _catalog_column(catalog: Optional[dict], column: str) -> Optional[dict]:
+    """Estatísticas da coluna na primeira tabela do catálogo que a tiver."""
+    for entry in (catalog or {}).get("objects", {}).values():
+        for col in entry["columns"]:
+            if col["name"] == column:
+                return col
+    return None
+
+
+def describe_schema_compact(db_path: str) -> str:
+    """
+    Esquema do banco no formato mais curto que ainda é exato.
+
+    Uma linha por tabela/visão com linhas e colunas (nomes reais, com
+    acentos), tabelas parecidas descritas pela diferença, período das
+    notas e colunas de valor, tudo lido do catálogo gravado na ingestão.
+    """
+    schema = read_database_schema(db_path)
+    tables = {
+        name: [col for col, _ in columns] for name, columns in schema["tables"].items()
+    }
+    catalog = schema["catalog"]
+    dataset = describe_dataset(
+        {name: [col.lower() for col in columns] for name, columns in tables.items()}
+    )
+
+    lines = ["ESQUEMA (SQLite; use os nomes exatos das colunas, com acentos):"]
+    described = {}
+    for name, columns in tables.items():
+        details = (
+            [OBJECT_GRAIN[name]]
+            if name in OBJECT_GRAIN and (len(tables) > 1 or name != MAIN_TABLE)
+            else []
+        )
+        entry = (catalog or {}).get("objects", {}).get(name)
+        if entry:
+            details.append(f"{format_number(entry['row_count'])} linhas")
+        header = f"{name} ({', '.join(details)})" if details else name
+        lines.append(f"{header}: {_describe_columns(columns, described)}")
+        described[name] = columns
+
+    period = _catalog_column(catalog, "data_emissao")
+    if period and period["min"] and period["max"]:
+        lines.append(
+            f"Período: data_emissao de {str(period['min'])[:10]} a"
+            f" {str(period['max'])[:10]}"
+        )
+    # Bancos antigos guardam dia_semana como texto com o nome do dia em inglês
+    if any(
+        col == "dia_semana" and "INT" in (col_type or "").upper()
+        for columns in schema["tables"].values()
+        for col, col_type in columns
+    ):
+        lines.append("dia_semana: 0=segunda ... 6=domingo; ano e mes são inteiros")
+    lines += DATASET_NOTES.get(dataset["type"], [])
+    return "\n".join(lines)
+
+
+def build_query_tool_description(db_path: str) -> str:
+    """
+    Descrição da ferramenta SQL: esquema compacto, busca textual e regras.
+
+    Só tem conteúdo fixo do banco (nada da pergunta), para que o início do
+    prompt seja igual em todas as perguntas e aproveite o cache de prompt do provedor.
+    """
+    parts = [
+        (
+            "Executa uma consulta SQL no banco de notas fiscais e devolve as primeiras"
+            " linhas e o total."
+        ),
+        describe_schema_compact(db_path),
+    ]
+    fulltext_info = describe_fulltext_indexes(load_fulltext_indexes(db_path))
+    if fulltext_info:
+        parts.append(fulltext_info)
+    parts.append(
+        "\n".join(
+            [
+                "REGRAS:",
+                (
+                    "- Prefira agregações (SUM, COUNT, AVG, GROUP BY) com ORDER BY e"
+                    " LIMIT a listar registros"
+                ),
+                (
+                    "- Consultas lentas são canceladas pelo limite de tempo: use"
+                    " filtros e agregações"
+                ),
+                (
+                    '- "≈ RESULTADO APROXIMADO": resposta dos esboços; informe que é'
+                    " aproximada"
+                ),
+                (
+                    '- "⚠️ PLANO DE EXECUÇÃO CUSTOSO": reescreva as próximas consultas'
+                    " com filtros ou agregações"
+                ),
+            ]
+        )
+    )
+    parts.append("Args:\n    query: Consulta SQL para executar")
+    return "\n\n".join(parts)
@@ -0,0 +1,171 @@
+"""
+Ferramentas de cache: resultados de consultas SQL por banco e versão do arquivo
+Arquivo: query_cache_tools.py
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from tools.connection_tools import get_file_identity
+from tools.rollup_tools import tokenize_sql, SQL_KEYWORDS, UNSUPPORTED_KEYWORDS
+
+# Limites do cache (quantidade de resultados e memória ocupada pelos textos)
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+_KEYWORDS = SQL_KEYWORDS | UNSUPPORTED_KEYWORDS
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Normaliza a consulta para uso como chave: espaços, maiúsculas das
+    palavras-chave e ponto e vírgula final não alteram o resultado.
+    Literais e identificadores são mantidos como foram escritos.
+    """
+    query = query.strip().rstrip(";").strip()
+    tokens = tokenize_sql(query)
+    if tokens is None:
+        # Consulta que o tokenizador não reconhece
+        # (ex.: comentários): só junta os espaços
+        return " ".join(query.split())
+
+    parts = []
+    for kind, text, _, _ in tokens:
+        if kind == "word" and text.upper() in _KEYWORDS:
+            text = text.upper()
+        parts.append(text)
+    return " ".join(parts)
+
+
+class QueryResultCache:
+    """
+    Cache LRU thread-safe dos resultados formatados das consultas.
+
+    A chave combina o banco (caminho + identidade do arquivo) e a consulta
+    normalizada; quando o arquivo muda, os resultados do banco são descartados.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        max_bytes: int = QUERY_CACHE_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._identities = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_identity(self, db_key: str, identity) -> None:
+        """
+        Descarta os resultados do banco se o arquivo
+        mudou (chamado com o lock adquirido).
+        """
+        if self._identities.get(db_key, identity) != identity:
+            self._drop_database(db_key)
+            self._stats["invalidations"] += 1
+        self._identities[db_key] = identity
+
+    def _drop_database(self, db_key: str) -> None:
+        """Remove todas as entradas de um banco (chamado com o lock adquirido)."""
+        for key in [key for key in self._entries if key[0] == db_key]:
+            self._bytes -= self._entries.pop(key)[1]
+        self._identities.pop(db_key, None)
+
+    def get(self, db_path: str, query: str, variant: str = "") -> Optional[str]:
+        """Retorna o resultado em cache da consulta (no formato variant), ou None."""
+        db_key = os.path.abspath(db_path)
+        identity = get_file_identity(db_path)
+        key = (db_key, identity, variant, normalize_sql(query))
+
+        with self._lock:
+            self._check_identity(db_key, identity)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, db_path: str, query: str, result: str, variant: str = "") -> None:
+        """Guarda o resultado da consulta, descartando os menos usados se necessário."""
+        db_key = os.path.abspath(db_path)
+        identity = get_file_identity(db_path)
+        normalized = normalize_sql(query)
+        key = (db_key, identity, variant, normalized)
+        size = len(result.encode("utf-8")) + len(normalized.encode("utf-8"))
+
+        # Resultado maior que o cache inteiro não é guardado
+        if identity is None or size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_identity(db_key, identity)
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (result, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def invalidate(self, db_path: Optional[str] = None) -> None:
+        """Descarta os resultados de um banco ou, sem argumento, de todos."""
+        with self._lock:
+            if db_path is None:
+                self._entries.clear()
+                self._identities.clear()
+                self._bytes = 0
+            else:
+                self._drop_database(os.path.abspath(db_path))
+            self._stats["invalidations"] += 1
+
+    def get_stats(self) -> dict:
+        """Acertos, falhas, descartes e ocupação do cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "entries": len(self._entries),
+                    "bytes": self._bytes,
+                    "max_entries": self.max_entries,
+                    "max_bytes": self.max_bytes,
+                }
+            )
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_result_cache = QueryResultCache()
+
+
+def get_cached_result(db_path: str, query: str, variant: str = "") -> Optional[str]:
+    """
+    Resultado em cache da consulta no banco, ou None
+    (variant separa formatos do mesmo resultado).
+    """
+    return _result_cache.get(db_path, query, variant)
+
+
+def store_result(db_path: str, query: str, result: str, variant: str = "") -> None:
+    """Guarda o resultado formatado da consulta no banco."""
+    _result_cache.put(db_path, query, result, variant)
+
+
+def invalidate_query_cache(db_path: Optional[str] = None) -> None:
+    """Descarta os resultados em cache (usado após reconstruir ou alterar o banco)."""
+    _result_cache.invalidate(db_path)
+
+
+def get_query_cache_stats() -> dict:
+    """Estatísticas do cache de resultados."""
+    return _result_cache.get_stats()
@@ -0,0 +1,152 @@
+"""
+Ferramentas de controle de consultas: tempo limite, leitura incremental e teto de linhas
+Arquivo: query_governor_tools.py
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+import pandas as pd
+
+# Tempo máximo de execução de cada consulta (segundos)
+QUERY_TIME_BUDGET = float(os.getenv("QUERY_TIME_BUDGET", "30"))
+
+# Quantidade máxima de linhas lidas do resultado
+QUERY_ROW_LIMIT = int(os.getenv("QUERY_ROW_LIMIT", "20"))
+
+# Instruções da máquina virtual do SQLite entre verificações do limite
+PROGRESS_STEPS = 10000
+
+# Linhas lidas por vez do cursor
+FETCH_BATCH_SIZE = 500
+
+
+class QueryCancelledError(Exception):
+    """Consulta interrompida por exceder o tempo limite ou por cancelamento."""
+
+    def __init__(self, message: str, timed_out: bool):
+        super().__init__(message)
+        self.timed_out = timed_out
+
+
+class QueryDeadline:
+    """
+    Prazo e cancelamento de uma consulta.
+
+    Chamado como progress handler do SQLite, interrompe a consulta após o
+    prazo ou ao ser cancelada (outros motores o consultam periodicamente).
+    """
+
+    def __init__(self, time_budget: float, cancel_event: Optional[threading.Event]):
+        self.time_budget = time_budget
+        self.deadline = time.perf_counter() + time_budget
+        self.cancel_event = cancel_event
+        self.timed_out = False
+        self.cancelled = False
+
+    def __call__(self) -> int:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.cancelled = True
+            return 1
+        if time.perf_counter() > self.deadline:
+            self.timed_out = True
+            return 1
+        return 0
+
+    def remaining(self) -> float:
+        return self.deadline - time.perf_counter()
+
+    def error(self) -> QueryCancelledError:
+        if self.cancelled:
+            return QueryCancelledError(
+                "Consulta cancelada pelo usuário.", timed_out=False
+            )
+        return QueryCancelledError(
+            f"Consulta cancelada: excedeu o limite de {self.time_budget:.0f}s. "
+            "Refaça a consulta com filtros, agregações ou LIMIT.",
+            timed_out=True,
+        )
+
+
+def count_query_rows(conn: sqlite3.Connection, query: str) -> int:
+    """Conta as linhas do resultado sem trazê-las para o Python."""
+    return conn.execute(f"SELECT COUNT(*) FROM ({query})").fetchone()[0]
+
+
+def run_governed_query(
+    conn: sqlite3.Connection,
+    query: str,
+    max_rows: int = QUERY_ROW_LIMIT,
+    time_budget: float = QUERY_TIME_BUDGET,
+    cancel_event: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Executa uma consulta com limite de tempo e lê no máximo max_rows linhas.
+
+    O limite é aplicado pelo progress handler do SQLite, que interrompe a
+    execução dentro da própria biblioteca; a conexão continua utilizável.
+    Se o resultado tiver mais linhas que o teto, o total real é obtido por
+    um COUNT(*) sobre a consulta, dentro do tempo que restar.
+
+    Args:
+        conn: Conexão com o banco
+        query (str): Consulta SQL
+        max_rows (int): Quantidade máxima de linhas lidas
+        time_budget (float): Tempo máximo em segundos
+        cancel_event: Evento que, quando sinalizado, cancela a consulta
+
+    Returns:
+        dict: DataFrame com as linhas lidas, total de linhas (None se não foi
+              possível contar), se o resultado foi truncado e o tempo gasto
+
+    Raises:
+        QueryCancelledError: Se o tempo acabar ou a consulta for cancelada
+    """
+    query = query.strip().rstrip(";")
+    deadline = QueryDeadline(time_budget, cancel_event)
+    start = time.perf_counter()
+
+    conn.set_progress_handler(deadline, PROGRESS_STEPS)
+    try:
+        try:
+            cursor = conn.execute(query)
+            columns = [description[0] for description in cursor.description or []]
+
+            rows = []
+            while len(rows) <= max_rows:
+                batch = cursor.fetchmany(
+                    min(FETCH_BATCH_SIZE, max_rows + 1 - len(rows))
+                )
+                if not batch:
+                    break
+                rows.extend(batch)
+            cursor.close()
+        except sqlite3.OperationalError:
+            if deadline.timed_out or deadline.cancelled:
+                raise deadline.error()
+            raise
+
+        truncated = len(rows) > max_rows
+        rows = rows[:max_rows]
+        total_rows = len(rows)
+
+        if truncated:
+            try:
+                total_rows = count_query_rows(conn, query)
+            except sqlite3.OperationalError:
+                if deadline.cancelled:
+                    raise deadline.error()
+                # Sem tempo para contar: informa apenas que há mais linhas que o teto
+                total_rows = None
+    finally:
+        conn.set_progress_handler(None, 0)
+
+    return {
+        "dataframe": pd.DataFrame.from_records(rows, columns=columns),
+        "total_rows": total_rows,
+        "truncated": truncated,
+        "elapsed_seconds": time.perf_counter() - start,
+    }
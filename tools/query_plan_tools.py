@@ -0,0 +1,335 @@
+"""
+Ferramentas de inspeção do plano de execução (EXPLAIN QUERY PLAN) das consultas
+Arquivo: query_plan_tools.py
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from tools.catalog_tools import load_catalog
+from tools.connection_tools import read_connection
+from tools.index_advisor_tools import (
+    suggest_indexes_for_query,
+    create_suggested_indexes,
+)
+from tools.rollup_tools import (
+    load_rollup_catalog,
+    rewrite_with_rollups,
+    tokenize_sql,
+    token_identifier,
+    quote_identifier,
+)
+
+PLAN_LOG_FILENAME = "query_plans.jsonl"
+
+# O que fazer com planos problemáticos:
+# "off" (não inspeciona), "log" (só registra), "warn" (registra e avisa o agente)
+# ou "index" (registra, cria o índice que falta antes de executar e avisa o agente)
+QUERY_PLAN_MODE = os.getenv("QUERY_PLAN_MODE", "warn")
+
+# Tabelas menores que isso são varridas rapidamente:
+# o problema é registrado, mas não gera aviso
+QUERY_PLAN_WARN_ROWS = int(os.getenv("QUERY_PLAN_WARN_ROWS", "100000"))
+
+# Tamanho máximo do registro de planos (o anterior é mantido como .1)
+PLAN_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+ISSUE_FULL_SCAN = "full_scan"
+ISSUE_TEMP_BTREE = "temp_btree"
+ISSUE_AUTOMATIC_INDEX = "automatic_index"
+
+ISSUE_LABELS = {
+    ISSUE_FULL_SCAN: "varredura completa",
+    ISSUE_TEMP_BTREE: "ordenação/agrupamento em B-tree temporária",
+    ISSUE_AUTOMATIC_INDEX: "índice temporário criado a cada execução (falta índice)",
+}
+
+_SCAN_PATTERN = re.compile(r"^SCAN (\S+)(?: AS (\S+))?$")
+_AUTOMATIC_INDEX_PATTERN = re.compile(
+    r"^SEARCH (\S+)(?: AS \S+)? USING AUTOMATIC (?:COVERING )?INDEX"
+)
+_TEMP_BTREE_PATTERN = re.compile(r"^USE TEMP B-TREE FOR (.+)$")
+
+_log_lock = threading.Lock()
+
+
+def explain_query(conn: sqlite3.Connection, query: str) -> List[str]:
+    """Linhas (detalhe) do EXPLAIN QUERY PLAN da consulta, na ordem do SQLite."""
+    return [
+        row[3]
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {query.strip().rstrip(';')}")
+    ]
+
+
+def find_plan_issues(plan: List[str]) -> List[dict]:
+    """
+    Identifica no plano varreduras completas, B-trees temporárias e índices automáticos.
+
+    Returns:
+        List[dict]: Problemas com tipo, tabela (como aparece
+            no plano, podendo ser um alias) e linha do plano
+    """
+    issues = []
+    for detail in plan:
+        scan = _SCAN_PATTERN.match(detail)
+        if scan and scan.group(1) != "CONSTANT" and not scan.group(1).startswith("("):
+            issues.append(
+                {"kind": ISSUE_FULL_SCAN, "table": scan.group(1), "detail": detail}
+            )
+            continue
+
+        automatic = _AUTOMATIC_INDEX_PATTERN.match(detail)
+        if automatic:
+            issues.append(
+                {
+                    "kind": ISSUE_AUTOMATIC_INDEX,
+                    "table": automatic.group(1),
+                    "detail": detail,
+                }
+            )
+            continue
+
+        temp_btree = _TEMP_BTREE_PATTERN.match(detail)
+        if temp_btree:
+            issues.append({"kind": ISSUE_TEMP_BTREE, "table": None, "detail": detail})
+    return issues
+
+
+def _table_aliases(conn: sqlite3.Connection, query: str) -> dict:
+    """
+    Tabelas reais por nome/alias, como aparecem no plano.
+
+    Os aliases vêm da consulta e das definições das visões (ex.: 'i' e 'c'
+    na visão notas_fiscais do banco unificado).
+    """
+    tables = {}
+    sources = [query]
+    for object_type, name, sql in conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE type IN ('table', 'view')"
+    ):
+        if object_type == "table":
+            tables[name.lower()] = name
+        elif sql:
+            sources.append(sql)
+
+    aliases = dict(tables)
+    for source in sources:
+        tokens = tokenize_sql(source) or []
+        for index, token in enumerate(tokens[:-1]):
+            if token[0] != "word" or token[1].upper() not in ("FROM", "JOIN"):
+                continue
+            table = tables.get(token_identifier(tokens[index + 1]) or "")
+            if table is None:
+                continue
+            alias_index = index + 2
+            if alias_index < len(tokens) and tokens[alias_index][1].upper() == "AS":
+                alias_index += 1
+            if alias_index < len(tokens) and tokens[alias_index][0] in (
+                "word",
+                "quoted",
+            ):
+                aliases.setdefault(token_identifier(tokens[alias_index]), table)
+    return aliases
+
+
+def _row_count(
+    conn: sqlite3.Connection, catalog: Optional[dict], table: Optional[str]
+) -> Optional[int]:
+    """
+    Linhas da tabela pelo catálogo ou, fora dele,
+    pelo maior rowid (None se desconhecida).
+    """
+    if not table:
+        return None
+    entry = (catalog or {}).get("objects", {}).get(table)
+    if entry:
+        return entry["row_count"]
+    try:
+        return (
+            conn.execute(
+                f"SELECT MAX(rowid) FROM {quote_identifier(table)}"
+            ).fetchone()[0]
+            or 0
+        )
+    except sqlite3.Error:
+        return None
+
+
+def _costly_issues(issues: List[dict]) -> List[dict]:
+    """
+    Problemas que justificam aviso ou índice: índices automáticos e varreduras
+    de tabelas grandes; B-trees temporárias só quando acompanham um deles
+    (ordenar o resultado de uma tabela pequena é barato).
+    """
+    costly = [
+        issue
+        for issue in issues
+        if issue["kind"] == ISSUE_AUTOMATIC_INDEX
+        or (
+            issue["kind"] == ISSUE_FULL_SCAN
+            and (issue["rows"] is None or issue["rows"] >= QUERY_PLAN_WARN_ROWS)
+        )
+    ]
+    if costly:
+        costly += [issue for issue in issues if issue["kind"] == ISSUE_TEMP_BTREE]
+    return costly
+
+
+def get_plan_log_path(db_path: str) -> Path:
+    """Retorna o caminho do registro de planos da pasta do banco."""
+    return Path(os.path.dirname(db_path) or ".") / PLAN_LOG_FILENAME
+
+
+def log_plan_review(db_path: str, review: dict):
+    """Acrescenta a inspeção ao registro de planos (JSON por linha)."""
+    log_path = get_plan_log_path(db_path)
+    entry = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "db_path": db_path,
+        "pergunta": review["pergunta"],
+        "query": review["query"],
+        "executed_query": review["executed_query"],
+        "plan": review["plan"],
+        "issues": review["issues"],
+        "indexes_created": review["indexes_created"],
+    }
+
+    with _log_lock:
+        try:
+            if log_path.exists() and log_path.stat().st_size > PLAN_LOG_MAX_BYTES:
+                os.replace(log_path, log_path.with_suffix(".1.jsonl"))
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def load_plan_log(db_path: str, limit: int = 50) -> List[dict]:
+    """
+    Últimas inspeções registradas para o banco, da mais recente para a mais antiga.
+    """
+    log_path = get_plan_log_path(db_path)
+    if not log_path.exists():
+        return []
+
+    entries = []
+    try:
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("db_path") == db_path:
+                    entries.append(entry)
+    except OSError:
+        return []
+    return entries[::-1][:limit]
+
+
+def format_plan_warning(review: dict) -> str:
+    """Aviso de custo devolvido ao agente junto com o resultado da consulta."""
+    lines = ["⚠️ PLANO DE EXECUÇÃO CUSTOSO:"]
+    for issue in review["costly_issues"]:
+        rows = (
+            f" (~{issue['rows']:,} linhas)".replace(",", ".")
+            if issue.get("rows")
+            else ""
+        )
+        lines.append(f"- {ISSUE_LABELS[issue['kind']]}{rows}: {issue['detail']}")
+
+    if review["indexes_created"]:
+        lines.append(
+            "Índice(s) criado(s) automaticamente:"
+            f" {', '.join(review['indexes_created'])}."
+        )
+    elif review["suggestions"]:
+        lines.append(
+            "Índice que resolveria: "
+            + "; ".join(s["statement"] for s in review["suggestions"])
+        )
+    lines.append(
+        "Se precisar de novas consultas, prefira filtros em colunas indexadas,"
+        " agregações e LIMIT em vez de varrer ou ordenar a tabela inteira."
+    )
+    return "\n".join(lines)
+
+
+def review_query_plan(
+    db_path: str,
+    query: str,
+    pergunta: Optional[str] = None,
+    mode: str = QUERY_PLAN_MODE,
+) -> Optional[dict]:
+    """
+    Inspeciona o plano da consulta antes da execução.
+
+    O plano analisado é o da consulta que será realmente executada (já
+    reescrita para as tabelas pré-agregadas, quando for o caso). Problemas
+    são registrados com a pergunta que originou a consulta; no modo "index"
+    os índices que faltam são criados antes da execução.
+
+    Args:
+        db_path (str): Banco consultado
+        query (str): Consulta SQL gerada pelo agente
+        pergunta (str): Pergunta do usuário que originou a consulta
+        mode (str): "off", "log", "warn" ou "index" (QUERY_PLAN_MODE)
+
+    Returns:
+        dict: Plano, problemas, sugestões, índices criados e aviso
+              para o agente (None se a consulta não for SELECT, o
+              modo for "off" ou o plano não puder ser obtido)
+    """
+    if mode == "off" or not query.strip().upper().startswith("SELECT"):
+        return None
+
+    rewritten = rewrite_with_rollups(query, load_rollup_catalog(db_path))
+    executed_query = rewritten[0] if rewritten else query
+
+    catalog = load_catalog(db_path)
+    try:
+        with read_connection(db_path) as conn:
+            plan = explain_query(conn, executed_query)
+            issues = find_plan_issues(plan)
+            if issues:
+                aliases = _table_aliases(conn, executed_query)
+                for issue in issues:
+                    issue["table"] = aliases.get(
+                        (issue["table"] or "").lower(), issue["table"]
+                    )
+                    issue["rows"] = _row_count(conn, catalog, issue["table"])
+    except (sqlite3.Error, OSError):
+        # Consulta inválida: o erro é devolvido pela execução
+        return None
+
+    costly_issues = _costly_issues(issues)
+
+    suggestions = (
+        suggest_indexes_for_query(db_path, executed_query) if costly_issues else []
+    )
+    indexes_created = []
+    if mode == "index" and suggestions:
+        indexes_created = create_suggested_indexes(db_path, suggestions)["created"]
+
+    review = {
+        "pergunta": pergunta,
+        "query": query,
+        "executed_query": executed_query,
+        "plan": plan,
+        "issues": issues,
+        "costly_issues": costly_issues,
+        "suggestions": suggestions,
+        "indexes_created": indexes_created,
+        "warning": None,
+    }
+    if issues:
+        log_plan_review(db_path, review)
+    if costly_issues and mode in ("warn", "index"):
+        review["warning"] = format_plan_warning(review)
+    return review
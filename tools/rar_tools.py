@@ -4,9 +4,11 @@ Arquivo: rar_tools.py
 """
 
 import os
+import tempfile
 import subprocess
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Type, Optional
+from typing import Type, Optional, List, Iterator, IO
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
 
@@ -96,6 +98,159 @@ class RarExtractorTool(BaseTool):
         
         return None
 
+    def _is_console_rar(self, unrar_cmd: str) -> bool:
+        """
+        Indica se o comando é o unrar/rar de linha de comando
+        (e não a interface do WinRAR).
+        """
+        return "winrar.exe" not in unrar_cmd.lower() and "7z" not in unrar_cmd.lower()
+
+    def list_members(self, rar_file_path: str) -> List[dict]:
+        """
+        Lista os arquivos contidos no RAR sem extraí-los.
+
+        Args:
+            rar_file_path (str): Caminho para o arquivo RAR
+
+        Returns:
+            List[dict]: Um dicionário por arquivo com 'name', 'size'
+                e 'crc' (quando disponível)
+        """
+        unrar_cmd = self._find_unrar_command()
+        if not unrar_cmd:
+            raise RuntimeError(
+                "Comando para descompactar RAR não encontrado."
+                " Instale o WinRAR ou 7-Zip"
+            )
+
+        if "7z" in unrar_cmd.lower():
+            cmd = [unrar_cmd, "l", "-slt", rar_file_path]
+        elif self._is_console_rar(unrar_cmd):
+            cmd = [unrar_cmd, "lt", rar_file_path]
+        else:
+            raise RuntimeError(
+                "A interface gráfica do WinRAR não lista arquivos; use Rar.exe ou 7-Zip"
+            )
+
+        result = subprocess.run(cmd, capture_output=True, text=True, errors="replace")
+        if result.returncode != 0:
+            raise RuntimeError(
+                "Erro ao listar o arquivo RAR:\n"
+                f"Código: {result.returncode}\nErro: {result.stderr}"
+            )
+
+        if "7z" in unrar_cmd.lower():
+            return parse_7z_listing(result.stdout)
+        return parse_unrar_listing(result.stdout)
+
+    @contextmanager
+    def open_member(self, rar_file_path: str, member_name: str) -> Iterator[IO[bytes]]:
+        """
+        Abre um arquivo de dentro do RAR como fluxo de leitura, sem gravá-lo em disco.
+
+        O conteúdo é descompactado para a saída padrão do unrar/7z e lido
+        diretamente pelo chamador.
+
+        Args:
+            rar_file_path (str): Caminho para o arquivo RAR
+            member_name (str): Nome do arquivo dentro do RAR
+
+        Yields:
+            IO[bytes]: Fluxo binário com o conteúdo descompactado
+        """
+        unrar_cmd = self._find_unrar_command()
+        if not unrar_cmd:
+            raise RuntimeError(
+                "Comando para descompactar RAR não encontrado."
+                " Instale o WinRAR ou 7-Zip"
+            )
+
+        if "7z" in unrar_cmd.lower():
+            cmd = [unrar_cmd, "e", "-so", rar_file_path, member_name]
+        elif self._is_console_rar(unrar_cmd):
+            cmd = [unrar_cmd, "p", "-inul", rar_file_path, member_name]
+        else:
+            raise RuntimeError(
+                "A interface gráfica do WinRAR não descompacta para fluxo;"
+                " use Rar.exe ou 7-Zip"
+            )
+
+        # stderr vai para um arquivo temporário para não bloquear o processo
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+            try:
+                yield process.stdout
+            except BaseException:
+                process.kill()
+                raise
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+
+            if returncode != 0:
+                stderr_file.seek(0)
+                error = stderr_file.read().decode(errors="replace")
+                raise RuntimeError(
+                    f"Erro ao descompactar {member_name}:\n"
+                    f"Código: {returncode}\nErro: {error}"
+                )
+
+
+def _parse_listing_blocks(output: str, separator: str, name_key: str) -> List[dict]:
+    """Converte listagens técnicas (chave/valor) do unrar e do 7z em dicionários."""
+    members = []
+    current = None
+
+    for line in output.splitlines():
+        if separator not in line:
+            continue
+        key, value = line.split(separator, 1)
+        key, value = key.strip(), value.strip()
+
+        if key == name_key:
+            current = {"name": value}
+            members.append(current)
+        elif current is not None:
+            current[key] = value
+
+    return members
+
+
+def parse_unrar_listing(output: str) -> List[dict]:
+    """Interpreta a saída de 'unrar lt' retornando apenas arquivos."""
+    members = []
+    for block in _parse_listing_blocks(output, ":", "Name"):
+        if block.get("Type", "File") != "File":
+            continue
+        members.append(
+            {
+                "name": block["name"],
+                "size": int(block["Size"]) if block.get("Size", "").isdigit() else None,
+                "crc": block.get("CRC32") or None,
+            }
+        )
+    return members
+
+
+def parse_7z_listing(output: str) -> List[dict]:
+    """Interpreta a saída de '7z l -slt' retornando apenas arquivos."""
+    # Os dados do próprio arquivo RAR vêm antes da linha separadora
+    if "----------" in output:
+        output = output.split("----------", 1)[1]
+
+    members = []
+    for block in _parse_listing_blocks(output, " = ", "Path"):
+        if block.get("Folder") == "+" or block.get("Attributes", "").startswith("D"):
+            continue
+        members.append(
+            {
+                "name": block["name"],
+                "size": int(block["Size"]) if block.get("Size", "").isdigit() else None,
+                "crc": block.get("CRC") or None,
+            }
+        )
+    return members
+
 
 def create_rar_extractor_tool():
     """
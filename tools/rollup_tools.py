@@ -0,0 +1,482 @@
+"""
+Ferramentas de tabelas pré-agregadas (rollups) e reescrita de consultas
+Arquivo: rollup_tools.py
+"""
+
+import os
+import re
+import json
+import sqlite3
+from typing import List, Optional, Tuple
+
+from tools.connection_tools import read_connection
+
+ROLLUP_CATALOG_TABLE = "_rollups"
+
+# Dimensões mais usadas nas perguntas; 'mes' gera o rollup apenas por (ano, mes)
+ROLLUP_DIMENSIONS = [
+    "uf_emitente",
+    "mes",
+    "razao_social_emitente",
+    "cfop",
+    "ncm_sh_tipo_de_produto",
+    "descricao_do_produto_servico",
+]
+
+ROLLUP_MEASURES = ["valor_total", "valor_nota_fiscal", "quantidade"]
+
+TIME_COLUMNS = ["ano", "mes"]
+
+AGGREGATES = {"SUM", "COUNT", "MIN", "MAX", "AVG", "TOTAL"}
+
+# Funções escalares que podem envolver os agregados na consulta reescrita
+SCALAR_FUNCTIONS = {
+    "ROUND",
+    "COALESCE",
+    "IFNULL",
+    "ABS",
+    "UPPER",
+    "LOWER",
+    "TRIM",
+    "SUBSTR",
+    "LENGTH",
+    "PRINTF",
+    "CAST",
+    "NULLIF",
+}
+
+SQL_KEYWORDS = {
+    "SELECT",
+    "FROM",
+    "WHERE",
+    "GROUP",
+    "BY",
+    "ORDER",
+    "HAVING",
+    "LIMIT",
+    "OFFSET",
+    "AS",
+    "AND",
+    "OR",
+    "NOT",
+    "IN",
+    "IS",
+    "NULL",
+    "LIKE",
+    "BETWEEN",
+    "ASC",
+    "DESC",
+    "CASE",
+    "WHEN",
+    "THEN",
+    "ELSE",
+    "END",
+    "REAL",
+    "INTEGER",
+    "TEXT",
+    "NUMERIC",
+    "COLLATE",
+    "NOCASE",
+    "ESCAPE",
+    "GLOB",
+}
+
+# Construções que o rollup não consegue responder
+UNSUPPORTED_KEYWORDS = {
+    "DISTINCT",
+    "JOIN",
+    "UNION",
+    "INTERSECT",
+    "EXCEPT",
+    "OVER",
+    "WITH",
+    "INSERT",
+    "UPDATE",
+    "DELETE",
+    "CREATE",
+    "DROP",
+    "ALTER",
+    "PRAGMA",
+    "ATTACH",
+    "WINDOW",
+}
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+  | (?P<word>[^\W\d]\w*)
+  | (?P<op><=|>=|<>|!=|==|\|\||[-+*/%(),;<>=.])
+  | (?P<space>\s+)
+""",
+    re.VERBOSE,
+)
+
+_catalog_cache = {}
+
+
+def quote_identifier(name: str) -> str:
+    """Escapa um identificador (tabela ou coluna) para uso no SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_rollup_table_name(source_table: str, dimension: str) -> str:
+    """Nome da tabela pré-agregada de uma dimensão."""
+    return f"rollup_{source_table}_{dimension}"
+
+
+def build_rollups(conn: sqlite3.Connection, source_table: str) -> int:
+    """
+    Cria as tabelas pré-agregadas de uma tabela de notas fiscais.
+
+    Para cada dimensão disponível é criada uma tabela agrupada por
+    (dimensão, ano, mes) com contagem de linhas e soma, contagem, mínimo e
+    máximo de cada medida. As tabelas criadas são registradas em _rollups,
+    consultada pela reescrita automática de consultas.
+
+    Args:
+        conn: Conexão com o banco recém-carregado
+        source_table (str): Tabela de origem (notas_fiscais, itens ou cabecalho)
+
+    Returns:
+        int: Quantidade de tabelas pré-agregadas criadas
+    """
+    columns = [
+        row[1]
+        for row in conn.execute(f"PRAGMA table_info({quote_identifier(source_table)})")
+    ]
+    measures = [col for col in ROLLUP_MEASURES if col in columns]
+    time_columns = [col for col in TIME_COLUMNS if col in columns]
+
+    if not measures or "mes" not in time_columns:
+        return 0
+
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {ROLLUP_CATALOG_TABLE} (source_table TEXT,"
+        " dimension TEXT, rollup_table TEXT, group_columns TEXT, measures TEXT)"
+    )
+    conn.execute(
+        f"DELETE FROM {ROLLUP_CATALOG_TABLE} WHERE source_table = ?", (source_table,)
+    )
+
+    aggregates = ["COUNT(*) AS n"]
+    for measure in measures:
+        column = quote_identifier(measure)
+        aggregates += [
+            f"SUM({column}) AS {quote_identifier('sum_' + measure)}",
+            f"COUNT({column}) AS {quote_identifier('cnt_' + measure)}",
+            f"MIN({column}) AS {quote_identifier('min_' + measure)}",
+            f"MAX({column}) AS {quote_identifier('max_' + measure)}",
+        ]
+
+    created = 0
+    for dimension in ROLLUP_DIMENSIONS:
+        if dimension not in columns:
+            continue
+
+        group_columns = (
+            list(time_columns)
+            if dimension in TIME_COLUMNS
+            else [dimension] + time_columns
+        )
+        group_sql = ", ".join(quote_identifier(col) for col in group_columns)
+        rollup_table = get_rollup_table_name(source_table, dimension)
+
+        conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(rollup_table)}")
+        conn.execute(
+            f"CREATE TABLE {quote_identifier(rollup_table)} AS "
+            f"SELECT {group_sql}, {', '.join(aggregates)} "
+            f"FROM {quote_identifier(source_table)} GROUP BY {group_sql}"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote_identifier('idx_' + rollup_table)} "
+            f"ON {quote_identifier(rollup_table)}({quote_identifier(group_columns[0])})"
+        )
+        conn.execute(
+            f"INSERT INTO {ROLLUP_CATALOG_TABLE} VALUES (?, ?, ?, ?, ?)",
+            (
+                source_table,
+                dimension,
+                rollup_table,
+                json.dumps(group_columns),
+                json.dumps(measures),
+            ),
+        )
+        created += 1
+
+    conn.commit()
+    return created
+
+
+def load_rollup_catalog(db_path: str) -> List[dict]:
+    """
+    Lê o catálogo de rollups do banco (em cache enquanto o arquivo não mudar).
+
+    Returns:
+        List[dict]: Rollups disponíveis (vazio se o banco não tiver rollups)
+    """
+    try:
+        mtime_ns = os.stat(db_path).st_mtime_ns
+    except OSError:
+        return []
+
+    cached = _catalog_cache.get(db_path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+
+    catalog = []
+    try:
+        with read_connection(db_path) as conn:
+            rows = conn.execute(
+                "SELECT source_table, dimension, rollup_table, group_columns, measures"
+                f" FROM {ROLLUP_CATALOG_TABLE}"
+            ).fetchall()
+        for source_table, dimension, rollup_table, group_columns, measures in rows:
+            catalog.append(
+                {
+                    "source_table": source_table,
+                    "dimension": dimension,
+                    "rollup_table": rollup_table,
+                    "group_columns": json.loads(group_columns),
+                    "measures": json.loads(measures),
+                }
+            )
+    except sqlite3.Error:
+        catalog = []
+
+    _catalog_cache[db_path] = (mtime_ns, catalog)
+    return catalog
+
+
+def tokenize_sql(query: str) -> Optional[List[Tuple[str, str, int, int]]]:
+    """Divide a consulta em tokens (tipo, texto, início, fim), ignorando espaços."""
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        if not match:
+            return None
+        kind = match.lastgroup
+        if kind != "space":
+            tokens.append((kind, match.group(), match.start(), match.end()))
+        position = match.end()
+    return tokens
+
+
+def token_identifier(token: Tuple[str, str, int, int]) -> Optional[str]:
+    """Nome (minúsculo) de um token identificador, ou None se não for identificador."""
+    kind, text = token[0], token[1]
+    if kind == "word":
+        return text.lower()
+    if kind == "quoted":
+        return text[1:-1].replace('""', '"').lower()
+    return None
+
+
+def rewrite_with_rollups(query: str, catalog: List[dict]) -> Optional[Tuple[str, str]]:
+    """
+    Reescreve uma consulta agregada para usar uma tabela pré-agregada.
+
+    Só são reescritas consultas sobre uma única tabela, sem DISTINCT, JOIN
+    ou subconsultas, cujas colunas (fora dos agregados) sejam todas
+    dimensões do mesmo rollup e cujos agregados (SUM, COUNT, MIN, MAX, AVG)
+    usem apenas medidas pré-calculadas. Em qualquer outro caso a consulta
+    original deve ser executada.
+
+    Args:
+        query (str): Consulta SQL original
+        catalog: Rollups disponíveis (load_rollup_catalog)
+
+    Returns:
+        Optional[tuple]: (consulta reescrita, tabela de rollup) ou None
+    """
+    if not catalog:
+        return None
+
+    tokens = tokenize_sql(query.strip())
+    if not tokens:
+        return None
+    while tokens and tokens[-1][1] == ";":
+        tokens.pop()
+
+    upper = [token[1].upper() if token[0] == "word" else None for token in tokens]
+    if (
+        not upper
+        or upper[0] != "SELECT"
+        or upper.count("SELECT") != 1
+        or upper.count("FROM") != 1
+    ):
+        return None
+    if UNSUPPORTED_KEYWORDS.intersection(word for word in upper if word):
+        return None
+
+    # FROM <tabela> seguido apenas de cláusulas (sem alias)
+    from_index = upper.index("FROM")
+    if from_index + 1 >= len(tokens):
+        return None
+    source_table = token_identifier(tokens[from_index + 1])
+    next_index = from_index + 2
+    if next_index < len(tokens) and upper[next_index] not in {
+        "WHERE",
+        "GROUP",
+        "ORDER",
+        "LIMIT",
+        "HAVING",
+    }:
+        return None
+
+    # As visões dos bancos unificados são atendidas pelos rollups da tabela de itens
+    candidates = [entry for entry in catalog if entry["source_table"] == source_table]
+    if not candidates and source_table == "notas_fiscais":
+        candidates = [entry for entry in catalog if entry["source_table"] == "itens"]
+    if not candidates:
+        return None
+    measures = set(candidates[0]["measures"])
+
+    # Substitui os agregados pelos equivalentes sobre o rollup
+    replacements = {}
+    aggregate_found = False
+    index = 0
+    while index < len(tokens):
+        word = upper[index]
+        if (
+            word in AGGREGATES
+            and index + 1 < len(tokens)
+            and tokens[index + 1][1] == "("
+        ):
+            close = index + 2
+            while close < len(tokens) and tokens[close][1] != ")":
+                close += 1
+            argument = tokens[index + 2 : close]
+            if close >= len(tokens) or len(argument) != 1:
+                return None
+
+            if argument[0][1] == "*":
+                if word != "COUNT":
+                    return None
+                new_text = "COALESCE(SUM(n), 0)"
+            else:
+                measure = token_identifier(argument[0])
+                if measure not in measures:
+                    return None
+                if word in ("SUM", "TOTAL"):
+                    new_text = f"{word}({quote_identifier('sum_' + measure)})"
+                elif word == "COUNT":
+                    new_text = f"COALESCE(SUM({quote_identifier('cnt_' + measure)}), 0)"
+                elif word == "MIN":
+                    new_text = f"MIN({quote_identifier('min_' + measure)})"
+                elif word == "MAX":
+                    new_text = f"MAX({quote_identifier('max_' + measure)})"
+                else:
+                    new_text = (
+                        f"(SUM({quote_identifier('sum_' + measure)}) * 1.0 / "
+                        f"SUM({quote_identifier('cnt_' + measure)}))"
+                    )
+
+            replacements[index] = (close, new_text)
+            aggregate_found = True
+            index = close + 1
+        else:
+            index += 1
+
+    if not aggregate_found:
+        return None
+
+    # Itens da lista do SELECT e aliases (com ou sem AS) de cada um
+    select_items = []
+    depth = 0
+    item_start = 1
+    for position in range(1, from_index + 1):
+        text = tokens[position][1]
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif (text == "," and depth == 0) or position == from_index:
+            select_items.append((item_start, position - 1))
+            item_start = position + 1
+
+    alias_positions = set()
+    for start, end in select_items:
+        if (
+            end > start
+            and token_identifier(tokens[end]) is not None
+            and upper[end] not in SQL_KEYWORDS
+        ):
+            previous = tokens[end - 1]
+            if (
+                upper[end - 1] == "AS"
+                or previous[1] == ")"
+                or previous[0] in ("word", "quoted", "number", "string")
+            ):
+                alias_positions.add(end)
+
+    # Identificadores restantes: precisam ser dimensões
+    # do rollup, aliases ou funções permitidas
+    aliases = {token_identifier(tokens[position]) for position in alias_positions}
+    referenced = set()
+    index = 0
+    while index < len(tokens):
+        if index in replacements:
+            index = replacements[index][0] + 1
+            continue
+        token = tokens[index]
+        name = token_identifier(token)
+        if index == from_index + 1 or name is None:
+            index += 1
+            continue
+        if index in alias_positions or (index > 0 and upper[index - 1] == "AS"):
+            aliases.add(name)
+        elif token[0] == "word" and upper[index] in SQL_KEYWORDS:
+            pass
+        elif (
+            token[0] == "word"
+            and index + 1 < len(tokens)
+            and tokens[index + 1][1] == "("
+        ):
+            if upper[index] not in SCALAR_FUNCTIONS:
+                return None
+        else:
+            referenced.add(name)
+        index += 1
+
+    referenced -= aliases
+    dimensions = referenced - set(TIME_COLUMNS)
+    if len(dimensions) > 1:
+        return None
+
+    wanted = dimensions.pop() if dimensions else "mes"
+    rollup = next((entry for entry in candidates if entry["dimension"] == wanted), None)
+    if rollup is None or not referenced.issubset(set(rollup["group_columns"])):
+        return None
+
+    # Monta a consulta reescrita preservando os nomes das colunas do resultado
+    auto_aliases = {}
+    for start, end in select_items:
+        if end not in alias_positions and any(
+            start <= position <= end for position in replacements
+        ):
+            original = query.strip()[tokens[start][2] : tokens[end][3]]
+            auto_aliases[end] = f" AS {quote_identifier(original)}"
+
+    pieces = []
+    index = 0
+    while index < len(tokens):
+        if index in replacements:
+            close, new_text = replacements[index]
+            pieces.append(new_text)
+            last = close
+            index = close + 1
+        elif index == from_index + 1:
+            pieces.append(quote_identifier(rollup["rollup_table"]))
+            last = index
+            index += 1
+        else:
+            pieces.append(tokens[index][1])
+            last = index
+            index += 1
+        if last in auto_aliases:
+            pieces.append(auto_aliases[last])
+
+    return " ".join(pieces), rollup["rollup_table"]
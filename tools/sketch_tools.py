@@ -0,0 +1,673 @@
+"""
+Ferramentas de agregação aproximada: esboços (sketches) construídos na ingestão
+Arquivo: sketch_tools.py
+"""
+
+import os
+import json
+import math
+import time
+import sqlite3
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.connection_tools import read_connection, get_file_identity
+from tools.rollup_tools import tokenize_sql, token_identifier
+
+SKETCH_TABLE = "_sketches"
+
+# Modo aproximado: a ferramenta SQL responde
+# pelos esboços quando possível ("1" para ativar)
+APPROX_MODE = os.getenv("APPROX_MODE", "0") == "1"
+
+# HyperLogLog com 2^14 registradores: erro padrão de ~0,8%
+HLL_PRECISION = 14
+
+# Erro relativo máximo dos quantis (DDSketch)
+QUANTILE_RELATIVE_ACCURACY = 0.01
+
+# Itens mantidos pelo resumo de mais frequentes
+# (Misra-Gries) e maior top-k respondido por ele
+HEAVY_HITTERS_CAPACITY = 1000
+HEAVY_HITTERS_MAX_K = 20
+
+# Colunas com contagem aproximada de distintos
+DISTINCT_COLUMNS = [
+    "chave_de_acesso",
+    "razao_social_emitente",
+    "cpf_cnpj_emitente",
+    "município_emitente",
+    "nome_destinatário",
+    "cnpj_destinatário",
+    "descricao_do_produto_servico",
+    "código_ncm_sh",
+]
+
+# Colunas com distribuição aproximada (mediana e percentis)
+QUANTILE_COLUMNS = ["valor_unitário", "valor_total", "quantidade", "valor_nota_fiscal"]
+
+# Colunas com resumo dos mais frequentes, por quantidade de linhas e por valor
+HEAVY_HITTER_COLUMNS = [
+    "razao_social_emitente",
+    "nome_destinatário",
+    "descricao_do_produto_servico",
+    "ncm_sh_tipo_de_produto",
+    "uf_emitente",
+    "município_emitente",
+]
+HEAVY_HITTER_WEIGHTS = ["valor_total", "valor_nota_fiscal"]
+
+_sketch_cache = {}
+
+
+class HyperLogLog:
+    """
+    Contagem aproximada de valores distintos
+    (HyperLogLog, atualizado por blocos com numpy).
+    """
+
+    def __init__(
+        self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None
+    ):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = (
+            registers if registers is not None else np.zeros(self.size, dtype=np.uint8)
+        )
+
+    def update(self, values: pd.Series):
+        values = values.dropna()
+        if values.empty:
+            return
+
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+
+        # Posição do primeiro bit 1 nos bits restantes
+        # (bastam os 32 mais significativos)
+        remaining = ((hashes << np.uint64(self.precision)) >> np.uint64(32)).astype(
+            np.float64
+        )
+        ranks = np.where(
+            remaining > 0, 32 - np.floor(np.log2(np.maximum(remaining, 1))), 33
+        ).astype(np.uint8)
+
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        raw = (
+            alpha
+            * self.size**2
+            / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        )
+
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.size and zeros:
+            # Correção para cardinalidades pequenas (contagem linear)
+            raw = self.size * math.log(self.size / zeros)
+        return int(round(raw))
+
+    def standard_error(self) -> float:
+        return 1.04 / math.sqrt(self.size)
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        registers = np.frombuffer(data, dtype=np.uint8).copy()
+        return cls(int(math.log2(len(registers))), registers)
+
+
+class QuantileSketch:
+    """
+    Quantis com erro relativo garantido (DDSketch): contagens em faixas logarítmicas.
+    """
+
+    def __init__(self, relative_accuracy: float = QUANTILE_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def _add_keys(self, store: dict, values: np.ndarray):
+        keys, counts = np.unique(
+            np.ceil(np.log(values) / self.log_gamma).astype(np.int64),
+            return_counts=True,
+        )
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values: pd.Series):
+        values = (
+            pd.to_numeric(values, errors="coerce").dropna().to_numpy(dtype=np.float64)
+        )
+        if not len(values):
+            return
+
+        self._add_keys(self.positive, values[values > 0])
+        self._add_keys(self.negative, -values[values < 0])
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self.count += len(values)
+
+        self.min = (
+            float(values.min())
+            if self.min is None
+            else min(self.min, float(values.min()))
+        )
+        self.max = (
+            float(values.max())
+            if self.max is None
+            else max(self.max, float(values.max()))
+        )
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Valor do quantil q (0 a 1), com erro relativo de no máximo relative_accuracy.
+        """
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": [[key, count] for key, count in self.positive.items()],
+            "negative": [[key, count] for key, count in self.negative.items()],
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data["relative_accuracy"])
+        sketch.positive = {key: count for key, count in data["positive"]}
+        sketch.negative = {key: count for key, count in data["negative"]}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
+
+
+class HeavyHitters:
+    """
+    Resumo dos valores mais frequentes (Misra-Gries), por linhas ou por soma de um peso.
+
+    Cada valor guardado tem contagem entre counters[valor] e
+    counters[valor] + error; valores fora do resumo somam no máximo error.
+    """
+
+    def __init__(self, capacity: int = HEAVY_HITTERS_CAPACITY):
+        self.capacity = capacity
+        self.counters = {}
+        self.error = 0.0
+        self.total = 0.0
+
+    def _reduce(self, counts: pd.Series) -> tuple:
+        """
+        Mantém os capacity maiores, descontando de todos o (capacity+1)-ésimo maior.
+        """
+        if len(counts) <= self.capacity:
+            return counts, 0.0
+        largest = counts.nlargest(self.capacity + 1)
+        threshold = float(largest.iloc[-1])
+        largest = largest.iloc[:-1] - threshold
+        return largest[largest > 0], threshold
+
+    def update(self, values: pd.Series, weights: Optional[pd.Series] = None):
+        mask = values.notna() if weights is None else values.notna() & weights.notna()
+        if weights is None:
+            counts = values[mask].value_counts()
+        else:
+            counts = weights[mask].groupby(values[mask], observed=True).sum()
+        counts = counts[counts > 0]
+        if counts.empty:
+            return
+        self.total += float(counts.sum())
+
+        # Resume o bloco antes de juntar ao resumo
+        # acumulado (resumos Misra-Gries são combináveis)
+        counts, chunk_error = self._reduce(counts)
+        merged = pd.Series(self.counters, dtype=np.float64).add(
+            counts.astype(np.float64), fill_value=0
+        )
+        merged, merge_error = self._reduce(merged)
+
+        self.counters = {key: float(value) for key, value in merged.items()}
+        self.error += chunk_error + merge_error
+
+    def top(self, k: int) -> List[tuple]:
+        return sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def to_dict(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "counters": [[key, value] for key, value in self.counters.items()],
+            "error": self.error,
+            "total": self.total,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HeavyHitters":
+        sketch = cls(data["capacity"])
+        sketch.counters = {key: value for key, value in data["counters"]}
+        sketch.error = data["error"]
+        sketch.total = data["total"]
+        return sketch
+
+
+class SketchBuilder:
+    """Constrói os esboços de uma tabela a partir dos blocos já limpos da ingestão."""
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.sketches = None
+        self.rows = 0
+        self.elapsed_seconds = 0.0
+
+    def _create(self, columns: List[str]) -> Dict[tuple, object]:
+        sketches = {}
+        for column in DISTINCT_COLUMNS:
+            if column in columns:
+                sketches[(column, "distinct", None)] = HyperLogLog()
+        for column in QUANTILE_COLUMNS:
+            if column in columns:
+                sketches[(column, "quantiles", None)] = QuantileSketch()
+
+        weight = next((col for col in HEAVY_HITTER_WEIGHTS if col in columns), None)
+        for column in HEAVY_HITTER_COLUMNS:
+            if column in columns:
+                sketches[(column, "heavy_hitters", None)] = HeavyHitters()
+                if weight:
+                    sketches[(column, "heavy_hitters", weight)] = HeavyHitters()
+        return sketches
+
+    def update(self, chunk: pd.DataFrame):
+        """
+        Atualiza os esboços com um bloco (usado como
+        chunk_observer de stream_csv_to_sqlite).
+        """
+        start = time.perf_counter()
+        if self.sketches is None:
+            self.sketches = self._create(chunk.columns.tolist())
+
+        for (column, kind, weight), sketch in self.sketches.items():
+            if kind == "heavy_hitters":
+                sketch.update(chunk[column], chunk[weight] if weight else None)
+            else:
+                sketch.update(chunk[column])
+
+        self.rows += len(chunk)
+        self.elapsed_seconds += time.perf_counter() - start
+
+    def save(self, conn: sqlite3.Connection) -> int:
+        """Grava os esboços na tabela _sketches do banco."""
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {SKETCH_TABLE} (table_name TEXT, column_name"
+            " TEXT, kind TEXT, weight_column TEXT, row_count INTEGER, data BLOB)"
+        )
+        conn.execute(
+            f"DELETE FROM {SKETCH_TABLE} WHERE table_name = ?", (self.table_name,)
+        )
+
+        rows = []
+        for (column, kind, weight), sketch in (self.sketches or {}).items():
+            data = (
+                sketch.to_bytes()
+                if kind == "distinct"
+                else json.dumps(sketch.to_dict(), default=str)
+            )
+            rows.append((self.table_name, column, kind, weight, self.rows, data))
+        conn.executemany(f"INSERT INTO {SKETCH_TABLE} VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        return len(rows)
+
+
+def load_sketches(db_path: str) -> Dict[tuple, object]:
+    """
+    Lê os esboços do banco (em cache enquanto o arquivo não mudar).
+
+    Returns:
+        dict: Esboços por (tabela, coluna, tipo, coluna
+            de peso); vazio se o banco não tiver esboços
+    """
+    identity = get_file_identity(db_path)
+    if identity is None:
+        return {}
+
+    cached = _sketch_cache.get(db_path)
+    if cached and cached[0] == identity:
+        return cached[1]
+
+    try:
+        with read_connection(db_path) as conn:
+            rows = conn.execute(
+                "SELECT table_name, column_name, kind, weight_column, data FROM"
+                f" {SKETCH_TABLE}"
+            ).fetchall()
+    except sqlite3.Error:
+        rows = []
+
+    sketches = {}
+    for table_name, column, kind, weight, data in rows:
+        if kind == "distinct":
+            sketch = HyperLogLog.from_bytes(data)
+        elif kind == "quantiles":
+            sketch = QuantileSketch.from_dict(json.loads(data))
+        else:
+            sketch = HeavyHitters.from_dict(json.loads(data))
+        sketches[(table_name, column, kind, weight)] = sketch
+
+    _sketch_cache[db_path] = (identity, sketches)
+    return sketches
+
+
+def _sketch_table(sketches: dict, table_name: str) -> str:
+    """
+    No banco unificado a visão notas_fiscais tem a granularidade da tabela de itens.
+    """
+    tables = {key[0] for key in sketches}
+    if table_name == "notas_fiscais" and table_name not in tables and "itens" in tables:
+        return "itens"
+    return table_name
+
+
+class _TokenReader:
+    """Leitura sequencial dos tokens de uma consulta."""
+
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> Optional[tuple]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def word(self, offset: int = 0) -> Optional[str]:
+        token = self.peek(offset)
+        return token[1].upper() if token and token[0] == "word" else None
+
+    def accept(self, text: str) -> bool:
+        token = self.peek()
+        if token and (token[1].upper() if token[0] == "word" else token[1]) == text:
+            self.position += 1
+            return True
+        return False
+
+    def identifier(self) -> Optional[str]:
+        token = self.peek()
+        name = token_identifier(token) if token else None
+        if name is not None:
+            self.position += 1
+        return name
+
+    def number(self) -> Optional[float]:
+        token = self.peek()
+        if token and token[0] == "number":
+            self.position += 1
+            return float(token[1])
+        return None
+
+    def done(self) -> bool:
+        return self.position >= len(self.tokens)
+
+
+def _read_alias(reader: _TokenReader) -> Optional[str]:
+    """Lê um apelido opcional (com ou sem AS)."""
+    if reader.accept("AS"):
+        return reader.identifier()
+    if reader.word() not in (None, "FROM") and reader.peek()[0] in ("word", "quoted"):
+        return reader.identifier()
+    return None
+
+
+def _read_aggregate(reader: _TokenReader) -> Optional[dict]:
+    """
+    Lê uma agregação respondida pelos esboços: COUNT(DISTINCT col), MEDIAN(col),
+    PERCENTILE(col, p) (0-100) ou PERCENTILE_CONT(col, p) (0-1).
+    """
+    function = reader.word()
+    if (
+        function not in ("COUNT", "MEDIAN", "PERCENTILE", "PERCENTILE_CONT")
+        or not reader.peek(1)
+        or reader.peek(1)[1] != "("
+    ):
+        return None
+    reader.position += 2
+
+    if function == "COUNT":
+        if not reader.accept("DISTINCT"):
+            return None
+        column = reader.identifier()
+        aggregate = {"kind": "distinct", "column": column}
+    else:
+        column = reader.identifier()
+        quantile = 0.5
+        if function != "MEDIAN":
+            if not reader.accept(","):
+                return None
+            value = reader.number()
+            if value is None:
+                return None
+            quantile = value / 100 if function == "PERCENTILE" else value
+        if not 0 <= quantile <= 1:
+            return None
+        aggregate = {"kind": "quantiles", "column": column, "quantile": quantile}
+
+    if column is None or not reader.accept(")"):
+        return None
+    return aggregate
+
+
+def _format_number(value: float) -> str:
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _answer_aggregates(
+    sketches: dict, query: str, reader: _TokenReader
+) -> Optional[str]:
+    """SELECT <agregações> FROM tabela (sem filtros)."""
+    items = []
+    while True:
+        start = reader.peek()
+        aggregate = _read_aggregate(reader)
+        if aggregate is None:
+            return None
+        end = reader.tokens[reader.position - 1]
+        aggregate["label"] = _read_alias(reader) or query[start[2] : end[3]]
+        items.append(aggregate)
+        if not reader.accept(","):
+            break
+
+    if not reader.accept("FROM"):
+        return None
+    table = reader.identifier()
+    if table is None or not reader.done():
+        return None
+    table = _sketch_table(sketches, table)
+
+    values = {}
+    notes = []
+    for item in items:
+        sketch = sketches.get((table, item["column"], item["kind"], None))
+        if sketch is None:
+            return None
+        if item["kind"] == "distinct":
+            values[item["label"]] = [sketch.estimate()]
+            notes.append(
+                f"{item['label']}: HyperLogLog, erro típico de"
+                f" ±{sketch.standard_error():.1%}"
+            )
+        else:
+            quantile = sketch.quantile(item["quantile"])
+            values[item["label"]] = [
+                round(quantile, 2) if quantile is not None else None
+            ]
+            notes.append(
+                f"{item['label']}: DDSketch, erro relativo de até"
+                f" {sketch.relative_accuracy:.0%}"
+            )
+
+    df = pd.DataFrame(values)
+    return (
+        "Encontrados 1 registros (≈ RESULTADO"
+        f" APROXIMADO):\n\n{df.to_string(index=False)}\n\n≈ Valores aproximados"
+        f" calculados pelos esboços da ingestão ({'; '.join(notes)})."
+    )
+
+
+def _answer_top_k(sketches: dict, reader: _TokenReader) -> Optional[str]:
+    """
+    SELECT col, COUNT(*)|SUM(peso) FROM tabela
+    GROUP BY col ORDER BY <agregação> DESC LIMIT k.
+    """
+    column = reader.identifier()
+    if column is None:
+        return None
+    column_label = _read_alias(reader) or column
+    if not reader.accept(","):
+        return None
+
+    function = reader.word()
+    if (
+        function not in ("COUNT", "SUM")
+        or not reader.peek(1)
+        or reader.peek(1)[1] != "("
+    ):
+        return None
+    aggregate_start = reader.position
+    reader.position += 2
+    weight = None
+    if function == "COUNT":
+        if not reader.accept("*"):
+            return None
+    else:
+        weight = reader.identifier()
+    if not reader.accept(")"):
+        return None
+    aggregate_tokens = [
+        token[1].upper() for token in reader.tokens[aggregate_start : reader.position]
+    ]
+    aggregate_label = _read_alias(reader)
+
+    if not reader.accept("FROM"):
+        return None
+    table = reader.identifier()
+    if table is None or not (reader.accept("GROUP") and reader.accept("BY")):
+        return None
+    if reader.number() != 1:
+        group_by = reader.identifier()
+        if group_by not in (column, column_label.lower()):
+            return None
+    if not (reader.accept("ORDER") and reader.accept("BY")):
+        return None
+
+    # Ordenação pela agregação: apelido, posição 2 ou a própria expressão
+    order_start = reader.position
+    if reader.number() == 2:
+        pass
+    else:
+        reader.position = order_start
+        name = reader.identifier() if reader.word() not in ("COUNT", "SUM") else None
+        if name is not None:
+            if not aggregate_label or name != aggregate_label.lower():
+                return None
+        else:
+            length = len(aggregate_tokens)
+            order_tokens = [
+                token[1].upper()
+                for token in reader.tokens[reader.position : reader.position + length]
+            ]
+            if order_tokens != aggregate_tokens:
+                return None
+            reader.position += length
+
+    if not reader.accept("DESC") or not reader.accept("LIMIT"):
+        return None
+    k = reader.number()
+    if k is None or not reader.done() or not 0 < k <= HEAVY_HITTERS_MAX_K:
+        return None
+
+    table = _sketch_table(sketches, table)
+    sketch = sketches.get((table, column, "heavy_hitters", weight))
+    if sketch is None:
+        return None
+
+    label = aggregate_label or ("COUNT(*)" if weight is None else f"SUM({weight})")
+    top = sketch.top(int(k))
+    df = pd.DataFrame(
+        [(key, round(value + sketch.error / 2, 2)) for key, value in top],
+        columns=[column_label, label],
+    )
+    if weight is None:
+        df[label] = df[label].round().astype(int)
+
+    return (
+        f"Encontrados {len(df)} registros (≈ RESULTADO"
+        f" APROXIMADO):\n\n{df.to_string(index=False)}\n\n≈ Ranking aproximado pelo"
+        " resumo de mais frequentes da ingestão (Misra-Gries): cada valor pode variar"
+        f" em até ±{_format_number(sketch.error / 2)} de um total de"
+        f" {_format_number(sketch.total)}."
+    )
+
+
+def answer_with_sketches(db_path: str, query: str) -> Optional[str]:
+    """
+    Responde a consulta pelos esboços do banco, se ela tiver um formato suportado.
+
+    Formatos suportados (sem WHERE, JOIN ou subconsultas):
+    - SELECT COUNT(DISTINCT col) | MEDIAN(col) | PERCENTILE(col, p) [, ...] FROM tabela
+    - SELECT col, COUNT(*) | SUM(valor) FROM tabela
+      GROUP BY col ORDER BY <agregação> DESC LIMIT k
+
+    Returns:
+        str: Resultado formatado e marcado como aproximado,
+            ou None se a consulta não for suportada
+    """
+    sketches = load_sketches(db_path)
+    if not sketches:
+        return None
+
+    tokens = tokenize_sql(query.strip().rstrip(";"))
+    if not tokens:
+        return None
+    reader = _TokenReader(tokens)
+    if not reader.accept("SELECT"):
+        return None
+
+    next_token = reader.peek(1)
+    if (
+        reader.word() in ("MEDIAN", "PERCENTILE", "PERCENTILE_CONT", "COUNT")
+        and next_token
+        and next_token[1] == "("
+    ):
+        return _answer_aggregates(sketches, query, reader)
+    return _answer_top_k(sketches, reader)
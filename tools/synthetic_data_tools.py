@@ -0,0 +1,598 @@
+"""
+Ferramentas para gerar notas fiscais sintéticas (cabeçalhos e itens) em CSV
+Arquivo: synthetic_data_tools.py
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+HEADER_COLUMNS = [
+    "CHAVE DE ACESSO",
+    "MODELO",
+    "SÉRIE",
+    "NÚMERO",
+    "NATUREZA DA OPERAÇÃO",
+    "DATA EMISSÃO",
+    "EVENTO MAIS RECENTE",
+    "DATA/HORA EVENTO MAIS RECENTE",
+    "CPF/CNPJ Emitente",
+    "RAZÃO SOCIAL EMITENTE",
+    "INSCRIÇÃO ESTADUAL EMITENTE",
+    "UF EMITENTE",
+    "MUNICÍPIO EMITENTE",
+    "CNPJ DESTINATÁRIO",
+    "NOME DESTINATÁRIO",
+    "UF DESTINATÁRIO",
+    "INDICADOR IE DESTINATÁRIO",
+    "DESTINO DA OPERAÇÃO",
+    "CONSUMIDOR FINAL",
+    "PRESENÇA DO COMPRADOR",
+    "VALOR NOTA FISCAL",
+]
+
+ITEM_COLUMNS = [
+    "CHAVE DE ACESSO",
+    "MODELO",
+    "SÉRIE",
+    "NÚMERO",
+    "NATUREZA DA OPERAÇÃO",
+    "DATA EMISSÃO",
+    "CPF/CNPJ Emitente",
+    "RAZÃO SOCIAL EMITENTE",
+    "INSCRIÇÃO ESTADUAL EMITENTE",
+    "UF EMITENTE",
+    "MUNICÍPIO EMITENTE",
+    "CNPJ DESTINATÁRIO",
+    "NOME DESTINATÁRIO",
+    "UF DESTINATÁRIO",
+    "INDICADOR IE DESTINATÁRIO",
+    "DESTINO DA OPERAÇÃO",
+    "CONSUMIDOR FINAL",
+    "PRESENÇA DO COMPRADOR",
+    "NÚMERO PRODUTO",
+    "DESCRIÇÃO DO PRODUTO/SERVIÇO",
+    "CÓDIGO NCM/SH",
+    "NCM/SH (TIPO DE PRODUTO)",
+    "CFOP",
+    "QUANTIDADE",
+    "UNIDADE",
+    "VALOR UNITÁRIO",
+    "VALOR TOTAL",
+]
+
+# Código IBGE, capital e peso aproximado (volume de notas) de cada UF
+UFS = [
+    ("SP", 35, "SAO PAULO", 30),
+    ("RJ", 33, "RIO DE JANEIRO", 12),
+    ("MG", 31, "BELO HORIZONTE", 11),
+    ("PR", 41, "CURITIBA", 7),
+    ("RS", 43, "PORTO ALEGRE", 7),
+    ("SC", 42, "FLORIANOPOLIS", 5),
+    ("BA", 29, "SALVADOR", 4),
+    ("GO", 52, "GOIANIA", 4),
+    ("DF", 53, "BRASILIA", 4),
+    ("PE", 26, "RECIFE", 3),
+    ("ES", 32, "VITORIA", 2),
+    ("CE", 23, "FORTALEZA", 2),
+    ("MT", 51, "CUIABA", 2),
+    ("MS", 50, "CAMPO GRANDE", 2),
+    ("PA", 15, "BELEM", 1),
+    ("AM", 13, "MANAUS", 1),
+    ("MA", 21, "SAO LUIS", 1),
+    ("PB", 25, "JOAO PESSOA", 1),
+    ("RN", 24, "NATAL", 1),
+    ("AL", 27, "MACEIO", 1),
+    ("PI", 22, "TERESINA", 1),
+    ("SE", 28, "ARACAJU", 1),
+    ("RO", 11, "PORTO VELHO", 1),
+    ("TO", 17, "PALMAS", 1),
+    ("AC", 12, "RIO BRANCO", 1),
+    ("AP", 16, "MACAPA", 1),
+    ("RR", 14, "BOA VISTA", 1),
+]
+
+MODELO = "55 - NF-E EMITIDA EM SUBSTITUIÇÃO AO MODELO 1 OU 1A"
+
+# Natureza da operação e CFOP interno/interestadual correspondente
+NATUREZAS = [
+    ("VENDA DE MERCADORIA", "5102", "6102"),
+    ("VENDA DE PRODUCAO DO ESTABELECIMENTO", "5101", "6101"),
+    ("VENDA DE MERCADORIA FORA DO ESTADO", "5102", "6108"),
+    ("REMESSA PARA CONSERTO", "5915", "6915"),
+    ("Outras Entradas - Dev Remessa Escola", "1949", "2949"),
+    ("PRESTACAO DE SERVICO", "5933", "6933"),
+    ("VENDA DE ATIVO IMOBILIZADO", "5551", "6551"),
+]
+
+EVENTOS = [
+    ("Autorização de Uso", 96),
+    ("Cancelamento da NF-e", 2),
+    ("Carta de Correção", 2),
+]
+
+INDICADORES_IE = [
+    ("CONTRIBUINTE ICMS", 20),
+    ("CONTRIBUINTE ISENTO", 20),
+    ("NÃO CONTRIBUINTE", 60),
+]
+
+PRESENCAS = [
+    ("1 - OPERAÇÃO PRESENCIAL", 40),
+    ("2 - OPERAÇÃO NÃO PRESENCIAL, PELA INTERNET", 25),
+    ("9 - OPERAÇÃO NÃO PRESENCIAL, OUTROS", 25),
+    ("0 - NÃO SE APLICA", 10),
+]
+
+# Produtos: descrição base, código NCM, tipo de produto, unidade e preço médio
+PRODUTOS = [
+    (
+        "PAPEL A4 SULFITE 75G",
+        "48025610",
+        "Papel e cartão para escrita, em folhas",
+        "RESMA",
+        28.0,
+    ),
+    ("CANETA ESFEROGRAFICA AZUL", "96081000", "Canetas esferográficas", "UNIDAD", 1.8),
+    (
+        "COLECAO DIDATICA EF1 VOL",
+        "49019900",
+        "Outros livros, brochuras e impressos semelhantes",
+        "UNIDAD",
+        95.0,
+    ),
+    (
+        "NOTEBOOK 15 POL 8GB",
+        "84713012",
+        "Máquinas automáticas para processamento de dados portáteis",
+        "UNIDAD",
+        3900.0,
+    ),
+    ("MONITOR LED 24 POL", "85285200", "Monitores de vídeo", "UNIDAD", 890.0),
+    (
+        "CADEIRA GIRATORIA ESCRITORIO",
+        "94013000",
+        "Assentos giratórios de altura ajustável",
+        "UNIDAD",
+        650.0,
+    ),
+    (
+        "LANTERNA LATERAL CARRETA LED",
+        "85122021",
+        "Luzes fixas para automóveis e outros ciclos",
+        "UNIDAD",
+        40.0,
+    ),
+    ("OLEO DIESEL S10", "27101921", "Gasóleo (óleo diesel)", "LITRO", 6.1),
+    (
+        "PNEU 275/80 R22.5",
+        "40112090",
+        "Pneus novos de borracha para ônibus ou caminhões",
+        "UNIDAD",
+        2300.0,
+    ),
+    (
+        "ARROZ TIPO 1 5KG",
+        "10063021",
+        "Arroz semibranqueado ou branqueado, polido",
+        "PACOTE",
+        27.0,
+    ),
+    ("FEIJAO CARIOCA 1KG", "07133399", "Outros feijões secos", "PACOTE", 8.5),
+    (
+        "CAFE TORRADO MOIDO 500G",
+        "09012100",
+        "Café torrado, não descafeinado",
+        "PACOTE",
+        19.0,
+    ),
+    (
+        "MEDICAMENTO DIPIRONA 500MG",
+        "30049099",
+        "Outros medicamentos em doses",
+        "CAIXA",
+        12.0,
+    ),
+    (
+        "LUVA PROCEDIMENTO LATEX",
+        "40151900",
+        "Luvas de borracha vulcanizada",
+        "CAIXA",
+        38.0,
+    ),
+    ("CIMENTO CP II 50KG", "25232910", "Cimento Portland comum", "SACO", 36.0),
+    (
+        "VERGALHAO CA50 10MM",
+        "72142000",
+        "Barras de ferro ou aço com entalhes",
+        "BARRA",
+        52.0,
+    ),
+    ("SERVICO DE MANUTENCAO PREDIAL", "00000000", "Serviço", "SERV", 1500.0),
+    (
+        "TONER IMPRESSORA LASER",
+        "84433231",
+        "Partes e acessórios de impressoras",
+        "UNIDAD",
+        310.0,
+    ),
+    (
+        "AGUA MINERAL 500ML",
+        "22011000",
+        "Águas minerais e águas gaseificadas",
+        "FARDO",
+        14.0,
+    ),
+    (
+        "UNIFORME ESCOLAR CAMISETA",
+        "61091000",
+        "Camisetas de malha de algodão",
+        "UNIDAD",
+        25.0,
+    ),
+]
+
+NOME_PREFIXOS = [
+    "COMERCIAL",
+    "DISTRIBUIDORA",
+    "INDUSTRIA",
+    "ATACADAO",
+    "PAPELARIA",
+    "AUTO PECAS",
+    "FARMACIA",
+    "CONSTRUTORA",
+    "SUPERMERCADO",
+    "TECNOLOGIA",
+    "EDITORA",
+    "TRANSPORTES",
+]
+NOME_RADICAIS = [
+    "BRASIL",
+    "CENTRAL",
+    "NORTE",
+    "SUL",
+    "PAULISTA",
+    "MINEIRA",
+    "NACIONAL",
+    "UNIAO",
+    "SAO JORGE",
+    "ALIANCA",
+    "PROGRESSO",
+    "HORIZONTE",
+    "ESTRELA",
+    "LIDER",
+    "MODELO",
+]
+NOME_SUFIXOS = ["LTDA", "S.A.", "EIRELI", "ME", "EPP", "COMERCIO LTDA"]
+DESTINATARIOS_PUBLICOS = [
+    "MINISTERIO DA EDUCACAO",
+    "COMANDO DA AERONAUTICA",
+    "COMANDO DO EXERCITO",
+    "SECRETARIA DE SAUDE",
+    "UNIVERSIDADE FEDERAL",
+    "BATALHAO LOGISTICO",
+    "INSTITUTO FEDERAL",
+    "PREFEITURA MUNICIPAL",
+    "TRIBUNAL REGIONAL",
+    "HOSPITAL DAS FORCAS ARMADAS",
+]
+
+# Média de itens por nota observada na amostra de 202401 (565 itens / 100 notas)
+DEFAULT_ITEMS_PER_NOTE = 5.65
+
+# Quantidade de notas geradas e gravadas por vez
+DEFAULT_NOTES_PER_BATCH = 50000
+
+
+def _weights(options: list) -> np.ndarray:
+    """Normaliza os pesos (último elemento de cada opção) em probabilidades."""
+    weights = np.array([option[-1] for option in options], dtype=float)
+    return weights / weights.sum()
+
+
+def _zipf_choice(
+    rng: np.random.Generator, size: int, count: int, exponent: float = 1.1
+) -> np.ndarray:
+    """
+    Sorteia índices em [0, size) com distribuição
+    de cauda longa (poucos muito frequentes).
+    """
+    ranks = np.arange(1, size + 1, dtype=float)
+    probabilities = ranks**-exponent
+    return rng.choice(size, size=count, p=probabilities / probabilities.sum())
+
+
+def _digits(values: np.ndarray, width: int) -> np.ndarray:
+    """Formata inteiros como texto com zeros à esquerda."""
+    return np.char.zfill(values.astype(np.int64).astype(str), width)
+
+
+def _build_parties(
+    rng: np.random.Generator, count: int, public: bool = False
+) -> pd.DataFrame:
+    """
+    Gera um cadastro de emitentes ou destinatários (CNPJ, nome, IE, UF, município).
+    """
+    uf_index = rng.choice(len(UFS), size=count, p=_weights(UFS))
+    ufs = np.array([uf[0] for uf in UFS])[uf_index]
+
+    if public:
+        names = np.array(DESTINATARIOS_PUBLICOS)[
+            rng.integers(0, len(DESTINATARIOS_PUBLICOS), count)
+        ]
+        names = np.char.add(
+            np.char.add(rng.integers(1, 30, count).astype(str), " "), names
+        )
+    else:
+        names = np.char.add(
+            np.char.add(
+                np.array(NOME_PREFIXOS)[rng.integers(0, len(NOME_PREFIXOS), count)], " "
+            ),
+            np.char.add(
+                np.char.add(
+                    np.array(NOME_RADICAIS)[rng.integers(0, len(NOME_RADICAIS), count)],
+                    " ",
+                ),
+                np.array(NOME_SUFIXOS)[rng.integers(0, len(NOME_SUFIXOS), count)],
+            ),
+        )
+
+    # CNPJs únicos: radical sequencial embaralhado + filial + dígitos
+    radicals = rng.permutation(count) + 10000000
+    cnpjs = np.char.add(
+        _digits(radicals, 8),
+        _digits(rng.integers(1, 3, count) * 10000 + rng.integers(0, 100, count), 6),
+    )
+
+    return pd.DataFrame(
+        {
+            "cnpj": cnpjs,
+            "nome": names,
+            "ie": _digits(rng.integers(10**8, 10**10, count), 10),
+            "uf": ufs,
+            "uf_code": np.array([uf[1] for uf in UFS])[uf_index],
+            "municipio": np.array([uf[2] for uf in UFS])[uf_index],
+        }
+    )
+
+
+def _generate_batch(
+    rng: np.random.Generator,
+    first_number: int,
+    note_count: int,
+    items_per_note: float,
+    emitentes: pd.DataFrame,
+    destinatarios: pd.DataFrame,
+    year: int,
+    month: int,
+) -> tuple:
+    """
+    Gera um lote de notas: DataFrames de cabeçalhos e de itens com as colunas originais.
+    """
+    emitente = emitentes.iloc[
+        _zipf_choice(rng, len(emitentes), note_count)
+    ].reset_index(drop=True)
+    destinatario = destinatarios.iloc[
+        _zipf_choice(rng, len(destinatarios), note_count, 0.8)
+    ].reset_index(drop=True)
+
+    numbers = np.arange(first_number, first_number + note_count)
+    series = rng.integers(1, 5, note_count)
+
+    # Datas uniformes no mês, concentradas no horário comercial
+    days_in_month = pd.Period(year=year, month=month, freq="M").days_in_month
+    emission = (
+        pd.Timestamp(year=year, month=month, day=1)
+        + pd.to_timedelta(rng.integers(0, days_in_month, note_count), unit="D")
+        + pd.to_timedelta(rng.integers(7 * 3600, 20 * 3600, note_count), unit="s")
+    )
+    event = emission + pd.to_timedelta(rng.integers(1, 120, note_count), unit="s")
+
+    interstate = emitente["uf"].values != destinatario["uf"].values
+    natureza_index = rng.integers(0, len(NATUREZAS), note_count)
+    naturezas = np.array([n[0] for n in NATUREZAS])[natureza_index]
+    cfops = np.where(
+        interstate,
+        np.array([n[2] for n in NATUREZAS])[natureza_index],
+        np.array([n[1] for n in NATUREZAS])[natureza_index],
+    )
+
+    # Chave de acesso (44 dígitos): UF, AAMM, CNPJ,
+    # modelo, série, número, tipo de emissão, código e DV
+    keys = np.char.add(
+        _digits(emitente["uf_code"].values, 2), f"{year % 100:02d}{month:02d}"
+    )
+    keys = np.char.add(keys, emitente["cnpj"].values.astype(str))
+    keys = np.char.add(np.char.add(keys, "55"), _digits(series, 3))
+    keys = np.char.add(keys, _digits(numbers % 10**9, 9))
+    keys = np.char.add(
+        np.char.add(keys, "1"), _digits(rng.integers(0, 10**9, note_count), 9)
+    )
+
+    header = pd.DataFrame(
+        {
+            "CHAVE DE ACESSO": keys,
+            "MODELO": MODELO,
+            "SÉRIE": series,
+            "NÚMERO": numbers,
+            "NATUREZA DA OPERAÇÃO": naturezas,
+            "DATA EMISSÃO": emission.strftime("%Y-%m-%d %H:%M:%S"),
+            "EVENTO MAIS RECENTE": np.array([e[0] for e in EVENTOS])[
+                rng.choice(len(EVENTOS), note_count, p=_weights(EVENTOS))
+            ],
+            "DATA/HORA EVENTO MAIS RECENTE": event.strftime("%Y-%m-%d %H:%M:%S"),
+            "CPF/CNPJ Emitente": emitente["cnpj"].values,
+            "RAZÃO SOCIAL EMITENTE": emitente["nome"].values,
+            "INSCRIÇÃO ESTADUAL EMITENTE": emitente["ie"].values,
+            "UF EMITENTE": emitente["uf"].values,
+            "MUNICÍPIO EMITENTE": emitente["municipio"].values,
+            "CNPJ DESTINATÁRIO": destinatario["cnpj"].values,
+            "NOME DESTINATÁRIO": destinatario["nome"].values,
+            "UF DESTINATÁRIO": destinatario["uf"].values,
+            "INDICADOR IE DESTINATÁRIO": np.array([i[0] for i in INDICADORES_IE])[
+                rng.choice(len(INDICADORES_IE), note_count, p=_weights(INDICADORES_IE))
+            ],
+            "DESTINO DA OPERAÇÃO": np.where(
+                interstate, "2 - OPERAÇÃO INTERESTADUAL", "1 - OPERAÇÃO INTERNA"
+            ),
+            "CONSUMIDOR FINAL": np.where(
+                rng.random(note_count) < 0.8, "1 - CONSUMIDOR FINAL", "0 - NORMAL"
+            ),
+            "PRESENÇA DO COMPRADOR": np.array([p[0] for p in PRESENCAS])[
+                rng.choice(len(PRESENCAS), note_count, p=_weights(PRESENCAS))
+            ],
+        }
+    )
+
+    # Itens: quantidade por nota com média items_per_note (mínimo 1)
+    item_counts = rng.poisson(max(items_per_note - 1, 0), note_count) + 1
+    note_index = np.repeat(np.arange(note_count), item_counts)
+    item_total = len(note_index)
+    item_number = (
+        np.arange(item_total)
+        - np.repeat(np.cumsum(item_counts) - item_counts, item_counts)
+        + 1
+    )
+
+    product_index = _zipf_choice(rng, len(PRODUTOS), item_total, 0.7)
+    base_price = np.array([p[4] for p in PRODUTOS])[product_index]
+    unit_price = np.round(base_price * rng.lognormal(0.0, 0.35, item_total), 2)
+    quantity = np.where(
+        rng.random(item_total) < 0.6,
+        1.0,
+        np.round(rng.lognormal(1.5, 1.0, item_total)).clip(1, 10000),
+    )
+    total = np.round(unit_price * quantity, 2)
+
+    items = header.iloc[note_index][ITEM_COLUMNS[:18]].reset_index(drop=True)
+    items["NÚMERO PRODUTO"] = item_number
+    items["DESCRIÇÃO DO PRODUTO/SERVIÇO"] = np.char.add(
+        np.array([p[0] for p in PRODUTOS])[product_index],
+        np.char.add(" ", rng.integers(1, 40, item_total).astype(str)),
+    )
+    items["CÓDIGO NCM/SH"] = np.array([p[1] for p in PRODUTOS])[product_index]
+    items["NCM/SH (TIPO DE PRODUTO)"] = np.array([p[2] for p in PRODUTOS])[
+        product_index
+    ]
+    items["CFOP"] = cfops[note_index]
+    items["QUANTIDADE"] = quantity
+    items["UNIDADE"] = np.array([p[3] for p in PRODUTOS])[product_index]
+    items["VALOR UNITÁRIO"] = unit_price
+    items["VALOR TOTAL"] = total
+
+    # Valor da nota = soma dos itens
+    header["VALOR NOTA FISCAL"] = np.round(
+        np.bincount(note_index, weights=total, minlength=note_count), 2
+    )
+
+    return header[HEADER_COLUMNS], items[ITEM_COLUMNS]
+
+
+def generate_nfe_csvs(
+    item_rows: int,
+    output_folder: str = "dados",
+    prefix: Optional[str] = None,
+    year: int = 2024,
+    month: int = 1,
+    items_per_note: float = DEFAULT_ITEMS_PER_NOTE,
+    seed: int = 42,
+    notes_per_batch: int = DEFAULT_NOTES_PER_BATCH,
+) -> dict:
+    """
+    Gera um par de CSVs sintéticos de cabeçalhos e
+    itens com as mesmas colunas da amostra real.
+
+    Os arquivos são gravados em lotes, de modo que o uso de memória não
+    depende da escala (10 mil a dezenas de milhões de itens). Emitentes,
+    destinatários e produtos seguem distribuições de cauda longa e o valor
+    de cada nota é a soma dos seus itens.
+
+    Args:
+        item_rows (int): Quantidade aproximada de itens (linhas do CSV de itens)
+        output_folder (str): Pasta de destino dos CSVs
+        prefix (str): Prefixo dos arquivos (padrão: '<AAAAMM>_NFs')
+        year (int): Ano das datas de emissão
+        month (int): Mês das datas de emissão
+        items_per_note (float): Média de itens por nota
+        seed (int): Semente do gerador aleatório (mesma semente = mesmos arquivos)
+        notes_per_batch (int): Notas geradas e gravadas por vez
+
+    Returns:
+        dict: Caminhos dos CSVs, quantidade de notas e itens, tamanhos e tempo
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+
+    output_path = Path(output_folder)
+    output_path.mkdir(parents=True, exist_ok=True)
+    prefix = prefix or f"{year}{month:02d}_NFs"
+    header_path = output_path / f"{prefix}_Cabecalho.csv"
+    items_path = output_path / f"{prefix}_Itens.csv"
+
+    note_total = max(1, int(round(item_rows / items_per_note)))
+    emitentes = _build_parties(rng, int(min(max(50, note_total // 20), 200000)))
+    destinatarios = _build_parties(
+        rng, int(min(max(20, note_total // 50), 50000)), public=True
+    )
+
+    notes_written = 0
+    items_written = 0
+    first_batch = True
+    while notes_written < note_total:
+        batch_size = min(notes_per_batch, note_total - notes_written)
+        header, items = _generate_batch(
+            rng,
+            notes_written + 1,
+            batch_size,
+            items_per_note,
+            emitentes,
+            destinatarios,
+            year,
+            month,
+        )
+
+        mode = "w" if first_batch else "a"
+        header.to_csv(
+            header_path, mode=mode, header=first_batch, index=False, encoding="utf-8"
+        )
+        items.to_csv(
+            items_path, mode=mode, header=first_batch, index=False, encoding="utf-8"
+        )
+
+        notes_written += len(header)
+        items_written += len(items)
+        first_batch = False
+
+    return {
+        "header_path": str(header_path),
+        "items_path": str(items_path),
+        "header_rows": notes_written,
+        "item_rows": items_written,
+        "header_bytes": os.path.getsize(header_path),
+        "items_bytes": os.path.getsize(items_path),
+        "elapsed_seconds": time.perf_counter() - start,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Gera CSVs sintéticos de notas fiscais"
+    )
+    parser.add_argument(
+        "--rows", type=int, default=10000, help="Quantidade aproximada de itens"
+    )
+    parser.add_argument("--folder", default="dados", help="Pasta de destino")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador")
+    args = parser.parse_args()
+
+    print(f"🔧 Gerando ~{args.rows:,} itens em {args.folder}...")
+    info = generate_nfe_csvs(args.rows, args.folder, seed=args.seed)
+    print(f"✅ {info['header_rows']:,} notas em {info['header_path']}")
+    print(f"✅ {info['item_rows']:,} itens em {info['items_path']}")
+    print(f"⏱️ {info['elapsed_seconds']:.1f}s")